@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+        from .models import CustomUser
+        from .user_cache import invalidate_player_on_save, invalidate_user_on_save
+
+        post_save.connect(invalidate_user_on_save, sender=CustomUser, dispatch_uid='tyfc_user_cache_save')
+        post_delete.connect(invalidate_user_on_save, sender=CustomUser, dispatch_uid='tyfc_user_cache_delete')
+        post_save.connect(invalidate_player_on_save, sender='team_management.Player', dispatch_uid='tyfc_player_cache_save')
+        post_delete.connect(invalidate_player_on_save, sender='team_management.Player', dispatch_uid='tyfc_player_cache_delete')
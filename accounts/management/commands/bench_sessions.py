@@ -0,0 +1,55 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = '比較各 session 引擎下，已登入請求每次需要的資料庫查詢數與回應時間（資料於結束時回滾）。'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help='每種引擎送出的請求數')
+        parser.add_argument('--url', default='/dashboard/', help='測試的頁面')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"==== Session 引擎基準：GET {options['url']} x {options['requests']} ====")
+        self.stdout.write(f"{'backend':<16}{'queries/req':>12}{'session q/req':>15}{'ms/req':>10}")
+
+        with transaction.atomic():
+            User.objects.create_user(
+                username='bench_session_user', password='benchpass', user_type='coach', is_approved=True
+            )
+            for backend, engine in settings.SESSION_ENGINES.items():
+                with override_settings(SESSION_ENGINE=engine):
+                    self._bench(backend, options)
+            transaction.set_rollback(True)
+        cache.clear()
+
+    def _bench(self, backend, options):
+        client = Client()
+        client.login(username='bench_session_user', password='benchpass')
+        client.get(options['url'])  # 暖機：樣板與快取
+
+        total_queries = session_queries = 0
+        started = time.perf_counter()
+        for _ in range(options['requests']):
+            with CaptureQueriesContext(connection) as ctx:
+                response = client.get(options['url'])
+            if response.status_code != 200:
+                self.stderr.write(f'{backend}: GET 回應 {response.status_code}')
+                return
+            total_queries += len(ctx.captured_queries)
+            session_queries += sum('django_session' in q['sql'] for q in ctx.captured_queries)
+        elapsed = (time.perf_counter() - started) * 1000
+
+        n = options['requests']
+        self.stdout.write(
+            f'{backend:<16}{total_queries / n:>12.1f}{session_queries / n:>15.1f}{elapsed / n:>10.2f}'
+        )
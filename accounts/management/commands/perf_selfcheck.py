@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from football_management_system.selfcheck import effective_settings, performance_warnings
+
+
+class Command(BaseCommand):
+    help = '列出目前生效的效能相關設定，並提示生產模式下不建議的組合。'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--strict', action='store_true',
+            help='有任何警告時以非零狀態結束（可用於部署流程）'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('==== 效能設定自我檢查 ====')
+        for label, value in effective_settings():
+            self.stdout.write(f'{label:<22} {value}')
+
+        warnings = performance_warnings()
+        for message in warnings:
+            self.stdout.write(self.style.WARNING(f'[WARN] {message}'))
+
+        if warnings and options['strict']:
+            raise SystemExit(1)
+        if not warnings:
+            self.stdout.write(self.style.SUCCESS('未發現需要調整的設定。'))
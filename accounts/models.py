@@ -44,3 +44,10 @@ class CustomUser(AbstractUser):
     def __str__(self):
         return f"{self.username} ({self.get_user_type_display()})"
 
+    def get_session_auth_hash(self):
+        # 由共用快取重建的使用者沒有載入密碼雜湊（accounts/user_cache.py），使用快取時算好的值
+        cached = getattr(self, '_session_auth_hash', None)
+        if cached is not None and 'password' not in self.__dict__:
+            return cached
+        return super().get_session_auth_hash()
+
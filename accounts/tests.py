@@ -1,6 +1,19 @@
-from django.test import TestCase
+import pickle
+from datetime import timedelta
+from io import StringIO
+
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.core.management import call_command
+from django.utils import timezone
+from football_management_system.selfcheck import performance_warnings
+from team_management.models import Team, Player
+from .user_cache import KEY_TEMPLATE, get_cached_entry
 
 User = get_user_model()
 
@@ -46,3 +59,104 @@ class AuthenticationFlowTests(TestCase):
 		self.assertEqual(resp.status_code, 302)
 		self.assertIn("/dashboard/", resp["Location"])
 
+
+
+class PerfSelfcheckTests(TestCase):
+	@override_settings(IS_PRODUCTION=False)
+	def test_development_profile_has_no_warnings(self):
+		self.assertEqual(performance_warnings(), [])
+
+	@override_settings(IS_PRODUCTION=True, DEBUG=True, SESSION_COOKIE_SECURE=True, CSRF_COOKIE_SECURE=True)
+	def test_production_profile_reports_debug_and_locmem(self):
+		warnings = performance_warnings()
+		self.assertTrue(any("DEBUG" in w for w in warnings))
+		self.assertTrue(any("LocMemCache" in w for w in warnings))
+
+	def test_command_lists_effective_settings(self):
+		out = StringIO()
+		call_command("perf_selfcheck", stdout=out)
+		self.assertIn("CONN_MAX_AGE", out.getvalue())
+		self.assertIn("template loaders", out.getvalue())
+
+
+class SessionCleanupTests(TestCase):
+	def test_cleanup_sessions_deletes_only_expired_in_batches(self):
+		now = timezone.now()
+		for i in range(7):
+			Session.objects.create(session_key=f"expired{i}", session_data="", expire_date=now - timedelta(days=1))
+		Session.objects.create(session_key="active", session_data="", expire_date=now + timedelta(days=1))
+		out = StringIO()
+		call_command("cleanup_sessions", batch_size=3, sleep=0, stdout=out)
+		self.assertEqual(list(Session.objects.values_list("session_key", flat=True)), ["active"])
+		self.assertIn("7", out.getvalue())
+
+	@override_settings(SESSION_ENGINE="django.contrib.sessions.backends.signed_cookies")
+	def test_login_works_with_signed_cookie_sessions(self):
+		User.objects.create_user(username="cookieuser", password="pass12345", user_type="coach", is_approved=True)
+		resp = self.client.post(reverse("login"), {"username": "cookieuser", "password": "pass12345"})
+		self.assertEqual(resp.status_code, 302)
+		self.assertFalse(Session.objects.exists())
+		self.assertEqual(self.client.get(reverse("dashboard")).status_code, 200)
+
+
+class CachedUserTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.coach = User.objects.create_user(
+			username="coachcache", password="coachpass", user_type="coach", is_approved=True
+		)
+		self.player_user = User.objects.create_user(
+			username="playercache", password="playerpass", user_type="player", is_approved=True
+		)
+		self.team = Team.objects.create(name="CacheTeam", coach=self.coach, group="成人組")
+		self.player = Player.objects.create(
+			user=self.player_user, nickname="CacheP", team=self.team, positions="FW",
+			age=18, stamina="優", speed="優", technique="優",
+		)
+
+	def test_repeat_requests_skip_user_and_player_queries(self):
+		self.client.login(username="playercache", password="playerpass")
+		self.client.get(reverse("my_matches"))
+		with CaptureQueriesContext(connection) as ctx:
+			resp = self.client.get(reverse("my_matches"))
+		self.assertEqual(resp.status_code, 200)
+		tables = " ".join(q["sql"] for q in ctx.captured_queries)
+		self.assertNotIn("accounts_customuser", tables)
+		self.assertNotIn("team_management_player", tables)
+
+	def test_cache_invalidated_when_user_or_player_saved(self):
+		entry = get_cached_entry(self.player_user.id)
+		self.assertEqual(entry["team_id"], self.team.id)
+		other = Team.objects.create(name="OtherTeam", coach=self.coach, group="成人組")
+		self.player.team = other
+		self.player.save()
+		self.assertEqual(get_cached_entry(self.player_user.id)["team_id"], other.id)
+
+		self.player_user.user_type = "coach"
+		self.player_user.save()
+		self.assertEqual(get_cached_entry(self.player_user.id)["user"]["user_type"], "coach")
+
+	def test_cache_cleared_again_after_commit(self):
+		stale = get_cached_entry(self.coach.id)
+		with self.captureOnCommitCallbacks(execute=True):
+			self.coach.is_active = False
+			self.coach.save()
+			# 提交前同時進行的請求讀到舊值並重新快取
+			cache.set(KEY_TEMPLATE % self.coach.id, stale)
+		self.assertFalse(get_cached_entry(self.coach.id)["user"]["is_active"])
+
+	def test_cache_holds_no_password_hash(self):
+		self.client.login(username="coachcache", password="coachpass")
+		self.client.get(reverse("dashboard"))
+		entry = get_cached_entry(self.coach.id)
+		self.assertNotIn(self.coach.password.encode(), pickle.dumps(entry))
+		with CaptureQueriesContext(connection) as ctx:
+			self.assertEqual(self.client.get(reverse("dashboard")).status_code, 200)
+		self.assertNotIn("accounts_customuser", " ".join(q["sql"] for q in ctx.captured_queries))
+
+	def test_password_change_logs_out_cached_session(self):
+		self.client.login(username="coachcache", password="coachpass")
+		self.assertEqual(self.client.get(reverse("dashboard")).status_code, 200)
+		self.coach.set_password("newpass123")
+		self.coach.save()
+		self.assertEqual(self.client.get(reverse("dashboard")).status_code, 302)
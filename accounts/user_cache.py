@@ -0,0 +1,95 @@
+"""
+已登入使用者與球員資料的共用快取
+
+每個請求的 AuthenticationMiddleware 都會依 session 載入 CustomUser；球員頁面又會
+再查一次 Player 取得 player / team。這裡把權限判斷用到的使用者欄位（含角色
+user_type 與審核狀態 is_approved）以及球員 id、球隊 id 一起放進共用快取，權限與
+歸屬判斷不需再查資料庫。updated_at 也一併快取，條件式 GET 的版本標記會用到。CustomUser 或 Player 儲存、刪除時由 signal 清除對應快取，
+並在交易提交後再清除一次：提交前同時進行的請求可能重新載入舊的角色或審核狀態，
+不再清除的話會一直快取到 USER_CACHE_TIMEOUT。
+
+密碼雜湊不放進快取（FileBasedCache 會寫到磁碟），只保存驗證 session 用的
+session auth hash。重建的使用者其他欄位是延遲載入的，第一次使用時才查詢；
+save() 也只寫回已載入的欄位。
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+KEY_TEMPLATE = 'accounts:user:%s'
+CACHED_FIELDS = (
+    'id', 'username', 'user_type', 'is_approved', 'is_active', 'is_staff', 'is_superuser', 'updated_at',
+)
+
+
+def _cache_key(user_id):
+    return KEY_TEMPLATE % user_id
+
+
+def _load_entry(user_id):
+    from team_management.models import Player
+
+    UserModel = get_user_model()
+    try:
+        user = UserModel._default_manager.get(pk=user_id)
+    except UserModel.DoesNotExist:
+        return None
+    player = Player.objects.filter(user_id=user.pk).values('id', 'team_id').first()
+    return {
+        'user': {field: getattr(user, field) for field in CACHED_FIELDS},
+        'session_auth_hash': user.get_session_auth_hash(),
+        'player_id': player['id'] if player else None,
+        'team_id': player['team_id'] if player else None,
+    }
+
+
+def get_cached_entry(user_id):
+    """回傳 {'user'（CACHED_FIELDS 的值）, 'session_auth_hash', 'player_id', 'team_id'}，使用者不存在時回傳 None"""
+    key = _cache_key(user_id)
+    entry = cache.get(key)
+    if entry is None:
+        entry = _load_entry(user_id)
+        if entry is not None:
+            cache.set(key, entry, settings.USER_CACHE_TIMEOUT)
+    return entry
+
+
+def get_cached_user(user_id):
+    entry = get_cached_entry(user_id)
+    if entry is None:
+        return None
+    # from_db 依模型欄位順序接收值，沒有提供的欄位成為延遲載入
+    UserModel = get_user_model()
+    names = [field.attname for field in UserModel._meta.concrete_fields if field.attname in entry['user']]
+    user = UserModel.from_db(DEFAULT_DB_ALIAS, names, [entry['user'][name] for name in names])
+    user._session_auth_hash = entry['session_auth_hash']
+    user._player_ids = (entry['player_id'], entry['team_id'])
+    return user
+
+
+def get_player_ids(user):
+    """目前使用者的 (player_id, team_id)；沒有球員資料時皆為 None"""
+    ids = getattr(user, '_player_ids', None)
+    if ids is None:
+        entry = get_cached_entry(user.pk)
+        ids = (entry['player_id'], entry['team_id']) if entry else (None, None)
+        user._player_ids = ids
+    return ids
+
+
+def invalidate_user(user_id):
+    """立即清除使用者的快取，交易提交後再清除一次（不在交易中時只清除一次）"""
+    if user_id is not None:
+        key = _cache_key(user_id)
+        cache.delete(key)
+        if transaction.get_connection().in_atomic_block:
+            transaction.on_commit(lambda: cache.delete(key))
+
+
+def invalidate_user_on_save(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+def invalidate_player_on_save(sender, instance, **kwargs):
+    invalidate_user(instance.user_id)
@@ -14,3 +14,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'football_management_system.settings')
 
 application = get_asgi_application()
+
+from football_management_system.selfcheck import log_startup_report  # noqa: E402
+
+log_startup_report()
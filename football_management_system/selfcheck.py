@@ -0,0 +1,81 @@
+"""
+啟動自我檢查：列出實際生效、與效能相關的設定，並在生產模式下提示不建議的組合。
+
+wsgi / asgi 啟動時會寫入一次 log；也可用 `python manage.py perf_selfcheck` 手動查看。
+"""
+import logging
+
+from django.conf import settings
+
+logger = logging.getLogger('football_management_system')
+
+CACHED_LOADER = 'django.template.loaders.cached.Loader'
+
+
+def _template_loaders():
+    options = settings.TEMPLATES[0].get('OPTIONS', {})
+    loaders = options.get('loaders')
+    if loaders is None:
+        # 未指定 loaders 時由 Django 自動組合（Django 4.1 起預設包上快取載入器）
+        return 'auto (APP_DIRS=%s)' % settings.TEMPLATES[0].get('APP_DIRS', False)
+    names = []
+    for loader in loaders:
+        names.append(loader[0] if isinstance(loader, (list, tuple)) else loader)
+    return ', '.join(names)
+
+
+def effective_settings():
+    """回傳 [(項目, 值), ...]，依顯示順序排列"""
+    db = settings.DATABASES['default']
+    cache = settings.CACHES['default']
+    return [
+        ('profile', getattr(settings, 'DJANGO_ENV', 'development')),
+        ('DEBUG', settings.DEBUG),
+        ('template loaders', _template_loaders()),
+        ('db engine', db['ENGINE']),
+        ('CONN_MAX_AGE', db.get('CONN_MAX_AGE', 0)),
+        ('CONN_HEALTH_CHECKS', db.get('CONN_HEALTH_CHECKS', False)),
+        ('cache backend', cache['BACKEND']),
+        ('cache location', cache.get('LOCATION', '')),
+        ('session engine', settings.SESSION_ENGINE),
+        ('SESSION_COOKIE_SECURE', settings.SESSION_COOKIE_SECURE),
+        ('CSRF_COOKIE_SECURE', settings.CSRF_COOKIE_SECURE),
+    ]
+
+
+def performance_warnings():
+    """生產模式下不建議的設定；開發模式一律回傳空列表"""
+    if not getattr(settings, 'IS_PRODUCTION', False):
+        return []
+
+    warnings = []
+    db = settings.DATABASES['default']
+    if settings.DEBUG:
+        warnings.append('DEBUG 在生產模式下仍為開啟，會記錄所有 SQL 並停用多項最佳化。')
+    if CACHED_LOADER not in _template_loaders():
+        warnings.append('未使用快取樣板載入器，每次請求都會重新讀取與編譯樣板。')
+    if not db.get('CONN_MAX_AGE'):
+        warnings.append('CONN_MAX_AGE 為 0，每個請求都會重新建立資料庫連線。')
+    if db.get('CONN_MAX_AGE') and not db.get('CONN_HEALTH_CHECKS'):
+        warnings.append('已啟用持久連線但未開啟 CONN_HEALTH_CHECKS，斷線後的第一個請求會失敗。')
+    if settings.CACHES['default']['BACKEND'].endswith('LocMemCache'):
+        warnings.append('LocMemCache 不會在多個 worker 之間共用，快取命中率會偏低。')
+    if not settings.SESSION_COOKIE_SECURE or not settings.CSRF_COOKIE_SECURE:
+        warnings.append('Session / CSRF cookie 未設定 Secure。')
+    if settings.SECRET_KEY == 'dev-insecure-key':
+        warnings.append('SECRET_KEY 仍為開發用預設值。')
+    return warnings
+
+
+def report_lines():
+    lines = ['%-22s %s' % (label, value) for label, value in effective_settings()]
+    lines.extend('WARNING: %s' % message for message in performance_warnings())
+    return lines
+
+
+def log_startup_report():
+    for line in report_lines():
+        if line.startswith('WARNING: '):
+            logger.warning(line[len('WARNING: '):])
+        else:
+            logger.info(line)
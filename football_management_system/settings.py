@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 import os
 from decouple import config, Csv
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -21,11 +22,15 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
 
+# 設定檔模式：development（預設）或 production
+DJANGO_ENV = config('DJANGO_ENV', default='development').strip().lower()
+IS_PRODUCTION = DJANGO_ENV == 'production'
+
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = config('SECRET_KEY', default='dev-insecure-key')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = config('DEBUG', default=True, cast=bool)
+DEBUG = config('DEBUG', default=not IS_PRODUCTION, cast=bool)
 
 ALLOWED_HOSTS = config('ALLOWED_HOSTS', default='*', cast=Csv())
 
@@ -71,6 +76,16 @@ TEMPLATES = [
     },
 ]
 
+# 生產模式明確使用快取樣板載入器，樣板只編譯一次後常駐於記憶體
+if IS_PRODUCTION:
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
 WSGI_APPLICATION = 'football_management_system.wsgi.application'
 
 
@@ -91,11 +106,77 @@ if config('DB_ENGINE', default='').strip():
 else:
     DATABASES = {
         'default': {
-            'ENGINE': 'django.db.backends.sqlite3',
+            # 與內建 sqlite3 相同，另外支援 OPTIONS['transaction_mode']
+            'ENGINE': 'football_management_system.sqlite_backend',
             'NAME': BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {
+                'transaction_mode': config('SQLITE_TRANSACTION_MODE', default='IMMEDIATE'),
+            },
         }
     }
 
+# 持久連線：生產模式下重複使用資料庫連線，並在重用前做健康檢查
+DATABASES['default']['CONN_MAX_AGE'] = config(
+    'DB_CONN_MAX_AGE', default=600 if IS_PRODUCTION else 0, cast=int
+)
+DATABASES['default']['CONN_HEALTH_CHECKS'] = config(
+    'DB_CONN_HEALTH_CHECKS', default=IS_PRODUCTION, cast=bool
+)
+
+# SQLite 連線調校（見 football_management_system/sqlite.py）；設為空字典即停用
+SQLITE_PRAGMAS = {
+    'journal_mode': config('SQLITE_JOURNAL_MODE', default='WAL'),
+    'synchronous': config('SQLITE_SYNCHRONOUS', default='NORMAL'),
+    'busy_timeout': config('SQLITE_BUSY_TIMEOUT_MS', default=5000, cast=int),
+    'mmap_size': config('SQLITE_MMAP_SIZE', default=128 * 1024 * 1024, cast=int),
+    'cache_size': config('SQLITE_CACHE_SIZE', default=-20000, cast=int),  # 負值代表 KiB
+    'temp_store': config('SQLITE_TEMP_STORE', default='MEMORY'),
+} if config('SQLITE_TUNING', default=True, cast=bool) else {}
+
+# 寫入序列化佇列（見 team_management/write_queue.py）：每個行程以單一執行緒合併小型寫入
+WRITE_QUEUE_ENABLED = config('WRITE_QUEUE_ENABLED', default=False, cast=bool)
+WRITE_QUEUE_WINDOW_MS = config('WRITE_QUEUE_WINDOW_MS', default=5, cast=int)
+WRITE_QUEUE_MAX_BATCH = config('WRITE_QUEUE_MAX_BATCH', default=50, cast=int)
+WRITE_QUEUE_MAX_RETRIES = config('WRITE_QUEUE_MAX_RETRIES', default=5, cast=int)
+WRITE_QUEUE_BACKOFF_MS = config('WRITE_QUEUE_BACKOFF_MS', default=10, cast=int)
+
+
+# Cache
+# 開發模式使用行程內記憶體快取；生產模式預設使用檔案快取，
+# 讓同一台主機上的多個 gunicorn worker 共用同一份快取
+CACHES = {
+    'default': {
+        'BACKEND': config(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.filebased.FileBasedCache' if IS_PRODUCTION
+            else 'django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': config(
+            'CACHE_LOCATION',
+            default=str(BASE_DIR / 'cache') if IS_PRODUCTION else 'tyfc-default',
+        ),
+        'TIMEOUT': config('CACHE_TIMEOUT', default=300, cast=int),
+        'KEY_PREFIX': 'tyfc',
+    }
+}
+
+
+# Sessions
+# db（預設）｜cached_db：讀取先查共用快取，命中時不需查 django_session｜
+# signed_cookies：session 內容以簽章 cookie 保存於瀏覽器，完全不查資料庫
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_BACKEND = config('SESSION_BACKEND', default='db')
+if SESSION_BACKEND not in SESSION_ENGINES:
+    raise ImproperlyConfigured(
+        'SESSION_BACKEND 必須是 %s 之一' % ', '.join(SESSION_ENGINES)
+    )
+SESSION_ENGINE = SESSION_ENGINES[SESSION_BACKEND]
+SESSION_CACHE_ALIAS = 'default'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -162,6 +243,56 @@ LOGOUT_REDIRECT_URL = '/accounts/login/'
 # Custom User Model
 AUTH_USER_MODEL = 'accounts.CustomUser'
 
+# 每個請求的使用者改由共用快取載入（accounts/user_cache.py）；
+# 保留 ModelBackend 讓部署前以它登入的 session 仍然有效
+AUTHENTICATION_BACKENDS = [
+    'accounts.backends.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+USER_CACHE_TIMEOUT = config('USER_CACHE_TIMEOUT', default=300, cast=int)
+
+# 儀表板全站計數器（使用者數、球隊數、即將進行的比賽數）的快取秒數
+DASHBOARD_CACHE_TIMEOUT = config('DASHBOARD_CACHE_TIMEOUT', default=60, cast=int)
+
+# 儀表板與統計頁的面板查詢是否以執行緒池同時執行（team_management/panels.py，只在 ASGI 下）
+ASYNC_PANEL_CONCURRENCY = config('ASYNC_PANEL_CONCURRENCY', default=True, cast=bool)
+
+# 即時推播（team_management/live.py）：SSE 心跳間隔、單條連線最長秒數、每條連線的待送訊息上限
+LIVE_KEEPALIVE_SECONDS = config('LIVE_KEEPALIVE_SECONDS', default=15, cast=int)
+LIVE_STREAM_MAX_SECONDS = config('LIVE_STREAM_MAX_SECONDS', default=300, cast=int)
+LIVE_SUBSCRIBER_QUEUE_SIZE = config('LIVE_SUBSCRIBER_QUEUE_SIZE', default=100, cast=int)
+
+# 比賽事件衍生統計（team_management/events.py）：寫入事件後是否立即衍生 PlayerStats、每批處理的事件數
+# 正式環境預設 False，寫入只新增事件，由 `python manage.py derive_player_stats --follow`（Procfile 的 worker）在背景處理
+MATCH_EVENT_DERIVE_INLINE = config('MATCH_EVENT_DERIVE_INLINE', default=not IS_PRODUCTION, cast=bool)
+MATCH_EVENT_BATCH_SIZE = config('MATCH_EVENT_BATCH_SIZE', default=500, cast=int)
+
+# 場邊離線同步（team_management/sync.py）：冪等鍵保留天數，逾期由 `python manage.py prune_sync_receipts` 清除
+SYNC_RECEIPT_RETENTION_DAYS = config('SYNC_RECEIPT_RETENTION_DAYS', default=30, cast=int)
+
+# 球員統計匯出（team_management/exports.py）：資料庫游標每次讀取的列數
+EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', default=2000, cast=int)
+
+# CSV 批次匯入（team_management/imports.py）：每批驗證與寫入的列數，每批一個交易
+IMPORT_CHUNK_SIZE = config('IMPORT_CHUNK_SIZE', default=500, cast=int)
+
+# 賽季封存（team_management/archive.py）：聯賽結束超過此天數後，`python manage.py archive_seasons` 才會封存
+ARCHIVE_AFTER_DAYS = config('ARCHIVE_AFTER_DAYS', default=365, cast=int)
+
+# 統計立方體（team_management/cube.py）：增量更新時往前多檢查的秒數，涵蓋更新期間才提交的交易
+CUBE_REFRESH_OVERLAP_SECONDS = config('CUBE_REFRESH_OVERLAP_SECONDS', default=300, cast=int)
+
+# 分析用欄式快照（team_management/columnar.py）：NumPy 欄位檔的目錄與保留的版本數
+ANALYTICS_SNAPSHOT_DIR = config('ANALYTICS_SNAPSHOT_DIR', default=str(BASE_DIR / 'analytics'))
+ANALYTICS_SNAPSHOT_KEEP = config('ANALYTICS_SNAPSHOT_KEEP', default=2, cast=int)
+
+# 排行榜與百分位數（team_management/leaderboards.py、percentiles.py）：出場時間達此分鐘數才列入每 90 分鐘指標
+LEADERBOARD_MIN_MINUTES = config('LEADERBOARD_MIN_MINUTES', default=90, cast=int)
+
+# 出席矩陣（team_management/availability.py）：快取涵蓋的比賽場數與快取秒數
+AVAILABILITY_MAX_MATCHES = config('AVAILABILITY_MAX_MATCHES', default=20, cast=int)
+AVAILABILITY_CACHE_TIMEOUT = config('AVAILABILITY_CACHE_TIMEOUT', default=300, cast=int)
+
 
 
 CSRF_TRUSTED_ORIGINS = [
@@ -172,6 +303,27 @@ CSRF_TRUSTED_ORIGINS = [
 ]
 
 # 簡化CSRF設置，使用預設值
-CSRF_COOKIE_SECURE = False  # 開發環境設為False
+CSRF_COOKIE_SECURE = config('CSRF_COOKIE_SECURE', default=IS_PRODUCTION, cast=bool)  # 開發環境為False
 CSRF_USE_SESSIONS = False   # 使用cookie而非session存儲CSRF token
+SESSION_COOKIE_SECURE = config('SESSION_COOKIE_SECURE', default=IS_PRODUCTION, cast=bool)
+
+if IS_PRODUCTION:
+    # 反向代理（Nginx / PaaS）以 X-Forwarded-Proto 告知原始協定
+    SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
+
+
+# Logging
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'football_management_system': {
+            'handlers': ['console'],
+            'level': config('APP_LOG_LEVEL', default='INFO'),
+        },
+    },
+}
 
@@ -0,0 +1,50 @@
+"""
+SQLite 連線調校
+
+每當建立新的 SQLite 連線時（connection_created 訊號），依 settings.SQLITE_PRAGMAS
+套用 PRAGMA：WAL 讓讀取不會被寫入阻擋、synchronous=NORMAL 在 WAL 下只於
+checkpoint 時 fsync、busy_timeout 讓多個 gunicorn worker 同時寫入時排隊等待
+而不是立即回報 `database is locked`。
+"""
+import re
+
+from django.conf import settings
+
+# 允許透過設定調整的 PRAGMA；值一律經過格式檢查後才組成 SQL
+ALLOWED_PRAGMAS = (
+    'journal_mode',
+    'synchronous',
+    'busy_timeout',
+    'mmap_size',
+    'cache_size',
+    'temp_store',
+    'wal_autocheckpoint',
+    'foreign_keys',
+)
+
+_VALUE_RE = re.compile(r'^-?[A-Za-z0-9_]+$')
+
+
+def pragma_statements(pragmas):
+    """將 {名稱: 值} 轉為 PRAGMA 語句列表，未知名稱或不合法的值會丟出 ValueError"""
+    statements = []
+    for name, value in pragmas.items():
+        if name not in ALLOWED_PRAGMAS:
+            raise ValueError(f'不支援的 SQLite PRAGMA: {name}')
+        value = str(value)
+        if not _VALUE_RE.match(value):
+            raise ValueError(f'PRAGMA {name} 的值不合法: {value!r}')
+        statements.append(f'PRAGMA {name} = {value}')
+    return statements
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """connection_created 訊號處理器"""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', None)
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for statement in pragma_statements(pragmas):
+            cursor.execute(statement)
@@ -0,0 +1,38 @@
+"""
+SQLite 後端：支援 OPTIONS['transaction_mode']（與 Django 5.1 相同的設定方式）
+
+Django 4.2 一律以 `BEGIN`（DEFERRED）開始交易；在 WAL 模式下，交易先讀後寫
+（例如 update_or_create）時若其他 worker 已先提交，升級寫入鎖會立即失敗，
+busy_timeout 完全派不上用場。改用 `BEGIN IMMEDIATE` 讓交易一開始就排隊取得寫入鎖。
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'EXCLUSIVE', 'IMMEDIATE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    @property
+    def transaction_mode(self):
+        mode = self.settings_dict['OPTIONS'].get('transaction_mode')
+        if mode is None:
+            return None
+        mode = mode.upper()
+        if mode not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                "settings.DATABASES['%s']['OPTIONS']['transaction_mode'] 必須是 %s 之一"
+                % (self.alias, ', '.join(TRANSACTION_MODES))
+            )
+        return mode
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        kwargs.pop('transaction_mode', None)
+        return kwargs
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.transaction_mode
+        if mode is None:
+            super()._start_transaction_under_autocommit()
+        else:
+            self.cursor().execute(f'BEGIN {mode}')
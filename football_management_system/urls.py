@@ -13,6 +13,7 @@ urlpatterns = [
     path('accounts/', include('accounts.urls')),
     path('', redirect_to_login),
     path('dashboard/', include('team_management.urls')),
+    path('api/v1/', include('team_management.api_urls')),
     path('healthz', healthz),
 ]
 
@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'football_management_system.settings')
 
 application = get_wsgi_application()
+
+from football_management_system.selfcheck import log_startup_report  # noqa: E402
+
+log_startup_report()
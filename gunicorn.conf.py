@@ -0,0 +1,20 @@
+"""
+gunicorn 設定（gunicorn 會自動讀取工作目錄下的 gunicorn.conf.py）
+
+GUNICORN_MODE=wsgi（預設）以同步 worker 執行 wsgi.py；
+GUNICORN_MODE=asgi 改以 uvicorn worker 執行 football_management_system.asgi，
+儀表板與統計頁的 async view 可在事件迴圈中同時等待各面板的查詢，
+單一 worker 也能同時服務多個請求。
+"""
+import os
+
+mode = os.environ.get('GUNICORN_MODE', 'wsgi')
+
+bind = '0.0.0.0:' + os.environ.get('PORT', '8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', '3'))
+
+if mode == 'asgi':
+    wsgi_app = 'football_management_system.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'wsgi:application'
@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Team, Player, League, Match, PlayerStats, PlayerMatchParticipation
+from .models import (
+    AnalyticsCube, Team, Player, League, Match, MatchEvent, PlayerStats, PlayerMatchParticipation, PlayerSeasonSummary,
+    TeamSeasonSummary,
+)
 
 @admin.register(Team)
 class TeamAdmin(admin.ModelAdmin):
@@ -15,7 +18,7 @@ class PlayerAdmin(admin.ModelAdmin):
 
 @admin.register(League)
 class LeagueAdmin(admin.ModelAdmin):
-    list_display = ['name', 'season', 'group', 'start_date', 'end_date']
+    list_display = ['name', 'season', 'group', 'start_date', 'end_date', 'archived_at']
     list_filter = ['group', 'season']
     search_fields = ['name', 'season']
 
@@ -43,3 +46,42 @@ class PlayerMatchParticipationAdmin(admin.ModelAdmin):
     list_filter = ["is_participating", "match__league", "match__match_date"]
     search_fields = ["player__nickname", "match__team__name", "match__opponent_name"]
 
+@admin.register(MatchEvent)
+class MatchEventAdmin(admin.ModelAdmin):
+    list_display = ["match", "player", "event_type", "minute", "delta", "source", "created_at"]
+    list_filter = ["event_type", "source", "match__league"]
+    search_fields = ["player__nickname", "match__team__name", "match__opponent_name"]
+
+    # 事件只能新增；更正請新增 delta 為負值的事件
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+class SummaryAdmin(admin.ModelAdmin):
+    """由指令產生的彙總表（archive_seasons、refresh_stats_cube），只供查閱"""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(TeamSeasonSummary)
+class TeamSeasonSummaryAdmin(SummaryAdmin):
+    list_display = ["team", "league", "matches", "wins", "draws", "losses", "goals_for", "goals_against"]
+    list_filter = ["league"]
+    search_fields = ["team__name", "league__name"]
+
+@admin.register(PlayerSeasonSummary)
+class PlayerSeasonSummaryAdmin(SummaryAdmin):
+    list_display = ["player", "league", "matches_played", "goals", "assists", "yellow_cards", "red_cards"]
+    list_filter = ["league"]
+    search_fields = ["player__nickname", "league__name"]
+
+@admin.register(AnalyticsCube)
+class AnalyticsCubeAdmin(SummaryAdmin):
+    list_display = ["team", "league", "month", "matches", "wins", "draws", "losses", "goals", "minutes_played"]
+    list_filter = ["season", "group", "month"]
+    search_fields = ["team__name", "league__name"]
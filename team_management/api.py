@@ -0,0 +1,564 @@
+"""
+JSON API（/api/v1/）
+
+行動版 App 原本只能解析伺服器產生的 HTML。這裡以 JSON 提供球隊、球員、聯賽、
+比賽、球員統計與參加狀態的讀寫，權限沿用各 QuerySet 的 visible_to() /
+editable_by()，與管理頁面的規則一致。
+
+- 讀取不建立模型物件：每個資源宣告「API 欄位 → ORM 路徑」，依 ?fields= 只取
+  需要的欄位，以 values_list() 直接輸出。跨關聯的路徑（例如 team__name）在
+  SQL 中 JOIN，沒有被要求的關聯不會 JOIN，等同依端點調整 select_related；
+  多對多欄位（球隊的參加聯賽）只在被要求時，對該頁的 id 另外查一次中介表，
+  等同 prefetch_related。
+- 分頁使用游標（依 id 遞增的 keyset）：WHERE id > 游標 ORDER BY id LIMIT n，
+  不論翻到第幾頁都是索引範圍掃描，也不會因為期間新增資料而重複或漏掉列。
+- 寫入（POST 新增、PATCH 部分更新、DELETE）透過 run_write() 執行，以
+  full_clean() 驗證；球員統計改寫為事件（見 events.py），不直接修改計數欄位。
+
+版本放在網址中（v1）；欄位的意義改變時新增 v2，不修改既有版本的輸出。
+"""
+import base64
+import binascii
+import json
+from functools import wraps
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+from accounts.user_cache import get_player_ids
+
+from .availability import DEFAULT_MATCHES, availability_matrix, max_matches
+from .events import COUNTED_FIELDS, delete_manual_stats, save_manual_stats
+from .leaderboards import DEFAULT_TOP, MAX_TOP, METRICS, leaderboard, scope_from_params
+from .models import League, Match, Player, PlayerMatchParticipation, PlayerStats, Team
+from .write_queue import run_write
+
+User = get_user_model()
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class ApiError(Exception):
+    def __init__(self, status, error):
+        super().__init__(error)
+        self.status = status
+        self.error = error
+
+
+def _encode_cursor(pk):
+    return base64.urlsafe_b64encode(str(pk).encode()).decode().rstrip('=')
+
+
+def _decode_cursor(value):
+    try:
+        return int(base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ApiError(400, 'cursor 不正確。')
+
+
+def _page_size(value):
+    if value is None:
+        return DEFAULT_PAGE_SIZE
+    try:
+        size = int(value)
+    except ValueError:
+        raise ApiError(400, 'limit 必須是整數。')
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+class Resource:
+    """一個 API 資源；子類別宣告欄位與權限"""
+    model = None
+    # API 欄位 → ORM 路徑（可跨關聯）
+    fields = {}
+    # 未指定 ?fields= 時輸出的欄位
+    default_fields = ()
+    # 查詢參數 → 欄位查詢
+    filters = {}
+    # 可寫入的一般欄位
+    writable = ()
+    # 可寫入的外鍵 → 取得可選範圍的方法名稱，method(user) 回傳 QuerySet
+    relations = {}
+    # 多對多欄位 → (中介表的來源欄位, 目標欄位, 可選範圍的方法名稱)
+    many = {}
+    # 球員可讀取的範圍：(欄位查詢, 'player' 或 'team')；None 表示球員不可讀取
+    player_scope = None
+
+    def readable(self, user):
+        if user.user_type in ('admin', 'coach'):
+            return self.model.objects.visible_to(user)
+        if self.player_scope is None:
+            return self.model.objects.none()
+        lookup, kind = self.player_scope
+        player_id, team_id = get_player_ids(user)
+        value = player_id if kind == 'player' else team_id
+        return self.model.objects.filter(**{lookup: value}) if value is not None else self.model.objects.none()
+
+    def editable(self, user):
+        return self.model.objects.editable_by(user)
+
+    def can_create(self, user):
+        return user.user_type in ('admin', 'coach')
+
+    # 讀取
+
+    def select(self, fields_param):
+        if not fields_param:
+            names = list(self.default_fields)
+        else:
+            names = [name.strip() for name in fields_param.split(',') if name.strip()]
+            unknown = [name for name in names if name not in self.fields and name not in self.many]
+            if unknown:
+                raise ApiError(400, f'未知的欄位：{", ".join(unknown)}')
+        if 'id' not in names:
+            names.insert(0, 'id')
+        return names
+
+    def serialize(self, queryset, names):
+        columns = [name for name in names if name in self.fields]
+        rows = [dict(zip(columns, row)) for row in queryset.values_list(*(self.fields[n] for n in columns))]
+        for name in names:
+            if name in self.many:
+                self._attach_many(name, rows)
+        return rows
+
+    def _attach_many(self, name, rows):
+        source, target, _ = self.many[name]
+        through = getattr(self.model, name).through
+        related = {row['id']: [] for row in rows}
+        pairs = through.objects.filter(**{f'{source}__in': list(related)}).values_list(source, target).order_by(target)
+        for owner_id, target_id in pairs:
+            related[owner_id].append(target_id)
+        for row in rows:
+            row[name] = related[row['id']]
+
+    def list(self, user, params):
+        queryset = self.readable(user)
+        for param, lookup in self.filters.items():
+            if params.get(param):
+                value = params[param]
+                # 外鍵篩選（*_id）先轉成整數，不合法的值回傳 400，不會在查詢時才失敗
+                if lookup.endswith('_id'):
+                    try:
+                        value = int(value)
+                    except ValueError:
+                        raise ApiError(400, f'{param} 必須是整數。')
+                queryset = queryset.filter(**{lookup: value})
+        if params.get('cursor'):
+            queryset = queryset.filter(pk__gt=_decode_cursor(params['cursor']))
+        size = _page_size(params.get('limit'))
+        names = self.select(params.get('fields'))
+        try:
+            rows = self.serialize(queryset.order_by('pk')[:size + 1], names)
+        except (ValueError, ValidationError):
+            raise ApiError(400, '查詢參數不正確。')
+        next_cursor = _encode_cursor(rows[size - 1]['id']) if len(rows) > size else None
+        return {'results': rows[:size], 'next_cursor': next_cursor}
+
+    def retrieve(self, user, pk, fields_param=None):
+        rows = self.serialize(self.readable(user).filter(pk=pk), self.select(fields_param))
+        if not rows:
+            raise ApiError(404, '找不到資料。')
+        return rows[0]
+
+    # 寫入（於 run_write 的交易中執行）
+
+    def _editable_object(self, user, pk):
+        obj = self.editable(user).filter(pk=pk).first()
+        if obj is None:
+            if self.readable(user).filter(pk=pk).exists():
+                raise ApiError(403, '您沒有權限修改此資料。')
+            raise ApiError(404, '找不到資料。')
+        return obj
+
+    def _check_fields(self, data):
+        if not isinstance(data, dict):
+            raise ApiError(400, '請求內容必須是 JSON 物件。')
+        unknown = set(data) - set(self.writable) - set(self.relations) - set(self.many)
+        if unknown:
+            raise ApiError(400, f'不可寫入的欄位：{", ".join(sorted(unknown))}')
+
+    def _resolve(self, user, name, value, choices_name):
+        choices = getattr(self, choices_name)(user)
+        try:
+            exists = value is not None and choices.filter(pk=value).exists()
+        except (TypeError, ValueError):
+            exists = False
+        if not exists:
+            raise ApiError(400, {name: ['選擇的項目不存在或無權限使用。']})
+        return int(value)
+
+    def prepare(self, user, obj, data, created):
+        """寫入前的額外處理（子類別覆寫），例如教練只能指定自己"""
+
+    def after_create(self, obj):
+        """新增後的額外處理（子類別覆寫）"""
+
+    def _save(self, user, obj, data, created):
+        self._check_fields(data)
+        for name in self.writable:
+            if name in data:
+                setattr(obj, name, data[name])
+        for name, choices_name in self.relations.items():
+            if name in data:
+                setattr(obj, f'{name}_id', self._resolve(user, name, data[name], choices_name))
+        self.prepare(user, obj, data, created)
+        try:
+            obj.full_clean()
+        except ValidationError as exc:
+            raise ApiError(400, exc.message_dict)
+        obj.save()
+        for name, (_, _, choices_name) in self.many.items():
+            if name in data:
+                if not isinstance(data[name], list):
+                    raise ApiError(400, {name: ['必須是 id 列表。']})
+                ids = [self._resolve(user, name, value, choices_name) for value in data[name]]
+                getattr(obj, name).set(ids)
+        if created:
+            self.after_create(obj)
+        return obj.pk
+
+    def create(self, user, data):
+        if not self.can_create(user):
+            raise ApiError(403, '您沒有權限新增此資料。')
+        return self._save(user, self.model(), data, True)
+
+    def update(self, user, pk, data):
+        return self._save(user, self._editable_object(user, pk), data, False)
+
+    def delete(self, user, pk):
+        self._editable_object(user, pk).delete()
+
+
+def _coach_choices(user):
+    """教練欄位：管理員可指定任一教練，教練只能指定自己"""
+    if user.user_type == 'admin':
+        return User.objects.filter(user_type='coach')
+    return User.objects.filter(pk=user.pk)
+
+
+def _default_coach(user, obj, created):
+    if created and user.user_type == 'coach' and obj.coach_id is None:
+        obj.coach_id = user.pk
+
+
+class TeamResource(Resource):
+    model = Team
+    fields = {
+        'id': 'id', 'name': 'name', 'group': 'group', 'description': 'description',
+        'coach': 'coach_id', 'coach_username': 'coach__username',
+        'created_at': 'created_at', 'updated_at': 'updated_at',
+    }
+    default_fields = ('id', 'name', 'group', 'coach', 'coach_username')
+    writable = ('name', 'group', 'description')
+    relations = {'coach': 'coach_choices'}
+    many = {'leagues': ('team_id', 'league_id', 'league_choices')}
+    player_scope = ('id', 'team')
+
+    def coach_choices(self, user):
+        return _coach_choices(user)
+
+    def league_choices(self, user):
+        return League.objects.visible_to(user)
+
+    def prepare(self, user, obj, data, created):
+        _default_coach(user, obj, created)
+
+
+class LeagueResource(Resource):
+    model = League
+    fields = {
+        'id': 'id', 'name': 'name', 'season': 'season', 'group': 'group',
+        'start_date': 'start_date', 'end_date': 'end_date', 'description': 'description',
+        'coach': 'coach_id', 'coach_username': 'coach__username', 'archived_at': 'archived_at',
+        'created_at': 'created_at', 'updated_at': 'updated_at',
+    }
+    default_fields = ('id', 'name', 'season', 'group', 'start_date', 'end_date')
+    filters = {'season': 'season', 'group': 'group'}
+    writable = ('name', 'season', 'group', 'start_date', 'end_date', 'description')
+    relations = {'coach': 'coach_choices'}
+
+    def coach_choices(self, user):
+        return _coach_choices(user)
+
+    def prepare(self, user, obj, data, created):
+        _default_coach(user, obj, created)
+
+
+class PlayerResource(Resource):
+    model = Player
+    fields = {
+        'id': 'id', 'nickname': 'nickname', 'user': 'user_id',
+        'team': 'team_id', 'team_name': 'team__name', 'jersey_number': 'jersey_number',
+        'positions': 'positions', 'height': 'height', 'weight': 'weight', 'age': 'age',
+        'stamina': 'stamina', 'speed': 'speed', 'technique': 'technique',
+        'created_at': 'created_at', 'updated_at': 'updated_at',
+    }
+    default_fields = ('id', 'nickname', 'team', 'team_name', 'jersey_number', 'positions')
+    filters = {'team': 'team_id'}
+    writable = ('nickname', 'jersey_number', 'positions', 'height', 'weight', 'age', 'stamina', 'speed', 'technique')
+    relations = {'user': 'user_choices', 'team': 'team_choices'}
+    player_scope = ('id', 'player')
+
+    def user_choices(self, user):
+        return User.objects.filter(user_type='player')
+
+    def team_choices(self, user):
+        # 教練只能把球員放進自己的球隊（與 player_create 相同）
+        return Team.objects.editable_by(user)
+
+    def prepare(self, user, obj, data, created):
+        if isinstance(obj.positions, list):
+            obj.positions = ','.join(obj.positions)
+
+    def after_create(self, obj):
+        # 新球員預設參加球隊所有現有比賽
+        PlayerMatchParticipation.objects.bulk_create(
+            [PlayerMatchParticipation(player=obj, match_id=match_id)
+             for match_id in Match.objects.filter(team_id=obj.team_id).values_list('id', flat=True)],
+            ignore_conflicts=True,
+        )
+
+
+class MatchResource(Resource):
+    model = Match
+    fields = {
+        'id': 'id', 'league': 'league_id', 'league_name': 'league__name',
+        'team': 'team_id', 'team_name': 'team__name', 'opponent_name': 'opponent_name',
+        'match_date': 'match_date', 'venue': 'venue', 'our_score': 'our_score',
+        'opponent_score': 'opponent_score', 'status': 'status', 'notes': 'notes',
+        'created_at': 'created_at', 'updated_at': 'updated_at',
+    }
+    default_fields = (
+        'id', 'league', 'team', 'team_name', 'opponent_name', 'match_date',
+        'venue', 'our_score', 'opponent_score', 'status',
+    )
+    filters = {'league': 'league_id', 'team': 'team_id', 'status': 'status'}
+    writable = ('opponent_name', 'match_date', 'venue', 'our_score', 'opponent_score', 'status', 'notes')
+    relations = {'league': 'league_choices', 'team': 'team_choices'}
+    player_scope = ('team_id', 'team')
+
+    def readable(self, user):
+        if user.user_type == 'coach':
+            return Match.objects.listing(user)
+        return super().readable(user)
+
+    def league_choices(self, user):
+        return League.objects.visible_to(user)
+
+    def team_choices(self, user):
+        return Team.objects.visible_to(user)
+
+    def after_create(self, obj):
+        # 球隊所有球員預設參加新比賽
+        PlayerMatchParticipation.objects.bulk_create(
+            [PlayerMatchParticipation(player_id=player_id, match=obj)
+             for player_id in Player.objects.filter(team_id=obj.team_id).values_list('id', flat=True)],
+            ignore_conflicts=True,
+        )
+
+
+STAT_VALUE_FIELDS = tuple(COUNTED_FIELDS.values()) + ('minutes_played',)
+
+
+def _stat_values(data):
+    values = {field: data[field] for field in STAT_VALUE_FIELDS if field in data}
+    if not all(isinstance(value, int) and not isinstance(value, bool) and value >= 0 for value in values.values()):
+        raise ApiError(400, '統計數據必須是非負整數。')
+    return values
+
+
+class PlayerStatsResource(Resource):
+    """統計的進球、助攻、紅黃牌由事件衍生，寫入一律轉為差額事件"""
+    model = PlayerStats
+    fields = {
+        'id': 'id', 'player': 'player_id', 'player_nickname': 'player__nickname',
+        'match': 'match_id', 'match_date': 'match__match_date',
+        'goals': 'goals', 'assists': 'assists', 'yellow_cards': 'yellow_cards',
+        'red_cards': 'red_cards', 'minutes_played': 'minutes_played', 'updated_at': 'updated_at',
+    }
+    default_fields = (
+        'id', 'player', 'player_nickname', 'match', 'match_date',
+        'goals', 'assists', 'yellow_cards', 'red_cards', 'minutes_played',
+    )
+    filters = {'player': 'player_id', 'match': 'match_id'}
+    writable = STAT_VALUE_FIELDS
+    relations = {'player': 'player_choices', 'match': 'match_choices'}
+    player_scope = ('player_id', 'player')
+
+    def player_choices(self, user):
+        return Player.objects.editable_by(user)
+
+    def match_choices(self, user):
+        return Match.objects.editable_by(user)
+
+    def create(self, user, data):
+        if not self.can_create(user):
+            raise ApiError(403, '您沒有權限新增此資料。')
+        self._check_fields(data)
+        player_id = self._resolve(user, 'player', data.get('player'), 'player_choices')
+        match_id = self._resolve(user, 'match', data.get('match'), 'match_choices')
+        save_manual_stats(match_id, {player_id: _stat_values(data)})
+        return PlayerStats.objects.get(player_id=player_id, match_id=match_id).pk
+
+    def update(self, user, pk, data):
+        stats = self._editable_object(user, pk)
+        self._check_fields(data)
+        if set(data) & set(self.relations):
+            raise ApiError(400, '不可變更統計的球員或比賽。')
+        save_manual_stats(stats.match_id, {stats.player_id: _stat_values(data)})
+        return stats.pk
+
+    def delete(self, user, pk):
+        delete_manual_stats(self._editable_object(user, pk))
+
+
+class ParticipationResource(Resource):
+    """參加狀態只能修改 is_participating；新增由球員與比賽建立時自動產生"""
+    model = PlayerMatchParticipation
+    fields = {
+        'id': 'id', 'player': 'player_id', 'player_nickname': 'player__nickname',
+        'match': 'match_id', 'match_date': 'match__match_date',
+        'is_participating': 'is_participating', 'updated_at': 'updated_at',
+    }
+    default_fields = ('id', 'player', 'player_nickname', 'match', 'is_participating')
+    filters = {'player': 'player_id', 'match': 'match_id'}
+    writable = ('is_participating',)
+    player_scope = ('player_id', 'player')
+
+    def readable(self, user):
+        objects = PlayerMatchParticipation.objects
+        if user.user_type == 'admin':
+            return objects.all()
+        if user.user_type == 'coach':
+            return objects.filter(Q(match__team__coach=user) | Q(match__league__coach=user))
+        return super().readable(user)
+
+    def editable(self, user):
+        """管理員、球隊教練（match_participants），或球員本人在比賽開始前（match_participate）"""
+        objects = PlayerMatchParticipation.objects
+        if user.user_type == 'admin':
+            return objects.all()
+        if user.user_type == 'coach':
+            return objects.filter(match__team__coach=user)
+        player_id, team_id = get_player_ids(user)
+        if player_id is None:
+            return objects.none()
+        return objects.filter(player_id=player_id, match__match_date__gt=timezone.now())
+
+    def can_create(self, user):
+        return False
+
+    def delete(self, user, pk):
+        raise ApiError(405, '參加狀態不可刪除。')
+
+
+RESOURCES = {
+    'teams': TeamResource(),
+    'leagues': LeagueResource(),
+    'players': PlayerResource(),
+    'matches': MatchResource(),
+    'player-stats': PlayerStatsResource(),
+    'participations': ParticipationResource(),
+}
+
+
+def _json_body(request):
+    try:
+        return json.loads(request.body or b'{}')
+    except ValueError:
+        raise ApiError(400, 'JSON 格式不正確。')
+
+
+def api_view(view_func):
+    """API 共用處理：未登入回傳 401（不轉址到登入頁），ApiError 轉為 JSON 錯誤"""
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': '請先登入。'}, status=401)
+        try:
+            return view_func(request, *args, **kwargs)
+        except ApiError as exc:
+            return JsonResponse({'error': exc.error}, status=exc.status)
+
+    return _wrapped_view
+
+
+@api_view
+def collection(request, resource):
+    resource = RESOURCES[resource]
+    if request.method == 'GET':
+        return JsonResponse(resource.list(request.user, request.GET))
+    if request.method == 'POST':
+        pk = run_write(resource.create, request.user, _json_body(request))
+        return JsonResponse(resource.retrieve(request.user, pk, request.GET.get('fields')), status=201)
+    return JsonResponse({'error': '不支援的方法。'}, status=405)
+
+
+@api_view
+def item(request, resource, pk):
+    resource = RESOURCES[resource]
+    if request.method == 'GET':
+        return JsonResponse(resource.retrieve(request.user, pk, request.GET.get('fields')))
+    if request.method == 'PATCH':
+        run_write(resource.update, request.user, pk, _json_body(request))
+        return JsonResponse(resource.retrieve(request.user, pk, request.GET.get('fields')))
+    if request.method == 'DELETE':
+        run_write(resource.delete, request.user, pk)
+        return HttpResponse(status=204)
+    return JsonResponse({'error': '不支援的方法。'}, status=405)
+
+
+@api_view
+def leaderboards(request):
+    """排行榜前 N 名與個人名次：?league= 或 ?group=&season=，metric、limit、player
+
+    球員未指定 player 時回傳自己的名次。
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': '不支援的方法。'}, status=405)
+    metric = request.GET.get('metric', 'goals')
+    if metric not in METRICS:
+        raise ApiError(400, f'metric 必須是 {", ".join(METRICS)} 之一。')
+    try:
+        scope = scope_from_params(request.GET)
+    except ValueError:
+        raise ApiError(400, '請指定 league，或 group 與 season。')
+    limit = max(1, min(_page_size(request.GET.get('limit', str(DEFAULT_TOP))), MAX_TOP))
+    player_id = request.GET.get('player')
+    if player_id:
+        try:
+            player_id = int(player_id)
+        except ValueError:
+            raise ApiError(400, 'player 必須是整數。')
+    elif request.user.user_type == 'player':
+        player_id, _ = get_player_ids(request.user)
+    else:
+        player_id = None
+    return JsonResponse(dict({'scope': scope, 'metric': metric}, **leaderboard(scope, metric, limit, player_id)))
+
+
+@api_view
+def availability(request):
+    """球隊即將進行的比賽的出席矩陣：?team=&matches=（預設 10 場）
+
+    未指定 team 時使用第一支可查看的球隊；只有管理員與教練可以查看。
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': '不支援的方法。'}, status=405)
+    teams = Team.objects.visible_to(request.user).order_by('name')
+    try:
+        team_id = int(request.GET['team']) if request.GET.get('team') else None
+        limit = int(request.GET.get('matches', DEFAULT_MATCHES))
+    except ValueError:
+        raise ApiError(400, 'team 與 matches 必須是整數。')
+    team = teams.filter(pk=team_id).first() if team_id is not None else teams.first()
+    if team is None:
+        raise ApiError(404, '找不到資料。')
+    matrix = availability_matrix(team.id, max(1, min(limit, max_matches())))
+    return JsonResponse(dict({'team': team.id}, **matrix))
+
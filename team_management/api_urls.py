@@ -0,0 +1,12 @@
+from django.urls import path
+from . import api
+
+urlpatterns = [
+    path('leaderboards/', api.leaderboards, name='api_leaderboards'),
+    path('availability/', api.availability, name='api_availability'),
+]
+for name in api.RESOURCES:
+    urlpatterns += [
+        path(f'{name}/', api.collection, {'resource': name}, name=f'api_{name}'),
+        path(f'{name}/<int:pk>/', api.item, {'resource': name}, name=f'api_{name}_detail'),
+    ]
@@ -4,3 +4,54 @@ from django.apps import AppConfig
 class TeamManagementConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'team_management'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from football_management_system.sqlite import apply_sqlite_pragmas
+
+        connection_created.connect(apply_sqlite_pragmas, dispatch_uid='tyfc_sqlite_pragmas')
+
+        from django.db.models.signals import post_delete, post_init, post_save, pre_delete
+        from .live import publish_participation
+        from .models import League, Match, Player, PlayerMatchParticipation
+
+        post_save.connect(
+            publish_participation,
+            sender=PlayerMatchParticipation,
+            dispatch_uid='tyfc_live_participation',
+        )
+
+        # 比賽改聯賽、聯賽改組別或賽季、刪除比賽或球員後更新排行榜（team_management/leaderboards.py）
+        from . import leaderboards
+
+        post_init.connect(leaderboards.remember_match_league, sender=Match, dispatch_uid='tyfc_leaderboard_match_init')
+        post_save.connect(leaderboards.update_after_match_league_change, sender=Match,
+                          dispatch_uid='tyfc_leaderboard_match_save')
+        post_init.connect(leaderboards.remember_league_group, sender=League, dispatch_uid='tyfc_leaderboard_league_init')
+        post_save.connect(leaderboards.update_after_league_regroup, sender=League,
+                          dispatch_uid='tyfc_leaderboard_league_save')
+        pre_delete.connect(leaderboards.remember_match_players, sender=Match, dispatch_uid='tyfc_leaderboard_match_pre')
+        post_delete.connect(leaderboards.update_after_match_delete, sender=Match, dispatch_uid='tyfc_leaderboard_match')
+        pre_delete.connect(leaderboards.remember_player_scopes, sender=Player, dispatch_uid='tyfc_leaderboard_player_pre')
+        post_delete.connect(leaderboards.rerank_after_player_delete, sender=Player, dispatch_uid='tyfc_leaderboard_player')
+
+        # 比賽改期或刪除後更新每日負荷（team_management/workload.py）
+        from . import workload
+
+        post_init.connect(workload.remember_match_date, sender=Match, dispatch_uid='tyfc_workload_match_init')
+        post_save.connect(workload.update_after_match_move, sender=Match, dispatch_uid='tyfc_workload_match_save')
+        pre_delete.connect(workload.remember_match_loads, sender=Match, dispatch_uid='tyfc_workload_match_pre')
+        post_delete.connect(workload.update_after_match_delete, sender=Match, dispatch_uid='tyfc_workload_match')
+
+        # 參加狀態、比賽或球員變動後清除出席矩陣快取（team_management/availability.py）
+        from . import availability
+
+        post_save.connect(availability.invalidate_for_participation, sender=PlayerMatchParticipation,
+                          dispatch_uid='tyfc_availability_participation')
+        for model in (Match, Player):
+            post_init.connect(availability.remember_team, sender=model,
+                              dispatch_uid=f'tyfc_availability_{model._meta.model_name}_init')
+            post_save.connect(availability.invalidate_for_team_member, sender=model,
+                              dispatch_uid=f'tyfc_availability_{model._meta.model_name}_save')
+            post_delete.connect(availability.invalidate_for_team_member, sender=model,
+                                dispatch_uid=f'tyfc_availability_{model._meta.model_name}_delete')
@@ -0,0 +1,107 @@
+"""
+賽季封存
+
+結束已久的聯賽仍留在 Match、PlayerStats、PlayerMatchParticipation、MatchEvent
+中，每次掃描、每個索引都要帶著這些歷史資料。封存把一個聯賽整理成兩張
+小型的彙總表後刪除明細：
+
+- TeamSeasonSummary：每支球隊一列（比賽數、勝平負、得失分）
+- PlayerSeasonSummary：每名球員一列（出賽數、進球、助攻、紅黃牌、出場時間）
+
+聯賽本身保留並標記 archived_at。統計頁面把彙總表的數字加到即時資料上，
+總數不會因為封存而改變，只是不再能查看逐場明細。
+
+只有結束日期早於截止日、且沒有尚未結束（已安排、進行中、已延期）比賽的
+聯賽會被封存；每個聯賽在一個交易中完成。
+"""
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .cube import refresh_cube
+from .events import derive_pending
+from .models import (
+    League, Match, PlayerMatchParticipation, PlayerSeasonSummary, PlayerStats, TeamSeasonSummary,
+)
+
+OPEN_STATUSES = ('scheduled', 'in_progress', 'postponed')
+PLAYER_SUMMARY_FIELDS = ('goals', 'assists', 'yellow_cards', 'red_cards', 'minutes_played')
+
+
+def archivable_leagues(before):
+    """結束日期早於 before、尚未封存、且所有比賽都已結束或取消的聯賽"""
+    return League.objects.filter(end_date__lt=before, archived_at__isnull=True).exclude(
+        match__status__in=OPEN_STATUSES
+    )
+
+
+def _team_summaries(league):
+    finished = Q(status='finished')
+    rows = Match.objects.filter(league=league).values('team_id').annotate(
+        matches=Count('pk'),
+        finished=Count('pk', filter=finished),
+        wins=Count('pk', filter=finished & Q(our_score__gt=F('opponent_score'))),
+        draws=Count('pk', filter=finished & Q(our_score=F('opponent_score'))),
+        losses=Count('pk', filter=finished & Q(our_score__lt=F('opponent_score'))),
+        goals_for=Coalesce(Sum('our_score', filter=finished), 0),
+        goals_against=Coalesce(Sum('opponent_score', filter=finished), 0),
+    ).order_by()
+    return [TeamSeasonSummary(league=league, **row) for row in rows]
+
+
+def _sums_by(queryset, key, fields):
+    """{key: {欄位: 加總}}；彙總名稱不能與模型欄位同名，先加上前綴再還原"""
+    rows = queryset.values(key).annotate(
+        **{f'sum_{field}': Coalesce(Sum(field), 0) for field in fields}
+    ).order_by()
+    return {row[key]: {field: row[f'sum_{field}'] for field in fields} for row in rows}
+
+
+def _player_summaries(league):
+    totals = _sums_by(PlayerStats.objects.filter(match__league=league), 'player_id', PLAYER_SUMMARY_FIELDS)
+    # 出賽數與統計頁相同：已結束比賽中選擇參加的場次
+    played = dict(
+        PlayerMatchParticipation.objects.filter(
+            match__league=league, match__status='finished', is_participating=True
+        ).values_list('player_id').annotate(count=Count('pk')).order_by()
+    )
+    return [
+        PlayerSeasonSummary(league=league, player_id=player_id, matches_played=played.get(player_id, 0),
+                            **totals.get(player_id, {}))
+        for player_id in totals.keys() | played.keys()
+    ]
+
+
+def archive_league(league):
+    """把一個聯賽的明細整理成彙總後刪除，回傳 (球隊彙總數, 球員彙總數, 刪除的明細筆數)"""
+    # 先把尚未衍生的事件套用到統計，彙總才會包含所有事件
+    derive_pending()
+    with transaction.atomic():
+        league = League.objects.select_for_update().get(pk=league.pk)
+        if league.archived_at is not None:
+            return 0, 0, 0
+        # 統計立方體保留已封存聯賽的月份彙總，刪除明細前先更新到最新
+        refresh_cube()
+        teams = TeamSeasonSummary.objects.bulk_create(_team_summaries(league))
+        players = PlayerSeasonSummary.objects.bulk_create(_player_summaries(league))
+        # 先標記封存，刪除比賽時排行榜不再逐場重新計算（見 leaderboards.py）
+        league.archived_at = timezone.now()
+        league.save(update_fields=['archived_at', 'updated_at'])
+        # 刪除比賽會連帶刪除統計、參加紀錄與事件
+        deleted, _ = Match.objects.filter(league=league).delete()
+    return len(teams), len(players), deleted
+
+
+def archived_team_totals(team_ids):
+    """{team_id: {'matches', 'wins', 'draws', 'losses'}}，來自已封存的聯賽"""
+    return _sums_by(
+        TeamSeasonSummary.objects.filter(team_id__in=team_ids), 'team_id', ('matches', 'wins', 'draws', 'losses')
+    )
+
+
+def archived_player_totals(**filters):
+    """{player_id: {'matches_played', 'goals', ...}}，來自已封存的聯賽"""
+    return _sums_by(
+        PlayerSeasonSummary.objects.filter(**filters), 'player_id', ('matches_played',) + PLAYER_SUMMARY_FIELDS
+    )
@@ -0,0 +1,148 @@
+"""
+球員出席矩陣（球員 × 即將進行的比賽）
+
+教練原本要逐場打開出賽名單才能看到誰會參加。矩陣以一次樞紐查詢取得：
+對球隊球員的 PlayerMatchParticipation 依球員分組，每場即將進行的比賽一個
+條件彙總欄（MAX(CASE WHEN match_id = ...)），同一個查詢也計算已結束比賽
+的出席次數，作為出席率。
+
+結果以位元組合存進共用快取：每名球員兩個整數，第 i 位代表第 i 場比賽
+「參加」或「不參加」（都沒有設定代表尚未回覆），每支球隊一筆，涵蓋最近
+AVAILABILITY_MAX_MATCHES 場比賽，查詢較少場次時直接取前幾位。
+
+參加狀態儲存，或比賽、球員儲存與刪除時，交易提交後清除該球隊的快取
+（換隊時新舊兩隊都清除，見 apps.py）；bulk_create 等不觸發 signal 的寫入，最晚在
+AVAILABILITY_CACHE_TIMEOUT 秒後更新。第一場比賽開始後快取也視為過期。
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Count, IntegerField, Max, Q, Value, When
+from django.utils import timezone
+
+from .models import Match, Player, PlayerMatchParticipation
+
+AVAILABILITY_KEY = 'team_management:availability:%s'
+DEFAULT_MATCHES = 10
+
+# 儲存在位元組合中的狀態
+YES, NO = 2, 1
+
+
+def max_matches():
+    return getattr(settings, 'AVAILABILITY_MAX_MATCHES', 20)
+
+
+def upcoming_matches(team_id, limit):
+    return list(
+        Match.objects.filter(team_id=team_id, status='scheduled', match_date__gte=timezone.now())
+        .order_by('match_date', 'id').values('id', 'match_date', 'opponent_name', 'venue')[:limit]
+    )
+
+
+def _pivot(team_id, match_ids):
+    """{player_id: (各場狀態, 已結束比賽的出席次數, 已結束比賽的紀錄數)}，一次查詢"""
+    upcoming = Q(match_id__in=match_ids)
+    finished = Q(match__team_id=team_id, match__status='finished')
+    columns = {
+        f'match_{index}': Max(Case(
+            When(match_id=match_id, is_participating=True, then=Value(YES)),
+            When(match_id=match_id, then=Value(NO)),
+            default=Value(0), output_field=IntegerField(),
+        ))
+        for index, match_id in enumerate(match_ids)
+    }
+    rows = PlayerMatchParticipation.objects.filter(upcoming | finished, player__team_id=team_id).values(
+        'player_id'
+    ).annotate(
+        **columns,
+        attended=Count('pk', filter=finished & Q(is_participating=True)),
+        recorded=Count('pk', filter=finished),
+    ).order_by()
+    return {
+        row['player_id']: ([row[name] for name in columns], row['attended'], row['recorded'])
+        for row in rows
+    }
+
+
+def _load(team_id):
+    matches = upcoming_matches(team_id, max_matches())
+    pivot = _pivot(team_id, [match['id'] for match in matches])
+    players = []
+    for player in Player.objects.filter(team_id=team_id).order_by('nickname', 'id').values('id', 'nickname'):
+        states, attended, recorded = pivot.get(player['id'], ([], 0, 0))
+        yes = no = 0
+        for index, state in enumerate(states):
+            if state == YES:
+                yes |= 1 << index
+            elif state == NO:
+                no |= 1 << index
+        players.append((player['id'], player['nickname'], yes, no, attended, recorded))
+    return {'matches': matches, 'players': players}
+
+
+def team_availability(team_id):
+    """球隊的快取矩陣 {'matches': [...], 'players': [(id, 暱稱, 參加位元, 不參加位元, 出席, 紀錄)]}"""
+    key = AVAILABILITY_KEY % team_id
+    entry = cache.get(key)
+    if entry is None or (entry['matches'] and entry['matches'][0]['match_date'] < timezone.now()):
+        entry = _load(team_id)
+        cache.set(key, entry, getattr(settings, 'AVAILABILITY_CACHE_TIMEOUT', 300))
+    return entry
+
+
+def availability_matrix(team_id, limit=DEFAULT_MATCHES):
+    """前 limit 場即將進行的比賽的出席矩陣
+
+    回傳 {'matches': [...], 'players': [...]}；每名球員含 cells（每場 'yes'、'no'
+    或 'unknown'）、available（參加場數）與 attendance_rate（已結束比賽的出席
+    比例，沒有紀錄時為 None）。
+    """
+    entry = team_availability(team_id)
+    matches = entry['matches'][:limit]
+    shown = (1 << len(matches)) - 1
+    players = []
+    for player_id, nickname, yes, no, attended, recorded in entry['players']:
+        cells = [
+            'yes' if yes >> index & 1 else 'no' if no >> index & 1 else 'unknown'
+            for index in range(len(matches))
+        ]
+        players.append({
+            'id': player_id,
+            'nickname': nickname,
+            'cells': cells,
+            'available': bin(yes & shown).count('1'),
+            'attendance_rate': round(attended / recorded, 3) if recorded else None,
+        })
+    return {'matches': matches, 'players': players}
+
+
+def invalidate_team(team_id):
+    """交易提交後清除球隊的矩陣快取"""
+    if team_id is not None:
+        transaction.on_commit(lambda: cache.delete(AVAILABILITY_KEY % team_id))
+
+
+# 參加狀態、比賽、球員變動時的 signal 處理器（連線於 apps.py）
+
+def invalidate_for_participation(sender, instance, **kwargs):
+    # 已載入球員（例如 create(player=...)）時直接取用，不另外查詢
+    if PlayerMatchParticipation.player.is_cached(instance):
+        team_id = instance.player.team_id
+    else:
+        team_id = Player.objects.filter(pk=instance.player_id).values_list('team_id', flat=True).first()
+    invalidate_team(team_id)
+
+
+def remember_team(sender, instance, **kwargs):
+    """post_init：記下載入時的球隊（Match 與 Player 共用；已延遲載入時不記錄）"""
+    instance._availability_team_id = instance.__dict__.get('team_id')
+
+
+def invalidate_for_team_member(sender, instance, **kwargs):
+    """Match 與 Player 共用：兩者都有 team_id；換隊時新舊兩隊都清除"""
+    old = getattr(instance, '_availability_team_id', None)
+    invalidate_team(instance.team_id)
+    if old != instance.team_id:
+        invalidate_team(old)
+    instance._availability_team_id = instance.team_id
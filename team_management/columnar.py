@@ -0,0 +1,303 @@
+"""
+分析用欄式快照（NumPy + mmap）
+
+排行榜、趨勢與百分位數這類分析查詢要彙總整張 PlayerStats，和一般寫入
+共用同一個 SQLite 檔案時會互相競爭。欄式快照由背景指令
+（build_analytics_snapshot）定期把比賽與球員統計的事實資料寫成磁碟上的
+NumPy 欄位檔（每欄一個 .npy），分析端點以 np.load(mmap_mode='r') 直接
+對應檔案：
+
+- 不複製資料：同一台機器上的所有 gunicorn worker 共用作業系統的頁面快取，
+  只讀取用到的欄位與頁面。
+- 以向量運算（布林遮罩、bincount）彙總，完全不查詢交易資料庫；使用者的
+  球隊歸屬也由快照中的 teams 表判斷。
+
+目錄結構（ANALYTICS_SNAPSHOT_DIR）：每次建立一個以時間命名的版本目錄，
+內含 <表>.<欄>.npy 與 meta.json；CURRENT 檔記錄目前的版本。新版本寫完
+後才以 os.replace() 切換 CURRENT，讀取端永遠看到完整的版本；舊版本保留
+ANALYTICS_SNAPSHOT_KEEP 份（仍在使用中的 worker 可繼續讀取已開啟的檔案）。
+
+事實表把比賽的球隊、聯賽與月份（當地時間的 YYYYMM）複製到每一筆統計，
+篩選時不需 JOIN。比分為空時存成 -1。
+
+所有表在同一個唯讀交易中讀取。SQLite 後端預設以 BEGIN IMMEDIATE 開始
+交易（見 sqlite_backend），會在整個建立期間佔住寫入鎖；這裡改以 BEGIN
+（DEFERRED）開始，WAL 模式下讀取交易本身就是一致的快照，也不阻擋寫入。
+PostgreSQL 以 REPEATABLE READ 唯讀交易取得同樣的一致性。
+"""
+import json
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import League, Match, Player, PlayerStats, Team
+
+SNAPSHOT_FORMAT = 1
+CURRENT_FILE = 'CURRENT'
+MATCH_STATUSES = [value for value, label in Match._meta.get_field('status').choices]
+
+# 表 → (查詢, [(欄位, ORM 路徑, dtype)])；dtype 為 None 的欄位是字串，長度依資料決定
+TABLES = {
+    'teams': (Team.objects.all, [
+        ('id', 'id', np.int64), ('coach_id', 'coach_id', np.int64),
+        ('name', 'name', None), ('group', 'group', None),
+    ]),
+    'leagues': (League.objects.all, [
+        ('id', 'id', np.int64), ('name', 'name', None), ('season', 'season', None), ('group', 'group', None),
+    ]),
+    'players': (Player.objects.all, [
+        ('id', 'id', np.int64), ('team_id', 'team_id', np.int64), ('nickname', 'nickname', None),
+    ]),
+    'matches': (Match.objects.all, [
+        ('id', 'id', np.int64), ('team_id', 'team_id', np.int64), ('league_id', 'league_id', np.int64),
+        ('match_date', 'match_date', np.int64), ('month', 'match_date', np.int32),
+        ('status', 'status', np.int8), ('our_score', 'our_score', np.int16),
+        ('opponent_score', 'opponent_score', np.int16),
+    ]),
+    'stats': (PlayerStats.objects.all, [
+        ('player_id', 'player_id', np.int64), ('match_id', 'match_id', np.int64),
+        ('team_id', 'match__team_id', np.int64), ('league_id', 'match__league_id', np.int64),
+        ('month', 'match__match_date', np.int32), ('status', 'match__status', np.int8),
+        ('goals', 'goals', np.int32), ('assists', 'assists', np.int32),
+        ('yellow_cards', 'yellow_cards', np.int32), ('red_cards', 'red_cards', np.int32),
+        ('minutes_played', 'minutes_played', np.int32),
+    ]),
+}
+
+
+def _local_month(value):
+    local = timezone.localtime(value)
+    return local.year * 100 + local.month
+
+
+def _null_as_minus_one(value):
+    return -1 if value is None else value
+
+
+# 需要轉換的欄位 → 轉換函式（資料庫值 → 欄位值）
+CONVERTERS = {
+    'month': _local_month,
+    'match_date': lambda value: int(value.timestamp()),
+    'status': MATCH_STATUSES.index,
+    'our_score': _null_as_minus_one,
+    'opponent_score': _null_as_minus_one,
+    'coach_id': _null_as_minus_one,
+}
+
+
+def _write_table(directory, table, chunk_size):
+    queryset, columns = TABLES[table]
+    rows = queryset().order_by('pk').values_list(*(path for _, path, _ in columns))
+    count = rows.count()
+    converters = [CONVERTERS.get(name) for name, _, _ in columns]
+    values = [
+        np.empty(count, dtype=dtype) if dtype is not None else [None] * count
+        for _, _, dtype in columns
+    ]
+    index = 0
+    for row in rows.iterator(chunk_size=chunk_size):
+        if index == count:
+            break
+        for column, convert, value in zip(values, converters, row):
+            column[index] = convert(value) if convert else value
+        index += 1
+    for (name, _, dtype), column in zip(columns, values):
+        array = column[:index] if dtype is not None else np.array(column[:index], dtype=str)
+        np.save(os.path.join(directory, f'{table}.{name}.npy'), array, allow_pickle=False)
+    return index
+
+
+@contextmanager
+def _read_transaction():
+    """所有查詢讀取同一個資料庫快照，且不取得寫入鎖"""
+    if connection.in_atomic_block:
+        # 已在交易中（例如測試案例），沿用外層交易
+        yield
+        return
+    if connection.vendor != 'sqlite':
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY')
+            yield
+        return
+    # 不經過 atomic()，否則 transaction_mode 會讓交易以 BEGIN IMMEDIATE 開始
+    with connection.cursor() as cursor:
+        cursor.execute('BEGIN')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute('COMMIT')
+
+
+def _snapshot_dir(directory=None):
+    return str(directory or settings.ANALYTICS_SNAPSHOT_DIR)
+
+
+def write_columnar_snapshot(directory=None, chunk_size=None):
+    """建立新版本的欄式快照並切換 CURRENT，回傳 (版本, {表: 筆數})"""
+    directory = _snapshot_dir(directory)
+    chunk_size = chunk_size or getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+    os.makedirs(directory, exist_ok=True)
+    created_at = timezone.now()
+    version = created_at.strftime('%Y%m%dT%H%M%S%f')
+    staging = os.path.join(directory, f'.{version}.tmp')
+    os.makedirs(staging)
+    try:
+        # 所有表在同一個唯讀交易中讀取，統計與比賽彼此一致（見模組說明）
+        with _read_transaction():
+            counts = {table: _write_table(staging, table, chunk_size) for table in TABLES}
+        meta = {
+            'format': SNAPSHOT_FORMAT,
+            'created_at': created_at.isoformat(),
+            'statuses': MATCH_STATUSES,
+            'counts': counts,
+        }
+        with open(os.path.join(staging, 'meta.json'), 'w', encoding='utf-8') as output:
+            json.dump(meta, output)
+        os.rename(staging, os.path.join(directory, version))
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    pointer = os.path.join(directory, f'.{CURRENT_FILE}.tmp')
+    with open(pointer, 'w', encoding='utf-8') as output:
+        output.write(version)
+    os.replace(pointer, os.path.join(directory, CURRENT_FILE))
+    _prune(directory, getattr(settings, 'ANALYTICS_SNAPSHOT_KEEP', 2))
+    return version, counts
+
+
+def _prune(directory, keep):
+    versions = sorted(
+        name for name in os.listdir(directory)
+        if not name.startswith('.') and os.path.isdir(os.path.join(directory, name))
+    )
+    for name in versions[:-keep] if keep > 0 else []:
+        shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+
+class ColumnarSnapshot:
+    """一個版本的欄式快照；欄位在第一次使用時以 mmap 開啟"""
+
+    def __init__(self, path, version):
+        self.path = path
+        self.version = version
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as stream:
+            self.meta = json.load(stream)
+        self.created_at = parse_datetime(self.meta['created_at'])
+        self._columns = {}
+        self._lock = threading.Lock()
+
+    def column(self, table, name):
+        key = f'{table}.{name}'
+        array = self._columns.get(key)
+        if array is None:
+            with self._lock:
+                array = self._columns.get(key)
+                if array is None:
+                    array = np.load(os.path.join(self.path, f'{key}.npy'), mmap_mode='r', allow_pickle=False)
+                    self._columns[key] = array
+        return array
+
+    def status_code(self, status):
+        return self.meta['statuses'].index(status)
+
+    def coach_team_ids(self, coach_id):
+        return self.column('teams', 'id')[self.column('teams', 'coach_id') == coach_id]
+
+    def coach_player_ids(self, coach_id):
+        return self.column('players', 'id')[np.isin(self.column('players', 'team_id'), self.coach_team_ids(coach_id))]
+
+
+_current = None
+_current_lock = threading.Lock()
+
+
+def open_snapshot(directory=None):
+    """目前版本的快照（每個行程共用同一份 mmap）；尚未建立時回傳 None"""
+    global _current
+    directory = _snapshot_dir(directory)
+    try:
+        with open(os.path.join(directory, CURRENT_FILE), encoding='utf-8') as stream:
+            version = stream.read().strip()
+    except FileNotFoundError:
+        return None
+    path = os.path.join(directory, version)
+    snapshot = _current
+    if snapshot is not None and snapshot.path == path:
+        return snapshot
+    with _current_lock:
+        if _current is None or _current.path != path:
+            try:
+                _current = ColumnarSnapshot(path, version)
+            except FileNotFoundError:
+                return None
+        return _current
+
+
+def _group_sums(keys, columns):
+    """依 keys 分組加總（向量化）：回傳 (排序後的鍵, {欄: 各組總和}, 各組筆數)"""
+    unique, inverse = np.unique(keys, return_inverse=True)
+    sums = {
+        name: np.bincount(inverse, weights=values, minlength=len(unique)).astype(np.int64)
+        for name, values in columns.items()
+    }
+    return unique, sums, np.bincount(inverse, minlength=len(unique))
+
+
+def monthly_trends(snapshot, team_ids=None, league_id=None, player_id=None):
+    """每月的比賽結果與球員統計趨勢
+
+    team_ids 為 None 代表不限球隊；指定 player_id 時，比賽結果只計算該球員
+    有統計紀錄的比賽。
+    """
+    finished = snapshot.status_code('finished')
+    stat_mask = np.ones(len(snapshot.column('stats', 'player_id')), dtype=bool)
+    match_mask = snapshot.column('matches', 'status') == finished
+    if team_ids is not None:
+        stat_mask &= np.isin(snapshot.column('stats', 'team_id'), team_ids)
+        match_mask &= np.isin(snapshot.column('matches', 'team_id'), team_ids)
+    if league_id is not None:
+        stat_mask &= snapshot.column('stats', 'league_id') == league_id
+        match_mask &= snapshot.column('matches', 'league_id') == league_id
+    if player_id is not None:
+        stat_mask &= snapshot.column('stats', 'player_id') == player_id
+        match_mask &= np.isin(snapshot.column('matches', 'id'), snapshot.column('stats', 'match_id')[stat_mask])
+
+    ours = snapshot.column('matches', 'our_score')[match_mask]
+    theirs = snapshot.column('matches', 'opponent_score')[match_mask]
+    scored = (ours >= 0) & (theirs >= 0)
+    match_months, results, played = _group_sums(snapshot.column('matches', 'month')[match_mask], {
+        'wins': scored & (ours > theirs),
+        'draws': scored & (ours == theirs),
+        'losses': scored & (ours < theirs),
+    })
+    stat_fields = ('goals', 'assists', 'yellow_cards', 'red_cards', 'minutes_played')
+    stat_months, stats, appearances = _group_sums(snapshot.column('stats', 'month')[stat_mask], {
+        field: snapshot.column('stats', field)[stat_mask] for field in stat_fields
+    })
+
+    months = {}
+    for index, month in enumerate(match_months.tolist()):
+        row = months.setdefault(month, {})
+        row['matches'] = int(played[index])
+        row.update({name: int(values[index]) for name, values in results.items()})
+    for index, month in enumerate(stat_months.tolist()):
+        row = months.setdefault(month, {})
+        row['appearances'] = int(appearances[index])
+        row.update({name: int(values[index]) for name, values in stats.items()})
+
+    empty = dict.fromkeys(('matches', 'wins', 'draws', 'losses', 'appearances') + stat_fields, 0)
+    return [
+        dict(empty, month=f'{month // 100:04d}-{month % 100:02d}', **months[month])
+        for month in sorted(months)
+    ]
@@ -0,0 +1,82 @@
+"""
+條件式 GET 支援
+
+以使用者可見資料的 updated_at 與筆數計算出版本標記，作為 ETag 與
+Last-Modified 回傳；瀏覽器重新整理時若帶上 If-None-Match / If-Modified-Since
+且資料未變動，直接回傳 304，不需查詢列表內容也不需渲染模板。
+"""
+import hashlib
+from functools import wraps
+
+from django.contrib.messages import get_messages
+from django.db.models import Count, Max
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+
+def compute_version(user, queryset, timestamp_fields=('updated_at',)):
+    """以一次彙總查詢計算 (etag, last_modified)
+
+    timestamp_fields 只應包含正向外鍵路徑（例如 'league__updated_at'），
+    這樣 JOIN 不會放大筆數，Count 仍然代表列表筆數。筆數納入標記是為了
+    讓刪除資料（Max 不一定改變）也能使快取失效。
+    """
+    aggregates = {'row_count': Count('pk')}
+    for index, field in enumerate(timestamp_fields):
+        aggregates[f'ts_{index}'] = Max(field)
+    row = queryset.order_by().aggregate(**aggregates)
+
+    timestamps = [row[f'ts_{index}'] for index in range(len(timestamp_fields))]
+    # 頁首會顯示使用者名稱與角色，使用者資料變動也要讓頁面失效
+    timestamps.append(getattr(user, 'updated_at', None))
+
+    token = '|'.join(
+        [str(user.pk), str(row['row_count'])]
+        + [ts.isoformat() if ts else '-' for ts in timestamps]
+    )
+    etag = hashlib.md5(token.encode(), usedforsecurity=False).hexdigest()
+
+    present = [ts for ts in timestamps if ts is not None]
+    last_modified = max(present) if present else None
+    return etag, last_modified
+
+
+def conditional_view(queryset_func, timestamp_fields=('updated_at',)):
+    """替列表頁加上 ETag / Last-Modified 驗證
+
+    queryset_func(user) 回傳該使用者在頁面上可見的資料；回傳 None 代表
+    無權限，此時不產生驗證標記，交由原本的 view 處理轉址。
+    若尚有待顯示的 messages（例如新增、刪除後的轉址），也不回傳 304，
+    避免提示訊息被略過。
+    """
+    def version(request, *args, **kwargs):
+        if not hasattr(request, '_conditional_version'):
+            queryset = queryset_func(request.user)
+            if queryset is None or len(get_messages(request)):
+                request._conditional_version = (None, None)
+            else:
+                request._conditional_version = compute_version(
+                    request.user, queryset, timestamp_fields
+                )
+        return request._conditional_version
+
+    def etag_func(request, *args, **kwargs):
+        return version(request, *args, **kwargs)[0]
+
+    def last_modified_func(request, *args, **kwargs):
+        return version(request, *args, **kwargs)[1]
+
+    def decorator(view_func):
+        conditional = condition(etag_func=etag_func, last_modified_func=last_modified_func)(view_func)
+
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            response = conditional(request, *args, **kwargs)
+            if response.has_header('ETag'):
+                # 個人化頁面：不可被共用快取保存，且每次都需要重新驗證
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+
+        return _wrapped_view
+
+    return decorator
@@ -0,0 +1,209 @@
+"""
+統計立方體（依球隊、聯賽、賽季、月份預先彙總）
+
+管理員想依組別、聯賽、賽季與月份任意切片比賽成績，若每次都從 Match 與
+PlayerStats 重新彙總，每個切片都要掃描一次明細。立方體把明細整理成每個
+(球隊, 聯賽, 月份) 一列的 AnalyticsCube（賽季由聯賽決定，與組別一起複製
+到每一列），切片時只需加總少量的立方體列，不碰明細表。
+
+更新是增量的：CubeCheckpoint 記錄上次更新的時間，refresh_cube() 只重新
+計算有變動的格子：
+
+- updated_at 晚於上次更新的比賽、球員統計、球隊或聯賽所在的格子；
+- 立方體記錄的比賽數與目前不同的格子（比賽被刪除或移到其他月份、聯賽）。
+
+每個格子整列刪除後重新計算，重複計算結果相同；因此檢查時間往前多取
+CUBE_REFRESH_OVERLAP_SECONDS 秒，涵蓋更新期間才提交的交易。刪除球員
+連帶刪除的統計不會留下痕跡，需以 refresh_cube(full=True) 重建。
+已封存聯賽的明細已刪除，其格子保留不再更新。
+"""
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, DateField, F, Q, Sum
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+
+from .models import AnalyticsCube, CubeCheckpoint, Match, PlayerStats
+
+CUBE_CHECKPOINT = 'analytics_cube'
+# 每次重新計算的格子數（每格在查詢中佔 4 個參數）
+CUBE_CELL_BATCH = 100
+
+CUBE_MATCH_MEASURES = ('matches', 'finished', 'wins', 'draws', 'losses', 'goals_for', 'goals_against')
+CUBE_STAT_MEASURES = ('goals', 'assists', 'yellow_cards', 'red_cards', 'minutes_played')
+CUBE_MEASURES = CUBE_MATCH_MEASURES + CUBE_STAT_MEASURES
+
+# 切片維度 → (分組欄位, 顯示名稱)
+CUBE_DIMENSIONS = {
+    'group': (('group',), '組別'),
+    'season': (('season',), '賽季'),
+    'league': (('league__name', 'season'), '聯賽'),
+    'team': (('team__name',), '球隊'),
+    'month': (('month',), '月份'),
+}
+
+# 篩選參數 → 欄位查詢
+CUBE_FILTERS = {
+    'group': 'group',
+    'season': 'season',
+    'league': 'league_id',
+    'team': 'team_id',
+    'month_from': 'month__gte',
+    'month_to': 'month__lte',
+}
+
+
+def _month(path):
+    return TruncMonth(path, output_field=DateField())
+
+
+def _next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _cells_q(cells, prefix=''):
+    """比賽（prefix 為到 Match 的路徑）落在指定格子中的條件"""
+    q = Q()
+    for team_id, league_id, month in cells:
+        start = timezone.make_aware(datetime(month.year, month.month, 1))
+        end = timezone.make_aware(datetime.combine(_next_month(month), datetime.min.time()))
+        q |= Q(**{
+            f'{prefix}team_id': team_id, f'{prefix}league_id': league_id,
+            f'{prefix}match_date__gte': start, f'{prefix}match_date__lt': end,
+        })
+    return q
+
+
+def _compute(match_q, stats_q):
+    """依條件重新彙總明細，回傳尚未寫入的 AnalyticsCube 列"""
+    finished = Q(status='finished')
+    match_rows = Match.objects.filter(match_q).annotate(month=_month('match_date')).values(
+        'team_id', 'league_id', 'month', 'team__group', 'league__season',
+    ).annotate(
+        matches=Count('pk'),
+        finished=Count('pk', filter=finished),
+        wins=Count('pk', filter=finished & Q(our_score__gt=F('opponent_score'))),
+        draws=Count('pk', filter=finished & Q(our_score=F('opponent_score'))),
+        losses=Count('pk', filter=finished & Q(our_score__lt=F('opponent_score'))),
+        goals_for=Coalesce(Sum('our_score', filter=finished), 0),
+        goals_against=Coalesce(Sum('opponent_score', filter=finished), 0),
+    ).order_by()
+    # 彙總名稱不能與模型欄位同名，先加上前綴
+    stat_rows = PlayerStats.objects.filter(stats_q).annotate(month=_month('match__match_date')).values_list(
+        'match__team_id', 'match__league_id', 'month',
+    ).annotate(
+        **{f'sum_{field}': Coalesce(Sum(field), 0) for field in CUBE_STAT_MEASURES}
+    ).order_by()
+    stats = {tuple(row[:3]): dict(zip(CUBE_STAT_MEASURES, row[3:])) for row in stat_rows}
+
+    cells = []
+    for row in match_rows:
+        key = (row['team_id'], row['league_id'], row['month'])
+        cells.append(AnalyticsCube(
+            team_id=key[0], league_id=key[1], month=key[2],
+            group=row['team__group'], season=row['league__season'],
+            **{field: row[field] for field in CUBE_MATCH_MEASURES},
+            **stats.get(key, {}),
+        ))
+    return cells
+
+
+def _dirty_cells(since):
+    """since 之後有變動的格子"""
+    live = Match.objects.filter(league__archived_at__isnull=True)
+    changed = Q(updated_at__gte=since) | Q(team__updated_at__gte=since) | Q(league__updated_at__gte=since)
+    cells = set(live.filter(changed).annotate(month=_month('match_date')).values_list('team_id', 'league_id', 'month'))
+    cells.update(
+        PlayerStats.objects.filter(updated_at__gte=since, match__league__archived_at__isnull=True)
+        .annotate(month=_month('match__match_date'))
+        .values_list('match__team_id', 'match__league_id', 'month')
+    )
+
+    # 比賽被刪除或移動不會留下 updated_at，改以各格的比賽數比對（只掃描比賽表）
+    counts = {
+        (team_id, league_id, month): count
+        for team_id, league_id, month, count in live.annotate(month=_month('match_date'))
+        .values_list('team_id', 'league_id', 'month').annotate(count=Count('pk')).order_by()
+    }
+    stored = AnalyticsCube.objects.filter(league__archived_at__isnull=True).values_list(
+        'team_id', 'league_id', 'month', 'matches'
+    )
+    for team_id, league_id, month, matches in stored:
+        if counts.pop((team_id, league_id, month), None) != matches:
+            cells.add((team_id, league_id, month))
+    # 立方體中還沒有的格子
+    cells.update(counts)
+    return cells
+
+
+def _recompute(cells):
+    cells = sorted(cells)
+    for start in range(0, len(cells), CUBE_CELL_BATCH):
+        batch = cells[start:start + CUBE_CELL_BATCH]
+        stored = Q()
+        for team_id, league_id, month in batch:
+            stored |= Q(team_id=team_id, league_id=league_id, month=month)
+        AnalyticsCube.objects.filter(stored).delete()
+        AnalyticsCube.objects.bulk_create(_compute(_cells_q(batch), _cells_q(batch, 'match__')))
+    return len(cells)
+
+
+def refresh_cube(full=False):
+    """更新統計立方體，回傳重新計算的格子數；full=True 時重建所有未封存聯賽的格子"""
+    with transaction.atomic():
+        checkpoint, _ = CubeCheckpoint.objects.select_for_update().get_or_create(name=CUBE_CHECKPOINT)
+        started = timezone.now()
+        if full or checkpoint.refreshed_until is None:
+            AnalyticsCube.objects.filter(league__archived_at__isnull=True).delete()
+            cells = AnalyticsCube.objects.bulk_create(
+                _compute(Q(league__archived_at__isnull=True), Q(match__league__archived_at__isnull=True)),
+                batch_size=500,
+            )
+            refreshed = len(cells)
+        else:
+            overlap = timedelta(seconds=settings.CUBE_REFRESH_OVERLAP_SECONDS)
+            refreshed = _recompute(_dirty_cells(checkpoint.refreshed_until - overlap))
+        checkpoint.refreshed_until = started
+        checkpoint.save(update_fields=['refreshed_until'])
+    return refreshed
+
+
+def cube_refreshed_until():
+    return CubeCheckpoint.objects.filter(name=CUBE_CHECKPOINT).values_list('refreshed_until', flat=True).first()
+
+
+def _parse_month(value):
+    year, month = value.split('-')
+    return date(int(year), int(month), 1)
+
+
+def filter_cube(queryset, params):
+    """套用切片篩選；值不合法時拋出 ValueError（月份格式為 YYYY-MM）"""
+    lookups = {}
+    for param, lookup in CUBE_FILTERS.items():
+        value = params.get(param)
+        if not value:
+            continue
+        if param in ('league', 'team'):
+            value = int(value)
+        elif param.startswith('month'):
+            value = _parse_month(value)
+        lookups[lookup] = value
+    return queryset.filter(**lookups)
+
+
+def slice_cube(queryset, dimension):
+    """依維度加總立方體列，回傳 (各列, 總計)；每列含 label 與各項數據"""
+    fields, _ = CUBE_DIMENSIONS[dimension]
+    sums = {f'sum_{field}': Coalesce(Sum(field), 0) for field in CUBE_MEASURES}
+    rows = []
+    for row in queryset.values(*fields).annotate(**sums).order_by(*fields):
+        if dimension == 'month':
+            label = row['month'].strftime('%Y-%m')
+        else:
+            label = ' '.join(str(row[field]) for field in fields)
+        rows.append(dict({'label': label}, **{field: row[f'sum_{field}'] for field in CUBE_MEASURES}))
+    totals = queryset.aggregate(**sums)
+    return rows, {field: totals[f'sum_{field}'] for field in CUBE_MEASURES}
@@ -0,0 +1,55 @@
+"""
+儀表板統計資料
+
+首頁的計數器原本每個請求都要分別執行好幾次 count()，教練的球隊卡片還會在
+樣板中逐隊呼叫 team.player_set.count。這裡把計數集中成兩次彙總查詢：
+
+- 使用者總數與已審核數：CustomUser 一次 COUNT ... FILTER
+- 球隊總數與即將進行的比賽數：Team LEFT JOIN Match 一次彙總
+
+這些數字對所有人都相同，放進共用快取並設定短暫的存活時間
+（DASHBOARD_CACHE_TIMEOUT 秒），過期前的些微延遲對首頁可以接受。
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import Team
+
+GLOBAL_COUNTERS_KEY = 'team_management:dashboard:global'
+
+
+def _load_global_counters():
+    counters = get_user_model().objects.aggregate(
+        total_users=Count('pk'),
+        approved_users=Count('pk', filter=Q(is_approved=True)),
+    )
+    # 每場比賽都屬於一支球隊，經由 Team 的反向 JOIN 計數不會漏掉比賽；
+    # JOIN 會放大球隊列數，因此兩者都以 distinct 計數
+    counters.update(Team.objects.aggregate(
+        total_teams=Count('pk', distinct=True),
+        upcoming_matches=Count(
+            'match',
+            filter=Q(match__match_date__gte=timezone.now(), match__status='scheduled'),
+            distinct=True,
+        ),
+    ))
+    return counters
+
+
+def global_counters():
+    """{'total_users', 'approved_users', 'total_teams', 'upcoming_matches'}，短暫快取"""
+    counters = cache.get(GLOBAL_COUNTERS_KEY)
+    if counters is None:
+        counters = _load_global_counters()
+        cache.set(GLOBAL_COUNTERS_KEY, counters, getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 60))
+    return counters
+
+
+def coach_teams(user):
+    """教練的球隊，附加 player_count，樣板不需逐隊查詢球員數"""
+    return list(
+        Team.objects.filter(coach=user).annotate(player_count=Count('player')).order_by('name')
+    )
@@ -0,0 +1,318 @@
+"""
+比賽事件與衍生統計
+
+場邊記錄的事件（進球、助攻、黃牌、紅牌、換人）只會新增到 MatchEvent；
+PlayerStats 的對應欄位不再直接編輯，而是由事件分批衍生：
+
+- 寫入事件只做一次 bulk_create，不逐筆更新統計，也不取得任何鎖，高頻率
+  記錄時成本固定。正式環境預設不在寫入時衍生（MATCH_EVENT_DERIVE_INLINE），
+  由 `python manage.py derive_player_stats --follow` 在背景處理。
+- derive_pending() 鎖定 EventCheckpoint（同一時間只有一個衍生程序），取出
+  一批尚未衍生（derived=False）的事件，依 (球員, 比賽) 合併成一次 F() 累加，
+  並在同一個交易中標記為已衍生；中途失敗時交易回滾，下次重新處理，不會
+  重複計算。
+- rebuild() 以事件加總重新計算統計，結果與逐批衍生相同，可用於驗證或修復。
+- 手動表單（比賽數據、球員統計）改為 adjust_totals()：比較事件加總與目標值，
+  新增差額事件，仍然可以重播。
+
+進度記錄在每個事件上，而不是「最後處理的 id」：PostgreSQL 在插入時就分配
+id，交易 A 插入 10、交易 B 插入 11 並先提交時，以 id 為進度會越過尚未提交
+的 10；逐筆標記則在 10 提交後的下一次衍生照常處理。未衍生的事件以部分
+索引（derived=False）查詢，已衍生的事件不在索引中。
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .leaderboards import rebuild_leaderboards, update_for_stats
+from .models import EventCheckpoint, Match, MatchEvent, PlayerStats
+from .workload import rebuild_loads, update_for_stats as update_loads_for_stats
+
+CHECKPOINT_NAME = 'player_stats'
+
+# 事件類型 → PlayerStats 欄位（換人事件另外推算出場時間）
+COUNTED_FIELDS = {
+    'goal': 'goals',
+    'assist': 'assists',
+    'yellow': 'yellow_cards',
+    'red': 'red_cards',
+}
+EVENT_TYPES_BY_FIELD = {field: event_type for event_type, field in COUNTED_FIELDS.items()}
+SUBSTITUTIONS = ('sub_in', 'sub_out')
+
+# 換上後未換下的球員，出場時間計算到比賽結束
+MATCH_MINUTES = 90
+
+# 單一事件的差額上限（負值用於更正）與可記錄的最晚分鐘（含延長賽、傷停）
+MAX_EVENT_DELTA = 5
+MAX_EVENT_MINUTE = 130
+
+# 手動輸入的單場統計上限；目標總數轉成差額事件，delta 是 SmallIntegerField
+MAX_STAT_VALUES = dict.fromkeys(EVENT_TYPES_BY_FIELD, 99)
+MAX_STAT_VALUES['minutes_played'] = MAX_EVENT_MINUTE
+
+
+def record_events(events, source='sideline'):
+    """新增一批事件；events 為 dict（match_id, player_id, event_type, minute, delta）"""
+    created = MatchEvent.objects.bulk_create([
+        MatchEvent(
+            match_id=event['match_id'],
+            player_id=event['player_id'],
+            event_type=event['event_type'],
+            minute=event.get('minute'),
+            delta=event.get('delta', 1),
+            source=source,
+        )
+        for event in events
+    ])
+    if getattr(settings, 'MATCH_EVENT_DERIVE_INLINE', False):
+        derive_pending()
+    return created
+
+
+def clean_event(item, match_id, team_players):
+    """驗證用戶端送出的單一事件 {"player", "type", "minute", "delta"}，錯誤時拋出 ValueError"""
+    try:
+        player_id = int(item['player'])
+        minute = item.get('minute')
+        minute = None if minute in (None, '') else int(minute)
+        delta = int(item.get('delta', 1))
+        event_type = item['type']
+    except (KeyError, TypeError, ValueError, AttributeError):
+        raise ValueError('事件格式不正確')
+    if (
+        player_id not in team_players
+        or event_type not in dict(MatchEvent.EVENT_TYPES)
+        or not delta
+        or abs(delta) > MAX_EVENT_DELTA
+        or (minute is not None and not 0 <= minute <= MAX_EVENT_MINUTE)
+    ):
+        raise ValueError('事件內容不正確')
+    return {
+        'match_id': match_id, 'player_id': player_id,
+        'event_type': event_type, 'minute': minute, 'delta': delta,
+    }
+
+
+def minutes_from_substitutions(events):
+    """由換人事件推算出場時間；events 為 (event_type, minute, delta)
+
+    第一個事件是換下時視為先發（從第 0 分鐘起算）；被負值事件抵銷的換人不計。
+    """
+    net = defaultdict(int)
+    for event_type, minute, delta in events:
+        net[(event_type, minute or 0)] += delta
+    timeline = sorted(
+        (minute, event_type)
+        for (event_type, minute), count in net.items()
+        for _ in range(max(count, 0))
+    )
+
+    minutes = 0
+    on_since = None
+    started = False
+    for minute, event_type in timeline:
+        if event_type == 'sub_in':
+            if on_since is None:
+                on_since = minute
+        else:
+            if on_since is None and not started:
+                on_since = 0
+            if on_since is not None:
+                minutes += max(minute - on_since, 0)
+            on_since = None
+        started = True
+    if on_since is not None:
+        minutes += max(MATCH_MINUTES - on_since, 0)
+    return minutes
+
+
+def _update_minutes(pairs, now):
+    """重新計算有換人事件的 (球員, 比賽) 出場時間（只看已衍生的事件）"""
+    if not pairs:
+        return
+    timelines = defaultdict(list)
+    rows = MatchEvent.objects.filter(
+        derived=True,
+        event_type__in=SUBSTITUTIONS,
+        match_id__in={match_id for _, match_id in pairs},
+        player_id__in={player_id for player_id, _ in pairs},
+    ).values_list('player_id', 'match_id', 'event_type', 'minute', 'delta')
+    for player_id, match_id, event_type, minute, delta in rows:
+        timelines[(player_id, match_id)].append((event_type, minute, delta))
+    for player_id, match_id in pairs:
+        PlayerStats.objects.filter(player_id=player_id, match_id=match_id).update(
+            minutes_played=minutes_from_substitutions(timelines[(player_id, match_id)]),
+            updated_at=now,
+        )
+
+
+def _ensure_rows(pairs):
+    PlayerStats.objects.bulk_create(
+        [PlayerStats(player_id=player_id, match_id=match_id) for player_id, match_id in pairs],
+        ignore_conflicts=True,
+    )
+
+
+def _apply_batch(events):
+    """把一批事件合併後累加到 PlayerStats"""
+    increments = defaultdict(lambda: defaultdict(int))
+    substitution_pairs = set()
+    for event in events:
+        pair = (event['player_id'], event['match_id'])
+        field = COUNTED_FIELDS.get(event['event_type'])
+        if field:
+            increments[pair][field] += event['delta']
+        else:
+            substitution_pairs.add(pair)
+
+    now = timezone.now()
+    # 只有負值（抵銷）的組合不新增統計列，已刪除的統計不會因更正事件而復活
+    created_pairs = {pair for pair, fields in increments.items() if any(d > 0 for d in fields.values())}
+    _ensure_rows(created_pairs | substitution_pairs)
+    for (player_id, match_id), fields in increments.items():
+        changes = {field: F(field) + delta for field, delta in fields.items() if delta}
+        if changes:
+            PlayerStats.objects.filter(player_id=player_id, match_id=match_id).update(
+                **changes, updated_at=now
+            )
+    _update_minutes(substitution_pairs, now)
+    _stats_changed(set(increments) | substitution_pairs)
+
+
+def _stats_changed(pairs):
+    """PlayerStats 寫入後更新排行榜與每日負荷；pairs 為 (player_id, match_id)"""
+    pairs = set(pairs)
+    update_for_stats(pairs)
+    update_loads_for_stats(pairs)
+
+
+def _locked_checkpoint():
+    checkpoint, created = EventCheckpoint.objects.select_for_update().get_or_create(name=CHECKPOINT_NAME)
+    return checkpoint
+
+
+def derive_pending(batch_size=None):
+    """處理所有尚未衍生的事件，每批一個交易；回傳處理的事件數"""
+    batch_size = batch_size or getattr(settings, 'MATCH_EVENT_BATCH_SIZE', 500)
+    processed = 0
+    while True:
+        with transaction.atomic():
+            checkpoint = _locked_checkpoint()
+            events = list(
+                MatchEvent.objects.filter(derived=False)
+                .order_by('id')
+                .values('id', 'match_id', 'player_id', 'event_type', 'delta')[:batch_size]
+            )
+            if not events:
+                return processed
+            # 先標記，推算出場時間時這批換人事件已包含在內
+            MatchEvent.objects.filter(id__in=[event['id'] for event in events]).update(derived=True)
+            _apply_batch(events)
+            checkpoint.last_event_id = max(checkpoint.last_event_id, events[-1]['id'])
+            checkpoint.save(update_fields=['last_event_id', 'updated_at'])
+        processed += len(events)
+        if len(events) < batch_size:
+            return processed
+
+
+def event_totals(match_id, player_ids):
+    """{(player_id, 欄位): 事件加總}，包含尚未衍生的事件"""
+    rows = MatchEvent.objects.filter(
+        match_id=match_id, player_id__in=player_ids, event_type__in=COUNTED_FIELDS
+    ).values('player_id', 'event_type').annotate(total=Sum('delta')).order_by()
+    return {(row['player_id'], COUNTED_FIELDS[row['event_type']]): row['total'] for row in rows}
+
+
+def adjust_totals(match_id, targets, source='manual'):
+    """把手動輸入的總數轉為差額事件；targets 為 {player_id: {欄位: 目標值}}
+
+    只處理由事件衍生的欄位，其他欄位（出場時間）由呼叫端直接寫入。
+    """
+    current = event_totals(match_id, list(targets))
+    events = []
+    for player_id, values in targets.items():
+        for field, target in values.items():
+            if field not in EVENT_TYPES_BY_FIELD:
+                continue
+            delta = int(target) - current.get((player_id, field), 0)
+            if delta:
+                events.append({
+                    'match_id': match_id, 'player_id': player_id,
+                    'event_type': EVENT_TYPES_BY_FIELD[field], 'delta': delta,
+                })
+    return record_events(events, source=source) if events else []
+
+
+def save_manual_stats(match_id, updates):
+    """寫入手動輸入的統計；updates 為 {player_id: {欄位: 數值}}
+
+    進球、助攻、紅黃牌轉為差額事件，出場時間直接寫入 PlayerStats。有換人事件
+    的球員，出場時間由事件推算（衍生與 rebuild() 都會覆寫），手動輸入的值略過。
+    """
+    adjust_totals(match_id, updates)
+    now = timezone.now()
+    timed = set()
+    if any('minutes_played' in values for values in updates.values()):
+        timed = set(MatchEvent.objects.filter(
+            match_id=match_id, player_id__in=list(updates), event_type__in=SUBSTITUTIONS,
+        ).values_list('player_id', flat=True))
+    for player_id, values in updates.items():
+        player_stats, created = PlayerStats.objects.get_or_create(player_id=player_id, match_id=match_id)
+        if 'minutes_played' in values and player_id not in timed:
+            PlayerStats.objects.filter(id=player_stats.id).update(
+                minutes_played=values['minutes_played'], updated_at=now
+            )
+    _stats_changed((player_id, match_id) for player_id in updates)
+
+
+def delete_manual_stats(stats):
+    """刪除統計：先以抵銷事件歸零，重播事件時這筆統計不會再出現"""
+    adjust_totals(stats.match_id, {stats.player_id: {field: 0 for field in EVENT_TYPES_BY_FIELD}})
+    PlayerStats.objects.filter(id=stats.id).delete()
+    # 刪除的統計不會留下 updated_at；更新比賽時間，統計立方體（cube.py）才會重新計算這場比賽
+    Match.objects.filter(id=stats.match_id).update(updated_at=timezone.now())
+    _stats_changed([(stats.player_id, stats.match_id)])
+
+
+@transaction.atomic
+def rebuild(match_ids=None):
+    """重播事件重新計算 PlayerStats；match_ids 為 None 時處理全部比賽
+
+    先處理完待衍生的事件，再以事件加總覆寫統計，結果應與目前的數字一致。
+    回傳被重新計算的統計筆數。
+    """
+    derive_pending()
+    # 鎖定後才讀取：之後提交的事件尚未衍生，不列入重播，由下一次衍生累加
+    _locked_checkpoint()
+    events = MatchEvent.objects.filter(derived=True)
+    stats = PlayerStats.objects.all()
+    if match_ids is not None:
+        events = events.filter(match_id__in=match_ids)
+        stats = stats.filter(match_id__in=match_ids)
+
+    totals = defaultdict(dict)
+    rows = events.filter(event_type__in=COUNTED_FIELDS).values(
+        'player_id', 'match_id', 'event_type'
+    ).annotate(total=Sum('delta')).order_by()
+    for row in rows:
+        totals[(row['player_id'], row['match_id'])][COUNTED_FIELDS[row['event_type']]] = row['total']
+    substitution_pairs = set(
+        events.filter(event_type__in=SUBSTITUTIONS).values_list('player_id', 'match_id').distinct()
+    )
+
+    now = timezone.now()
+    stats.update(**{field: 0 for field in COUNTED_FIELDS.values()}, updated_at=now)
+    _ensure_rows({pair for pair, fields in totals.items() if any(fields.values())} | substitution_pairs)
+    for (player_id, match_id), fields in totals.items():
+        PlayerStats.objects.filter(player_id=player_id, match_id=match_id).update(**fields, updated_at=now)
+    _update_minutes(substitution_pairs, now)
+    if match_ids is None:
+        rebuild_leaderboards()
+        rebuild_loads()
+    else:
+        _stats_changed(stats.values_list('player_id', 'match_id'))
+    return stats.count()
@@ -0,0 +1,94 @@
+"""
+球員統計匯出（CSV / JSON Lines）
+
+整季的統計可能有數萬列。player_stats 頁面把所有列載入記憶體再交給樣板，
+匯出改為串流：
+
+- values_list() 直接取出需要的欄位（球員、比賽、聯賽以 JOIN 取得），
+  不建立模型物件；.iterator(chunk_size=...) 以資料庫游標分批讀取，
+  不快取整個結果集。
+- 每一列編碼後立即交給 StreamingHttpResponse（或寫入檔案），記憶體用量
+  與列數無關。
+- CSV 開頭加上 UTF-8 BOM，Excel 才能正確顯示中文。
+"""
+import csv
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+# (欄位名稱, ORM 路徑)
+EXPORT_COLUMNS = (
+    ('player_id', 'player_id'),
+    ('player', 'player__nickname'),
+    ('jersey_number', 'player__jersey_number'),
+    ('team', 'match__team__name'),
+    ('match_id', 'match_id'),
+    ('match_date', 'match__match_date'),
+    ('opponent', 'match__opponent_name'),
+    ('league', 'match__league__name'),
+    ('season', 'match__league__season'),
+    ('goals', 'goals'),
+    ('assists', 'assists'),
+    ('yellow_cards', 'yellow_cards'),
+    ('red_cards', 'red_cards'),
+    ('minutes_played', 'minutes_played'),
+)
+EXPORT_HEADERS = tuple(name for name, _ in EXPORT_COLUMNS)
+
+# 匯出格式 → (Content-Type, 副檔名)
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'jsonl': ('application/x-ndjson; charset=utf-8', 'jsonl'),
+}
+
+# 匯出可用的篩選參數 → 欄位查詢
+EXPORT_FILTERS = {
+    'season': 'match__league__season',
+    'league': 'match__league_id',
+    'team': 'match__team_id',
+    'player': 'player_id',
+}
+
+
+def filter_export(queryset, params):
+    """套用匯出篩選；數字欄位的值不合法時拋出 ValueError"""
+    lookups = {}
+    for param, lookup in EXPORT_FILTERS.items():
+        value = params.get(param)
+        if value:
+            lookups[lookup] = value if param == 'season' else int(value)
+    return queryset.filter(**lookups)
+
+
+def export_rows(queryset):
+    """依比賽時間排序的統計列（tuple），以資料庫游標分批讀取"""
+    chunk_size = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+    return queryset.order_by('match__match_date', 'match_id', 'player_id').values_list(
+        *(path for _, path in EXPORT_COLUMNS)
+    ).iterator(chunk_size=chunk_size)
+
+
+class _Echo:
+    """csv.writer 的輸出目標：直接回傳寫入的字串，不累積在記憶體中"""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield '\ufeff' + writer.writerow(EXPORT_HEADERS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def jsonl_lines(rows):
+    encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    for row in rows:
+        yield encoder.encode(dict(zip(EXPORT_HEADERS, row))) + '\n'
+
+
+def export_lines(queryset, fmt):
+    rows = export_rows(queryset)
+    return csv_lines(rows) if fmt == 'csv' else jsonl_lines(rows)
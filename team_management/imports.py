@@ -0,0 +1,357 @@
+"""
+CSV 批次匯入（球員、比賽、球員統計）
+
+建立新賽季時，逐一透過 player_create / match_create 輸入數百名球員與賽程，
+每次還要逐筆建立參加紀錄。匯入改為：
+
+- 以 csv.DictReader 逐列讀取，每 IMPORT_CHUNK_SIZE 列為一批，不把整個檔案
+  載入記憶體。
+- 球隊、聯賽在開始時各查一次建立「名稱 → id」對照表；使用者、既有球員、
+  球衣號碼等依每批實際出現的值查詢一次後保存在記憶體中，驗證每一列時不再
+  查詢資料庫。
+- 每批通過驗證的列以 bulk_create 寫入，並在同一個交易（run_write）中
+  批次建立參加紀錄；某一批寫入失敗時整批回滾並回報錯誤，不影響已提交的批次。
+- bulk_create 不會驗證模型欄位，每列先以 full_clean() 檢查長度、選項等
+  欄位限制（不含外鍵與唯一性，這些已由記憶體中的對照表檢查），超長的字串
+  不會在 PostgreSQL 上造成 DataError。
+- 驗證錯誤逐列回報（CSV 行號與原因），其他列照常匯入。
+
+統計的進球、助攻、紅黃牌一律轉為事件（events.save_manual_stats），
+與手動輸入相同。匯入的使用者為 None 時（管理指令）不限制範圍。
+"""
+import csv
+from collections import defaultdict
+from datetime import datetime
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError
+from django.utils import timezone
+
+from accounts.user_cache import invalidate_user
+
+from .events import COUNTED_FIELDS, MAX_STAT_VALUES, save_manual_stats
+from .models import League, Match, Player, PlayerMatchParticipation, Team
+from .write_queue import run_write
+
+User = get_user_model()
+
+MATCH_DATE_FORMATS = ('%Y-%m-%dT%H:%M', '%Y-%m-%d %H:%M', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d')
+
+
+class RowError(Exception):
+    """單列資料不合法，訊息回報給使用者"""
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        # [(CSV 行號, 錯誤訊息)]
+        self.errors = []
+
+
+def _scoped(queryset, user, editable=False):
+    if user is None:
+        return queryset.all()
+    return queryset.editable_by(user) if editable else queryset.visible_to(user)
+
+
+def _int(row, name, required=False, minimum=None, maximum=None):
+    value = row.get(name, '')
+    if value == '':
+        if required:
+            raise RowError(f'缺少 {name}。')
+        return None
+    try:
+        number = int(value)
+    except ValueError:
+        raise RowError(f'{name} 必須是整數。')
+    if minimum is not None and number < minimum:
+        raise RowError(f'{name} 不可小於 {minimum}。')
+    if maximum is not None and number > maximum:
+        raise RowError(f'{name} 不可大於 {maximum}。')
+    return number
+
+
+def _float(row, name):
+    value = row.get(name, '')
+    if value == '':
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise RowError(f'{name} 必須是數字。')
+
+
+def _full_clean(instance, exclude):
+    """欄位層級的驗證；exclude 為已另外檢查的外鍵欄位（驗證外鍵會逐列查詢資料庫）"""
+    try:
+        instance.full_clean(exclude=exclude, validate_unique=False, validate_constraints=False)
+    except ValidationError as exc:
+        raise RowError('；'.join(
+            f'{field}：{" ".join(messages)}' for field, messages in exc.message_dict.items()
+        ))
+    return instance
+
+
+def _name_map(rows):
+    """(名稱, id) → {名稱: id}；重複的名稱對應到 None，使用時回報為不明確"""
+    mapping = {}
+    for key, pk in rows:
+        mapping[key] = None if key in mapping else pk
+    return mapping
+
+
+def _lookup(mapping, key, label):
+    if key not in mapping:
+        raise RowError(f'找不到{label}「{key}」或沒有權限。')
+    if mapping[key] is None:
+        raise RowError(f'{label}「{key}」名稱重複，無法判斷。')
+    return mapping[key]
+
+
+def _seed_participation(pairs):
+    """批次建立預設參加的紀錄；pairs 為 (player_id, match_id)"""
+    PlayerMatchParticipation.objects.bulk_create(
+        [PlayerMatchParticipation(player_id=player_id, match_id=match_id) for player_id, match_id in pairs],
+        ignore_conflicts=True,
+    )
+
+
+class Importer:
+    # 必要欄位
+    columns = ()
+
+    def __init__(self, user=None):
+        self.user = user
+
+    def prepare_chunk(self, rows):
+        """驗證一批資料前，批次查詢這批資料參照的物件"""
+
+    def clean(self, row):
+        """驗證一列，回傳要寫入的資料；不合法時拋出 RowError"""
+        raise NotImplementedError
+
+    def write(self, cleaned):
+        """寫入一批通過驗證的資料（於 run_write 的交易中執行）"""
+        raise NotImplementedError
+
+    def run(self, stream, chunk_size=None, dry_run=False):
+        chunk_size = chunk_size or getattr(settings, 'IMPORT_CHUNK_SIZE', 500)
+        result = ImportResult()
+        reader = csv.DictReader(stream)
+        missing = [column for column in self.columns if column not in (reader.fieldnames or ())]
+        if missing:
+            result.errors.append((1, f'缺少欄位：{", ".join(missing)}'))
+            return result
+
+        # 第 1 行是標題，資料從第 2 行開始
+        numbered = enumerate(reader, start=2)
+        while chunk := list(islice(numbered, chunk_size)):
+            rows = [(line, {key: (value or '').strip() for key, value in row.items() if key}) for line, row in chunk]
+            self.prepare_chunk([row for _, row in rows])
+            cleaned = []
+            for line, row in rows:
+                try:
+                    cleaned.append(self.clean(row))
+                except RowError as exc:
+                    result.errors.append((line, str(exc)))
+            if cleaned and not dry_run:
+                try:
+                    run_write(self.write, cleaned)
+                except DatabaseError:
+                    # 這批已整批回滾；先前提交的批次保留
+                    result.errors.append((rows[0][0], f'第 {rows[0][0]}–{rows[-1][0]} 行寫入失敗，這批資料未匯入。'))
+                    continue
+            result.created += len(cleaned)
+        return result
+
+
+class PlayerImporter(Importer):
+    """username, nickname, team, age, positions, stamina, speed, technique[, jersey_number, height, weight]"""
+    columns = ('username', 'nickname', 'team', 'age', 'positions', 'stamina', 'speed', 'technique')
+
+    def __init__(self, user=None):
+        super().__init__(user)
+        # 教練只能把球員加入自己的球隊（與 player_create 相同）
+        self.teams = _name_map(_scoped(Team.objects, user, editable=True).values_list('name', 'id'))
+        self.users = {}
+        self.taken_users = set()
+        self.jerseys = {}
+        self.positions = {code for code, _ in Player.POSITION_CHOICES}
+        self.abilities = {code for code, _ in Player.ABILITY_CHOICES}
+
+    def prepare_chunk(self, rows):
+        usernames = {row['username'] for row in rows} - set(self.users)
+        found = list(User.objects.filter(username__in=usernames, user_type='player').values_list('username', 'id'))
+        self.users.update(found)
+        self.taken_users.update(
+            Player.objects.filter(user_id__in=[pk for _, pk in found]).values_list('user_id', flat=True)
+        )
+
+    def _team_jerseys(self, team_id):
+        if team_id not in self.jerseys:
+            self.jerseys[team_id] = set(
+                Player.objects.filter(team_id=team_id, jersey_number__isnull=False).values_list('jersey_number', flat=True)
+            )
+        return self.jerseys[team_id]
+
+    def clean(self, row):
+        user_id = self.users.get(row['username'])
+        if user_id is None:
+            raise RowError(f'找不到球員帳號「{row["username"]}」。')
+        if user_id in self.taken_users:
+            raise RowError(f'帳號「{row["username"]}」已有球員資料。')
+        if not row['nickname']:
+            raise RowError('缺少 nickname。')
+        team_id = _lookup(self.teams, row['team'], '球隊')
+        positions = [code.strip() for code in row['positions'].replace('|', ',').split(',') if code.strip()]
+        if not positions or not set(positions) <= self.positions:
+            raise RowError('positions 必須是 GK、DF、MF、FW 的組合。')
+        for name in ('stamina', 'speed', 'technique'):
+            if row[name] not in self.abilities:
+                raise RowError(f'{name} 必須是 優、佳 或 普。')
+        player = Player(
+            user_id=user_id, nickname=row['nickname'], team_id=team_id,
+            jersey_number=_int(row, 'jersey_number', minimum=0), positions=','.join(positions),
+            height=_float(row, 'height'), weight=_float(row, 'weight'),
+            age=_int(row, 'age', required=True, minimum=0),
+            stamina=row['stamina'], speed=row['speed'], technique=row['technique'],
+        )
+        _full_clean(player, exclude=['user', 'team'])
+        # 全部驗證通過後才佔用球衣號碼與帳號，檔案中後面的列以此檢查重複
+        jerseys = self._team_jerseys(team_id)
+        if player.jersey_number is not None:
+            if player.jersey_number in jerseys:
+                raise RowError(f'球衣號碼 {player.jersey_number} 在此球隊已被使用。')
+            jerseys.add(player.jersey_number)
+        self.taken_users.add(user_id)
+        return player
+
+    def write(self, players):
+        players = Player.objects.bulk_create(players)
+        team_players = defaultdict(list)
+        for player in players:
+            team_players[player.team_id].append(player.pk)
+        # 新球員預設參加球隊所有現有比賽
+        matches = Match.objects.filter(team_id__in=team_players).values_list('team_id', 'id')
+        _seed_participation(
+            (player_id, match_id) for team_id, match_id in matches for player_id in team_players[team_id]
+        )
+        # bulk_create 不送出 post_save，使用者快取的球員資料需另外清除（提交後）
+        for player in players:
+            invalidate_user(player.user_id)
+
+
+class MatchImporter(Importer):
+    """league, season, team, opponent_name, match_date, venue[, status, our_score, opponent_score, notes]"""
+    columns = ('league', 'season', 'team', 'opponent_name', 'match_date', 'venue')
+
+    def __init__(self, user=None):
+        super().__init__(user)
+        leagues = _scoped(League.objects, user).values_list('name', 'season', 'id')
+        self.leagues = _name_map(((name, season), pk) for name, season, pk in leagues)
+        self.teams = _name_map(_scoped(Team.objects, user).values_list('name', 'id'))
+        self.statuses = {code for code, _ in Match._meta.get_field('status').choices}
+
+    def _match_date(self, value):
+        for fmt in MATCH_DATE_FORMATS:
+            try:
+                parsed = datetime.strptime(value, fmt)
+            except ValueError:
+                continue
+            return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+        raise RowError('match_date 格式不正確，請使用 YYYY-MM-DD HH:MM。')
+
+    def clean(self, row):
+        league_key = (row['league'], row['season'])
+        if league_key not in self.leagues:
+            raise RowError(f'找不到聯賽「{row["league"]}（{row["season"]}）」或沒有權限。')
+        league_id = _lookup(self.leagues, league_key, '聯賽')
+        team_id = _lookup(self.teams, row['team'], '球隊')
+        if not row['opponent_name'] or not row['venue']:
+            raise RowError('缺少 opponent_name 或 venue。')
+        status = row.get('status') or 'scheduled'
+        if status not in self.statuses:
+            raise RowError(f'status 必須是 {", ".join(sorted(self.statuses))} 之一。')
+        return _full_clean(Match(
+            league_id=league_id, team_id=team_id, opponent_name=row['opponent_name'],
+            match_date=self._match_date(row['match_date']), venue=row['venue'], status=status,
+            our_score=_int(row, 'our_score', minimum=0), opponent_score=_int(row, 'opponent_score', minimum=0),
+            notes=row.get('notes', ''),
+        ), exclude=['league', 'team'])
+
+    def write(self, matches):
+        matches = Match.objects.bulk_create(matches)
+        team_matches = defaultdict(list)
+        for match in matches:
+            team_matches[match.team_id].append(match.pk)
+        # 球隊所有球員預設參加新比賽
+        players = Player.objects.filter(team_id__in=team_matches).values_list('team_id', 'id')
+        _seed_participation(
+            (player_id, match_id) for team_id, player_id in players for match_id in team_matches[team_id]
+        )
+
+
+STAT_COLUMNS = tuple(COUNTED_FIELDS.values()) + ('minutes_played',)
+
+
+class StatsImporter(Importer):
+    """player_id, match_id[, goals, assists, yellow_cards, red_cards, minutes_played]（與匯出格式相同）
+
+    數值是總數；空白的欄位不變更。
+    """
+    columns = ('player_id', 'match_id')
+
+    def __init__(self, user=None):
+        super().__init__(user)
+        self.players = set()
+        self.matches = set()
+        self.seen = set()
+
+    def prepare_chunk(self, rows):
+        player_ids, match_ids = set(), set()
+        for row in rows:
+            if row['player_id'].isdigit() and row['match_id'].isdigit():
+                player_ids.add(int(row['player_id']))
+                match_ids.add(int(row['match_id']))
+        # 與 player_stats_create 相同：教練需管理球員所屬球隊，且負責比賽的聯賽
+        self.players.update(
+            _scoped(Player.objects, self.user, editable=True).filter(id__in=player_ids).values_list('id', flat=True)
+        )
+        self.matches.update(
+            _scoped(Match.objects, self.user, editable=True).filter(id__in=match_ids).values_list('id', flat=True)
+        )
+
+    def clean(self, row):
+        player_id = _int(row, 'player_id', required=True)
+        match_id = _int(row, 'match_id', required=True)
+        if player_id not in self.players:
+            raise RowError(f'找不到球員 {player_id} 或沒有權限。')
+        if match_id not in self.matches:
+            raise RowError(f'找不到比賽 {match_id} 或沒有權限。')
+        if (player_id, match_id) in self.seen:
+            raise RowError('同一球員與比賽的統計重複出現。')
+        values = {}
+        for name in STAT_COLUMNS:
+            value = _int(row, name, minimum=0, maximum=MAX_STAT_VALUES[name])
+            if value is not None:
+                values[name] = value
+        self.seen.add((player_id, match_id))
+        return match_id, player_id, values
+
+    def write(self, rows):
+        by_match = defaultdict(dict)
+        for match_id, player_id, values in rows:
+            by_match[match_id][player_id] = values
+        for match_id, updates in by_match.items():
+            save_manual_stats(match_id, updates)
+
+
+IMPORTERS = {
+    'players': PlayerImporter,
+    'matches': MatchImporter,
+    'stats': StatsImporter,
+}
@@ -0,0 +1,337 @@
+"""
+射手榜、助攻榜與紀律榜
+
+排行榜若在每次請求時計算，要把聯賽內所有 PlayerStats 依球員分組加總再排序。
+這裡把每名球員在每個範圍的累計數據與名次存在 LeaderboardEntry：
+
+- 範圍有兩種：單一聯賽（league:<id>），以及同組別、同賽季的所有聯賽
+  （group:<組別>:<賽季>）。
+- 指標：進球、助攻、每 90 分鐘進球加助攻（出場未滿 LEADERBOARD_MIN_MINUTES
+  分鐘時為 0）、紀律積分（黃牌 1 分、紅牌 3 分，積分越高名次越前）。
+- 名次採並列同名次：名次 = 1 + 同範圍中數值比自己大的人數。一名球員的數值
+  由 old 變成 new 時，只有數值介於兩者之間的其他球員名次改變（各 ±1），
+  以一次索引範圍 UPDATE 完成；自己的名次是一次索引範圍計數。
+- ±1 的名次調整以其他交易已提交的數值為準。PostgreSQL 預設的 READ
+  COMMITTED 下，兩個交易同時調整同一範圍會互相錯過對方的變動，名次逐漸
+  偏移；因此先以 select_for_update 鎖定範圍涵蓋的聯賽列（同組別、同賽季
+  的所有聯賽），同一範圍的更新依序進行。
+- 查詢前 N 名依 (範圍, 指標) 索引由大到小讀取；個人名次直接讀取
+  (範圍, 球員) 唯一索引那一列，都是 O(log n)。
+
+PlayerStats 的所有寫入都經過 events.py，寫入後以 update_for_stats() 重新
+計算受影響的球員；比賽改聯賽、聯賽改組別或賽季，以及刪除比賽或球員由
+signal 處理（見 apps.py）。
+已封存聯賽的明細已刪除：其聯賽排行榜保留不再更新，組別排行榜則加上
+PlayerSeasonSummary 的賽季彙總（出賽數以彙總的出賽數計）。
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce
+
+from .models import League, LeaderboardEntry, Match, PlayerSeasonSummary, PlayerStats
+
+# 指標 → (欄位, 名次欄位, 顯示名稱)
+METRICS = {
+    'goals': ('goals', 'goals_rank', '進球'),
+    'assists': ('assists', 'assists_rank', '助攻'),
+    'per90': ('contributions_per90', 'per90_rank', '每 90 分鐘進球加助攻'),
+    'discipline': ('discipline', 'discipline_rank', '紀律積分'),
+}
+TOTAL_FIELDS = ('matches', 'goals', 'assists', 'yellow_cards', 'red_cards', 'minutes_played')
+DEFAULT_TOP = 10
+MAX_TOP = 100
+
+
+def league_scope(league_id):
+    return f'league:{league_id}'
+
+
+def group_scope(group, season):
+    return f'group:{group}:{season}'
+
+
+def _derived(totals):
+    """由累計數據計算排行用的指標"""
+    minutes = totals['minutes_played']
+    per90 = 0.0
+    if minutes and minutes >= getattr(settings, 'LEADERBOARD_MIN_MINUTES', 90):
+        per90 = round((totals['goals'] + totals['assists']) * 90 / minutes, 4)
+    return dict(totals, contributions_per90=per90, discipline=totals['yellow_cards'] + 3 * totals['red_cards'])
+
+
+def _in_groups(groups):
+    in_groups = Q()
+    for group, season in groups:
+        in_groups |= Q(group=group, season=season)
+    return in_groups
+
+
+def _lock_groups(groups):
+    """鎖定這些組別、賽季的所有聯賽列（依 id 順序，避免死結），直到交易結束"""
+    if groups:
+        list(League.objects.filter(_in_groups(groups)).select_for_update().order_by('id').values_list('id', flat=True))
+
+
+def _totals(player_ids, leagues, include_missing=False, old_groups=()):
+    """{範圍: {player_id: 累計數據}}；leagues 為 (id, group, season, archived_at)，player_ids 為 None 時不限球員
+
+    include_missing 時，範圍內沒有任何統計的球員也列出（值為 None），呼叫端據此移除舊的排行榜列。
+    old_groups 是聯賽改組別或賽季前的 (組別, 賽季)，一併重新計算。
+    """
+    groups = {(group, season) for _, group, season, _ in leagues} | set(old_groups)
+    live_leagues = {league_id for league_id, _, _, archived_at in leagues if archived_at is None}
+    # 組別範圍包含同組別、同賽季的所有聯賽，不只是這次變動的聯賽
+    group_leagues = League.objects.filter(_in_groups(groups)) if groups else League.objects.none()
+
+    stats = PlayerStats.objects.filter(match__league__in=group_leagues)
+    summaries = PlayerSeasonSummary.objects.filter(league__in=group_leagues)
+    if player_ids is not None:
+        stats = stats.filter(player_id__in=player_ids)
+        summaries = summaries.filter(player_id__in=player_ids)
+
+    totals = defaultdict(lambda: defaultdict(lambda: dict.fromkeys(TOTAL_FIELDS, 0)))
+    rows = stats.values_list(
+        'player_id', 'match__league_id', 'match__league__group', 'match__league__season',
+    ).annotate(
+        # 彙總名稱不能與模型欄位同名，加上前綴
+        sum_matches=Count('pk'), **{f'sum_{field}': Coalesce(Sum(field), 0) for field in TOTAL_FIELDS[1:]}
+    ).order_by()
+    for player_id, league_id, group, season, *values in rows:
+        scopes = [group_scope(group, season)]
+        if league_id in live_leagues:
+            scopes.append(league_scope(league_id))
+        for scope in scopes:
+            entry = totals[scope][player_id]
+            for field, value in zip(TOTAL_FIELDS, values):
+                entry[field] += value
+
+    archived = summaries.values_list(
+        'player_id', 'league__group', 'league__season', 'matches_played', *TOTAL_FIELDS[1:],
+    )
+    for player_id, group, season, *values in archived:
+        entry = totals[group_scope(group, season)][player_id]
+        for field, value in zip(TOTAL_FIELDS, values):
+            entry[field] += value
+
+    if include_missing:
+        for scope in [league_scope(league_id) for league_id in live_leagues] + [group_scope(*key) for key in groups]:
+            for player_id in player_ids:
+                totals[scope].setdefault(player_id, None)
+    return totals
+
+
+def _shift(others, field, rank_field, old, new):
+    """一名球員的數值由 old 變成 new（None 代表不在榜上），調整其他球員的名次"""
+    if old is None and new is None or old == new:
+        return
+    if old is None:
+        others.filter(**{f'{field}__lt': new}).update(**{rank_field: F(rank_field) + 1})
+    elif new is None:
+        others.filter(**{f'{field}__lt': old}).update(**{rank_field: F(rank_field) - 1})
+    elif new > old:
+        others.filter(**{f'{field}__gte': old, f'{field}__lt': new}).update(**{rank_field: F(rank_field) + 1})
+    else:
+        others.filter(**{f'{field}__gte': new, f'{field}__lt': old}).update(**{rank_field: F(rank_field) - 1})
+
+
+def _apply(scope, player_id, totals):
+    entry = LeaderboardEntry.objects.filter(scope=scope, player_id=player_id).first()
+    others = LeaderboardEntry.objects.filter(scope=scope).exclude(player_id=player_id)
+    values = _derived(totals) if totals and totals['matches'] else None
+    if entry is None and values is None:
+        return
+
+    if entry is None:
+        entry = LeaderboardEntry(scope=scope, player_id=player_id)
+    for field, rank_field, _ in METRICS.values():
+        old = getattr(entry, field) if entry.pk else None
+        new = values[field] if values else None
+        _shift(others, field, rank_field, old, new)
+        if new is not None:
+            setattr(entry, rank_field, 1 + others.filter(**{f'{field}__gt': new}).count())
+
+    if values is None:
+        entry.delete()
+        return
+    for field, value in values.items():
+        setattr(entry, field, value)
+    entry.save()
+
+
+@transaction.atomic
+def update_players(player_ids, league_ids, old_groups=()):
+    """重新計算球員在這些聯賽（及其組別）的排行榜列，並調整其他球員的名次
+
+    old_groups 是聯賽改組別或賽季前的 (組別, 賽季)，球員在舊組別範圍的列一併重新計算。
+    """
+    player_ids = set(player_ids)
+    leagues = list(League.objects.filter(id__in=set(league_ids)).values_list('id', 'group', 'season', 'archived_at'))
+    if not player_ids or not leagues:
+        return
+    _lock_groups({(group, season) for _, group, season, _ in leagues} | set(old_groups))
+    for scope, players in _totals(player_ids, leagues, include_missing=True, old_groups=old_groups).items():
+        for player_id in sorted(players):
+            _apply(scope, player_id, players[player_id])
+
+
+def update_for_stats(pairs):
+    """PlayerStats 寫入後呼叫；pairs 為 (player_id, match_id)"""
+    pairs = set(pairs)
+    if not pairs:
+        return
+    league_ids = Match.objects.filter(id__in={match_id for _, match_id in pairs}).values_list('league_id', flat=True)
+    update_players({player_id for player_id, _ in pairs}, set(league_ids))
+
+
+def _assign_ranks(entries):
+    """依數值計算同一範圍內各列的名次（並列同名次）"""
+    for field, rank_field, _ in METRICS.values():
+        ordered = sorted((getattr(entry, field) for entry in entries), reverse=True)
+        first_index = {}
+        for index, value in enumerate(ordered):
+            first_index.setdefault(value, index)
+        for entry in entries:
+            setattr(entry, rank_field, first_index[getattr(entry, field)] + 1)
+
+
+@transaction.atomic
+def rerank(scopes):
+    """依各列目前的數值重新計算整個範圍的名次（刪除球員後使用）"""
+    groups = set()
+    league_ids = []
+    for scope in scopes:
+        kind, _, rest = scope.partition(':')
+        if kind == 'league':
+            league_ids.append(int(rest))
+        else:
+            groups.add(tuple(rest.split(':', 1)))
+    groups.update(League.objects.filter(id__in=league_ids).values_list('group', 'season'))
+    _lock_groups(groups)
+    for scope in scopes:
+        entries = list(LeaderboardEntry.objects.filter(scope=scope))
+        _assign_ranks(entries)
+        LeaderboardEntry.objects.bulk_update(entries, [rank for _, rank, _ in METRICS.values()], batch_size=500)
+
+
+@transaction.atomic
+def rebuild_leaderboards():
+    """由統計重新建立所有排行榜（已封存聯賽的聯賽排行榜保留），回傳列數"""
+    leagues = list(League.objects.values_list('id', 'group', 'season', 'archived_at'))
+    archived = [league_scope(league_id) for league_id, _, _, archived_at in leagues if archived_at is not None]
+    LeaderboardEntry.objects.exclude(scope__in=archived).delete()
+
+    created = 0
+    for scope, players in _totals(None, leagues).items():
+        entries = [
+            LeaderboardEntry(scope=scope, player_id=player_id, **_derived(totals))
+            for player_id, totals in players.items() if totals['matches']
+        ]
+        _assign_ranks(entries)
+        created += len(LeaderboardEntry.objects.bulk_create(entries, batch_size=500))
+    return created
+
+
+def top(scope, metric, limit=DEFAULT_TOP):
+    """範圍內指標前 limit 名（並列時依球員 id）"""
+    field, rank_field, _ = METRICS[metric]
+    return list(
+        LeaderboardEntry.objects.filter(scope=scope).select_related('player__team')
+        .order_by(f'-{field}', 'player_id')[:limit]
+    )
+
+
+def entry_for(scope, player_id):
+    return LeaderboardEntry.objects.filter(scope=scope, player_id=player_id).select_related('player__team').first()
+
+
+def _row(entry, metric):
+    field, rank_field, _ = METRICS[metric]
+    return {
+        'rank': getattr(entry, rank_field),
+        'player': entry.player_id,
+        'nickname': entry.player.nickname,
+        'team': entry.player.team.name,
+        'value': getattr(entry, field),
+        'matches': entry.matches,
+        'minutes_played': entry.minutes_played,
+    }
+
+
+def leaderboard(scope, metric, limit=DEFAULT_TOP, player_id=None):
+    """{'top': 前 limit 名, 'me': player_id 的名次（不在榜上為 None）}"""
+    entry = entry_for(scope, player_id) if player_id is not None else None
+    return {
+        'top': [_row(entry, metric) for entry in top(scope, metric, limit)],
+        'me': _row(entry, metric) if entry else None,
+    }
+
+
+def scope_from_params(params):
+    """由查詢參數（league，或 group 加 season）決定範圍；不完整時拋出 ValueError"""
+    if params.get('league'):
+        return league_scope(int(params['league']))
+    if params.get('group') and params.get('season'):
+        return group_scope(params['group'], params['season'])
+    raise ValueError('請指定 league，或 group 與 season。')
+
+
+# 比賽改聯賽、聯賽改組別或賽季，以及刪除比賽、球員時的 signal 處理器（連線於 apps.py）
+
+def remember_match_league(sender, instance, **kwargs):
+    """post_init：記下載入時的聯賽（已延遲載入時不記錄）"""
+    instance._leaderboard_league_id = instance.__dict__.get('league_id')
+
+
+def update_after_match_league_change(sender, instance, created, **kwargs):
+    """post_save：比賽改到其他聯賽時，重新計算有統計的球員在新舊聯賽的排行榜"""
+    old = getattr(instance, '_leaderboard_league_id', None)
+    instance._leaderboard_league_id = instance.league_id
+    if created or old is None or old == instance.league_id:
+        return
+    players = PlayerStats.objects.filter(match_id=instance.pk).values_list('player_id', flat=True)
+    update_players(players, [old, instance.league_id])
+
+
+def remember_league_group(sender, instance, **kwargs):
+    """post_init：記下載入時的組別與賽季（已延遲載入時不記錄）"""
+    instance._leaderboard_group = (instance.__dict__.get('group'), instance.__dict__.get('season'))
+
+
+def update_after_league_regroup(sender, instance, created, **kwargs):
+    """post_save：聯賽改組別或賽季時，重新計算其球員在新舊組別範圍的排行榜"""
+    old = getattr(instance, '_leaderboard_group', (None, None))
+    instance._leaderboard_group = (instance.group, instance.season)
+    if created or None in old or old == instance._leaderboard_group:
+        return
+    players = set(PlayerStats.objects.filter(match__league=instance).values_list('player_id', flat=True))
+    players.update(PlayerSeasonSummary.objects.filter(league=instance).values_list('player_id', flat=True))
+    update_players(players, [instance.pk], old_groups=[old])
+
+
+def remember_match_players(sender, instance, **kwargs):
+    """pre_delete：記下比賽中有統計的球員（刪除後統計已不存在）；已封存聯賽不處理"""
+    if League.objects.filter(id=instance.league_id, archived_at__isnull=True).exists():
+        instance._leaderboard_players = list(
+            PlayerStats.objects.filter(match_id=instance.pk).values_list('player_id', flat=True)
+        )
+
+
+def update_after_match_delete(sender, instance, **kwargs):
+    players = getattr(instance, '_leaderboard_players', None)
+    if players:
+        update_players(players, [instance.league_id])
+
+
+def remember_player_scopes(sender, instance, **kwargs):
+    instance._leaderboard_scopes = list(
+        LeaderboardEntry.objects.filter(player_id=instance.pk).values_list('scope', flat=True)
+    )
+
+
+def rerank_after_player_delete(sender, instance, **kwargs):
+    scopes = getattr(instance, '_leaderboard_scopes', None)
+    if scopes:
+        rerank(scopes)
@@ -0,0 +1,204 @@
+"""
+即時推播（Server-Sent Events）
+
+行程內的發布／訂閱：資料寫入並提交後（transaction.on_commit）發布一則小型
+JSON 差異，訂閱同一頻道（例如 match:12）的 SSE 連線即時收到並推給瀏覽器，
+頁面只需就地更新對應列，不必重新載入整張名單。
+
+- ASGI 下每條連線只是一個等待中的協程與一個 asyncio.Queue，閒置時幾乎不佔資源。
+  WSGI（預設的同步 gunicorn worker）下一條串流會佔住整個 worker，幾個開著的
+  頁面就能讓全站停擺，因此串流端點回傳 204（EventSource 收到 204 不再重連），
+  頁面也只在 ASGI 下才建立 EventSource（is_asgi()）。
+- 發布端可能位於任何執行緒（請求執行緒、寫入佇列執行緒），投遞一律經由
+  loop.call_soon_threadsafe 交給訂閱者的事件迴圈，執行緒安全。
+- 訂閱是行程內的：多個 worker 行程時，只有寫入發生的行程上的連線會收到推播。
+  即時頁面應由單一 ASGI worker 行程服務（uvicorn 單行程即可維持大量連線）。
+- 每個頻道保留最近幾則訊息；瀏覽器斷線重連時會帶上 Last-Event-ID，
+  期間錯過的訊息會先補送。訂閱者佇列滿了（用戶端太慢）時送出 reset，
+  讓頁面自行重新整理。
+- 每條連線最長 LIVE_STREAM_MAX_SECONDS 秒，之後由 EventSource 自動重連；
+  藉此回收用戶端已離開但伺服器尚未察覺的連線。
+"""
+import asyncio
+import itertools
+import json
+import threading
+import time
+from collections import deque, namedtuple
+
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse, StreamingHttpResponse
+
+Message = namedtuple('Message', 'id event data')
+
+# 佇列溢位時放入的標記，串流收到後送出 reset 並結束
+RESET = Message(0, 'reset', {})
+
+
+class AsyncSubscriber:
+    """在事件迴圈中等待訊息的訂閱者（ASGI）"""
+
+    def __init__(self, maxsize):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+        self.overflowed = False
+
+    def deliver(self, message):
+        try:
+            self.loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            # 事件迴圈已關閉：連線早已結束
+            pass
+
+    def _put(self, message):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            _replace_with_reset(self.queue)
+
+    async def get(self, timeout):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+def _replace_with_reset(target):
+    """清空已溢位的佇列並只留下 RESET（之後的訊息一律略過），用戶端會重新載入完整頁面"""
+    while True:
+        try:
+            target.get_nowait()
+        except asyncio.QueueEmpty:
+            break
+    target.put_nowait(RESET)
+
+
+class Broker:
+    def __init__(self, history=50):
+        self.history = history
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._backlog = {}
+        self._ids = itertools.count(1)
+
+    def publish(self, channel, event, data):
+        with self._lock:
+            message = Message(next(self._ids), event, data)
+            self._backlog.setdefault(channel, deque(maxlen=self.history)).append(message)
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscriber in subscribers:
+            subscriber.deliver(message)
+        return message
+
+    def subscribe(self, channel, subscriber, last_event_id=None):
+        """加入頻道，回傳 last_event_id 之後、仍保留在記憶體中的訊息"""
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscriber)
+            if last_event_id is None:
+                return []
+            return [m for m in self._backlog.get(channel, ()) if m.id > last_event_id]
+
+    def unsubscribe(self, channel, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(channel)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[channel]
+
+    def subscriber_count(self, channel):
+        with self._lock:
+            return len(self._subscribers.get(channel, ()))
+
+
+broker = Broker()
+
+
+def match_channel(match_id):
+    return f'match:{match_id}'
+
+
+def score_channel(match_id):
+    """即時比分頻道，與參加狀態分開，觀看比分的家長不會收到名單變動"""
+    return f'match:{match_id}:score'
+
+
+def publish_on_commit(channel, event, data):
+    """目前交易提交後才發布，回滾的寫入不會被推播出去"""
+    transaction.on_commit(lambda: broker.publish(channel, event, data))
+
+
+def publish_participation(sender, instance, **kwargs):
+    """PlayerMatchParticipation 的 post_save 訊號處理器"""
+    publish_on_commit(match_channel(instance.match_id), 'participation', {
+        'player_id': instance.player_id,
+        'is_participating': instance.is_participating,
+    })
+
+
+def format_event(message):
+    payload = json.dumps(message.data, ensure_ascii=False, separators=(',', ':'))
+    return f'id: {message.id}\nevent: {message.event}\ndata: {payload}\n\n'
+
+
+def _last_event_id(request):
+    value = request.headers.get('Last-Event-ID', '')
+    return int(value) if value.isdigit() else None
+
+
+def _stream_options():
+    return (
+        getattr(settings, 'LIVE_KEEPALIVE_SECONDS', 15),
+        getattr(settings, 'LIVE_STREAM_MAX_SECONDS', 300),
+        getattr(settings, 'LIVE_SUBSCRIBER_QUEUE_SIZE', 100),
+    )
+
+
+async def _async_events(channel, subscriber, backlog, keepalive, max_seconds):
+    try:
+        yield 'retry: 3000\n\n'
+        for message in backlog:
+            yield format_event(message)
+        deadline = time.monotonic() + max_seconds
+        while (remaining := deadline - time.monotonic()) > 0:
+            message = await subscriber.get(min(keepalive, remaining))
+            if message is None:
+                yield ': keepalive\n\n'
+                continue
+            yield format_event(message)
+            if message is RESET:
+                break
+    finally:
+        broker.unsubscribe(channel, subscriber)
+
+
+def is_asgi(request):
+    """請求是否由 ASGI 伺服器服務（只有此時才提供 SSE 串流）"""
+    from django.core.handlers.asgi import ASGIRequest
+
+    return isinstance(request, ASGIRequest)
+
+
+def event_stream_response(request, channel):
+    """建立訂閱 channel 的 SSE 回應；需在事件迴圈中呼叫（async view）
+
+    WSGI 下回傳 204：同步 worker 不能被長時間的連線佔住，EventSource 收到 204
+    後不再重連。
+    """
+    if not is_asgi(request):
+        return HttpResponse(status=204)
+    keepalive, max_seconds, queue_size = _stream_options()
+    subscriber = AsyncSubscriber(queue_size)
+    backlog = broker.subscribe(channel, subscriber, _last_event_id(request))
+    response = StreamingHttpResponse(
+        _async_events(channel, subscriber, backlog, keepalive, max_seconds),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    # 關閉 nginx 等反向代理的回應緩衝，事件才會立即送達
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,2 @@
+# This file makes Python treat the directory as a package
+
@@ -0,0 +1,38 @@
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from team_management.archive import archivable_leagues, archive_league
+
+
+class Command(BaseCommand):
+    help = '把已結束的聯賽整理成賽季彙總，並刪除逐場明細（比賽、統計、參加紀錄與事件）。'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', default=None, help='封存結束日期早於此日（YYYY-MM-DD）的聯賽，預設為 ARCHIVE_AFTER_DAYS 天前')
+        parser.add_argument('--dry-run', action='store_true', help='只列出會封存的聯賽，不做任何修改')
+
+    def handle(self, *args, **options):
+        if options['before']:
+            try:
+                before = date.fromisoformat(options['before'])
+            except ValueError:
+                raise CommandError('--before 必須是 YYYY-MM-DD 格式的日期。')
+        else:
+            before = date.today() - timedelta(days=settings.ARCHIVE_AFTER_DAYS)
+
+        leagues = list(archivable_leagues(before).order_by('end_date'))
+        if not leagues:
+            self.stdout.write(f'沒有 {before} 之前結束、可以封存的聯賽。')
+            return
+
+        for league in leagues:
+            if options['dry_run']:
+                self.stdout.write(f'將封存：{league.name}（{league.end_date}）')
+                continue
+            teams, players, deleted = archive_league(league)
+            self.stdout.write(f'已封存 {league.name}：{teams} 支球隊、{players} 名球員的彙總，刪除 {deleted} 筆明細。')
+
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'共封存 {len(leagues)} 個聯賽。'))
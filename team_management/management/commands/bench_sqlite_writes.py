@@ -0,0 +1,157 @@
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from football_management_system.sqlite import pragma_statements
+
+SCHEMA = [
+    """CREATE TABLE participation (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        player_id INTEGER NOT NULL,
+        match_id INTEGER NOT NULL,
+        is_participating BOOL NOT NULL,
+        created_at DATETIME NOT NULL,
+        updated_at DATETIME NOT NULL,
+        UNIQUE (player_id, match_id)
+    )""",
+    """CREATE TABLE stats (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        player_id INTEGER NOT NULL,
+        match_id INTEGER NOT NULL,
+        goals INTEGER NOT NULL,
+        assists INTEGER NOT NULL,
+        yellow_cards INTEGER NOT NULL,
+        red_cards INTEGER NOT NULL,
+        minutes_played INTEGER NOT NULL,
+        created_at DATETIME NOT NULL,
+        updated_at DATETIME NOT NULL,
+        UNIQUE (player_id, match_id)
+    )""",
+]
+
+
+def _seed(path, players, matches):
+    conn = sqlite3.connect(path)
+    for statement in SCHEMA:
+        conn.execute(statement)
+    now = time.strftime('%Y-%m-%d %H:%M:%S')
+    conn.executemany(
+        'INSERT INTO participation (player_id, match_id, is_participating, created_at, updated_at) '
+        'VALUES (?, ?, 1, ?, ?)',
+        [(p, m, now, now) for p in range(players) for m in range(matches)],
+    )
+    conn.commit()
+    conn.close()
+
+
+def _worker(path, pragmas, begin, ops, players, matches, seed, results):
+    """模擬一個 gunicorn worker：交替執行 RSVP 切換（update_or_create）與統計寫入（get_or_create + save）"""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path, isolation_level=None)
+    for statement in pragmas:
+        conn.execute(statement)
+
+    done = locked = 0
+    for i in range(ops):
+        player_id = rng.randrange(players)
+        match_id = rng.randrange(matches)
+        now = time.strftime('%Y-%m-%d %H:%M:%S')
+        try:
+            conn.execute(begin)
+            if i % 2 == 0:
+                conn.execute(
+                    'SELECT id FROM participation WHERE player_id = ? AND match_id = ?',
+                    (player_id, match_id),
+                ).fetchone()
+                conn.execute(
+                    'UPDATE participation SET is_participating = ?, updated_at = ? '
+                    'WHERE player_id = ? AND match_id = ?',
+                    (rng.randrange(2), now, player_id, match_id),
+                )
+            else:
+                row = conn.execute(
+                    'SELECT id FROM stats WHERE player_id = ? AND match_id = ?',
+                    (player_id, match_id),
+                ).fetchone()
+                if row is None:
+                    conn.execute(
+                        'INSERT INTO stats (player_id, match_id, goals, assists, yellow_cards, red_cards, '
+                        'minutes_played, created_at, updated_at) VALUES (?, ?, 0, 0, 0, 0, 0, ?, ?) '
+                        'ON CONFLICT (player_id, match_id) DO NOTHING',
+                        (player_id, match_id, now, now),
+                    )
+                conn.execute(
+                    'UPDATE stats SET goals = goals + 1, minutes_played = ?, updated_at = ? '
+                    'WHERE player_id = ? AND match_id = ?',
+                    (rng.randrange(91), now, player_id, match_id),
+                )
+            conn.execute('COMMIT')
+            done += 1
+        except sqlite3.OperationalError:
+            # database is locked / busy：與 Django 相同，交易失敗即回報錯誤
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            locked += 1
+    conn.close()
+    results.put((done, locked))
+
+
+class Command(BaseCommand):
+    help = '比較 SQLite 預設設定與 SQLITE_PRAGMAS 調校後，多個 worker 同時寫入 RSVP 與球員統計的吞吐量。'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='同時寫入的行程數（模擬 gunicorn worker）')
+        parser.add_argument('--ops', type=int, default=500, help='每個 worker 的寫入交易數')
+        parser.add_argument('--players', type=int, default=200)
+        parser.add_argument('--matches', type=int, default=50)
+
+    def _run(self, label, pragmas, begin, options):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.sqlite3')
+            _seed(path, options['players'], options['matches'])
+
+            results = multiprocessing.Queue()
+            processes = [
+                multiprocessing.Process(
+                    target=_worker,
+                    args=(path, pragmas, begin, options['ops'], options['players'], options['matches'], seed, results),
+                )
+                for seed in range(options['workers'])
+            ]
+            started = time.perf_counter()
+            for process in processes:
+                process.start()
+            totals = [results.get() for _ in processes]
+            for process in processes:
+                process.join()
+            elapsed = time.perf_counter() - started
+
+        done = sum(t[0] for t in totals)
+        locked = sum(t[1] for t in totals)
+        self.stdout.write(
+            f'{label:<8} {done:>7} 筆成功  {locked:>5} 筆 locked  '
+            f'{elapsed:>7.2f}s  {done / elapsed:>9.1f} tx/s'
+        )
+        return done / elapsed
+
+    def handle(self, *args, **options):
+        tuned = getattr(settings, 'SQLITE_PRAGMAS', None) or {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'busy_timeout': 5000,
+        }
+        self.stdout.write(
+            f"==== SQLite 並行寫入基準：{options['workers']} workers x {options['ops']} 交易 ===="
+        )
+        mode = settings.DATABASES['default'].get('OPTIONS', {}).get('transaction_mode') or 'IMMEDIATE'
+        self.stdout.write('調校設定: ' + ', '.join(f'{k}={v}' for k, v in tuned.items()) + f', BEGIN {mode}')
+        baseline = self._run('default', [], 'BEGIN', options)
+        improved = self._run('tuned', pragma_statements(tuned), f'BEGIN {mode}', options)
+        if baseline:
+            self.stdout.write(self.style.SUCCESS(f'吞吐量變化: x{improved / baseline:.2f}'))
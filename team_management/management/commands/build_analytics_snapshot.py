@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from team_management.columnar import write_columnar_snapshot
+
+
+class Command(BaseCommand):
+    help = '把比賽與球員統計寫成 NumPy 欄式快照（ANALYTICS_SNAPSHOT_DIR）；--follow 定期重建。'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=None, help='快照目錄（預設 ANALYTICS_SNAPSHOT_DIR）')
+        parser.add_argument('--follow', action='store_true', help='持續執行，定期重建快照')
+        parser.add_argument('--interval', type=float, default=300.0, help='--follow 時每次重建之間暫停的秒數')
+
+    def handle(self, *args, **options):
+        while True:
+            version, counts = write_columnar_snapshot(options['dir'])
+            summary = '、'.join(f'{table} {count} 筆' for table, count in counts.items())
+            self.stdout.write(f'已建立分析快照 {version}：{summary}。')
+            if not options['follow']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,28 @@
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+
+from team_management.snapshot import SnapshotError, restore_snapshot
+
+
+class Command(BaseCommand):
+    help = '由 club_snapshot 產生的快照還原所有資料；整個還原在一個交易中完成。'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='快照檔案（.jsonl.gz）')
+        parser.add_argument('--flush', action='store_true', help='先刪除現有的使用者與球隊資料再還原')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        try:
+            counts = restore_snapshot(options['path'], flush=options['flush'])
+        except SnapshotError as exc:
+            raise CommandError(str(exc))
+        # 使用者快取、儀表板計數等都來自被覆蓋的資料
+        cache.clear()
+        for label, count in counts.items():
+            self.stdout.write(f'{label}: {count}')
+        self.stdout.write(self.style.SUCCESS(
+            f'已還原 {sum(counts.values())} 筆（{time.monotonic() - started:.1f} 秒）。'
+        ))
@@ -0,0 +1,29 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from team_management.snapshot import write_snapshot
+
+
+class Command(BaseCommand):
+    help = '把使用者與所有球隊資料匯出為壓縮的 JSON Lines 快照（比 dumpdata 快，可用 club_restore 還原）。'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', help='輸出檔案（預設為 snapshots/club-時間.jsonl.gz）')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='每次從資料庫讀取的列數')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not path:
+            os.makedirs('snapshots', exist_ok=True)
+            path = os.path.join('snapshots', f'club-{timezone.now():%Y%m%d-%H%M%S}.jsonl.gz')
+
+        started = time.monotonic()
+        counts = write_snapshot(path, options['chunk_size'])
+        for label, count in counts.items():
+            self.stdout.write(f'{label}: {count}')
+        self.stdout.write(self.style.SUCCESS(
+            f'已匯出 {sum(counts.values())} 筆到 {path}（{time.monotonic() - started:.1f} 秒）。'
+        ))
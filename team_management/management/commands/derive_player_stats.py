@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from team_management.events import derive_pending, rebuild
+
+
+class Command(BaseCommand):
+    help = '由比賽事件衍生球員統計；--rebuild 會重播事件重新計算，--follow 持續處理新事件。'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='每批處理的事件數（預設 MATCH_EVENT_BATCH_SIZE）')
+        parser.add_argument('--rebuild', action='store_true', help='重播事件，重新計算統計')
+        parser.add_argument('--match', type=int, action='append', dest='matches', help='只重新計算指定比賽（可重複）')
+        parser.add_argument('--follow', action='store_true', help='持續執行，定期處理新事件')
+        parser.add_argument('--interval', type=float, default=1.0, help='--follow 時每輪之間暫停的秒數')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            rows = rebuild(options['matches'])
+            self.stdout.write(self.style.SUCCESS(f'已由事件重新計算 {rows} 筆球員統計。'))
+            return
+
+        while True:
+            processed = derive_pending(options['batch_size'])
+            if processed or not options['follow']:
+                self.stdout.write(f'已處理 {processed} 筆事件。')
+            if not options['follow']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from team_management.exports import EXPORT_FORMATS, export_lines, filter_export
+from team_management.models import PlayerStats
+
+
+class Command(BaseCommand):
+    help = '串流匯出所有球員統計（CSV 或 JSON Lines），記憶體用量與列數無關。'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv', help='輸出格式')
+        parser.add_argument('--output', '-o', default='-', help='輸出檔案（預設為標準輸出）')
+        parser.add_argument('--season', help='只匯出指定賽季')
+        parser.add_argument('--league', help='只匯出指定聯賽 id')
+        parser.add_argument('--team', help='只匯出指定球隊 id')
+
+    def handle(self, *args, **options):
+        try:
+            stats = filter_export(PlayerStats.objects.all(), options)
+        except ValueError:
+            raise CommandError('聯賽與球隊必須是 id。')
+        lines = export_lines(stats, options['format'])
+        if options['output'] == '-':
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+
+        rows = -1 if options['format'] == 'csv' else 0
+        # newline='' 保留 csv 模組輸出的 \r\n
+        with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+            for line in lines:
+                output.write(line)
+                rows += 1
+        self.stderr.write(f'已匯出 {rows} 筆統計到 {options["output"]}。')
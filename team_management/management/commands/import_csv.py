@@ -0,0 +1,33 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from team_management.imports import IMPORTERS
+
+
+class Command(BaseCommand):
+    help = '由 CSV 批次匯入球員、比賽或球員統計；逐列回報錯誤，其餘列照常匯入。'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(IMPORTERS), help='匯入的資料類型')
+        parser.add_argument('path', help='CSV 檔案（UTF-8，第一列為欄位名稱）')
+        parser.add_argument('--as-user', help='以指定帳號的權限匯入（預設不限制範圍）')
+        parser.add_argument('--chunk-size', type=int, default=None, help='每批處理的列數（預設 IMPORT_CHUNK_SIZE）')
+        parser.add_argument('--dry-run', action='store_true', help='只驗證，不寫入')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['as_user']:
+            try:
+                user = get_user_model().objects.get(username=options['as_user'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f'找不到帳號 {options["as_user"]}。')
+
+        importer = IMPORTERS[options['kind']](user)
+        # utf-8-sig：略過 Excel 存檔時加上的 BOM
+        with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+            result = importer.run(stream, options['chunk_size'], options['dry_run'])
+
+        for line, message in result.errors:
+            self.stderr.write(f'第 {line} 行：{message}')
+        verb = '通過驗證' if options['dry_run'] else '已匯入'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {result.created} 筆，錯誤 {len(result.errors)} 筆。'))
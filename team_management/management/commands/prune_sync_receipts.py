@@ -0,0 +1,37 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from team_management.models import SyncReceipt
+
+
+class Command(BaseCommand):
+    help = '分批刪除超過保留天數的離線同步冪等鍵（SYNC_RECEIPT_RETENTION_DAYS）。'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='保留天數（預設 SYNC_RECEIPT_RETENTION_DAYS）')
+        parser.add_argument('--batch-size', type=int, default=500, help='每批刪除的筆數')
+        parser.add_argument('--sleep', type=float, default=0.05, help='每批之間暫停的秒數，讓其他寫入有機會取得鎖')
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else settings.SYNC_RECEIPT_RETENTION_DAYS
+        cutoff = timezone.now() - timedelta(days=days)
+        batch_size = options['batch_size']
+        total = 0
+
+        while True:
+            ids = list(
+                SyncReceipt.objects.filter(created_at__lt=cutoff).values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            deleted, _ = SyncReceipt.objects.filter(id__in=ids).delete()
+            total += deleted
+            if len(ids) < batch_size:
+                break
+            time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f'已刪除 {total} 筆過期的同步紀錄。'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from team_management.leaderboards import rebuild_leaderboards
+
+
+class Command(BaseCommand):
+    help = '由球員統計重新建立所有排行榜與名次（平常由統計寫入時增量更新）。'
+
+    def handle(self, *args, **options):
+        rows = rebuild_leaderboards()
+        self.stdout.write(self.style.SUCCESS(f'已重新建立 {rows} 筆排行榜資料。'))
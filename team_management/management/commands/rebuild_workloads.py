@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from team_management.workload import rebuild_loads
+
+
+class Command(BaseCommand):
+    help = '由球員統計重新建立所有球員的每日出場負荷（平常由統計寫入時增量更新）。'
+
+    def handle(self, *args, **options):
+        rows = rebuild_loads()
+        self.stdout.write(self.style.SUCCESS(f'已重新建立 {rows} 筆每日負荷。'))
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from team_management.cube import refresh_cube
+
+
+class Command(BaseCommand):
+    help = '更新統計立方體（依球隊、聯賽、月份的預先彙總）；--full 重建，--follow 持續增量更新。'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='重建所有未封存聯賽的格子')
+        parser.add_argument('--follow', action='store_true', help='持續執行，定期增量更新')
+        parser.add_argument('--interval', type=float, default=60.0, help='--follow 時每輪之間暫停的秒數')
+
+    def handle(self, *args, **options):
+        full = options['full']
+        while True:
+            refreshed = refresh_cube(full=full)
+            if refreshed or not options['follow']:
+                self.stdout.write(f'已重新計算 {refreshed} 個格子。')
+            if not options['follow']:
+                break
+            full = False
+            time.sleep(options['interval'])
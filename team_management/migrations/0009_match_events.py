@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('team_management', '0008_match_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='名稱')),
+                ('last_event_id', models.BigIntegerField(default=0, verbose_name='最後處理的事件')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新時間')),
+            ],
+            options={
+                'verbose_name': '事件處理進度',
+                'verbose_name_plural': '事件處理進度',
+            },
+        ),
+        migrations.CreateModel(
+            name='MatchEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('goal', '進球'), ('assist', '助攻'), ('yellow', '黃牌'), ('red', '紅牌'), ('sub_in', '換上'), ('sub_out', '換下')], max_length=10, verbose_name='事件類型')),
+                ('minute', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='比賽分鐘')),
+                ('delta', models.SmallIntegerField(default=1, verbose_name='增減')),
+                ('source', models.CharField(choices=[('sideline', '場邊記錄'), ('live', '即時記分'), ('manual', '手動調整'), ('opening', '期初數據')], default='sideline', max_length=10, verbose_name='來源')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='建立時間')),
+                ('match', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='team_management.match', verbose_name='比賽')),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='team_management.player', verbose_name='球員')),
+            ],
+            options={
+                'verbose_name': '比賽事件',
+                'verbose_name_plural': '比賽事件',
+                'indexes': [models.Index(fields=['match', 'player'], name='matchevent_match_player_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+from django.db import migrations
+
+COUNTED_FIELDS = {
+    'goal': 'goals',
+    'assist': 'assists',
+    'yellow': 'yellow_cards',
+    'red': 'red_cards',
+}
+
+
+def create_opening_events(apps, schema_editor):
+    """既有的手動統計轉為期初事件，重播事件時可得到與目前相同的數字"""
+    PlayerStats = apps.get_model('team_management', 'PlayerStats')
+    MatchEvent = apps.get_model('team_management', 'MatchEvent')
+    EventCheckpoint = apps.get_model('team_management', 'EventCheckpoint')
+
+    events = []
+    for stats in PlayerStats.objects.all().iterator():
+        for event_type, field in COUNTED_FIELDS.items():
+            value = getattr(stats, field)
+            if value:
+                events.append(MatchEvent(
+                    match_id=stats.match_id, player_id=stats.player_id,
+                    event_type=event_type, delta=value, source='opening',
+                ))
+    MatchEvent.objects.bulk_create(events, batch_size=500)
+
+    last = MatchEvent.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    EventCheckpoint.objects.update_or_create(name='player_stats', defaults={'last_event_id': last})
+
+
+def remove_opening_events(apps, schema_editor):
+    apps.get_model('team_management', 'MatchEvent').objects.filter(source='opening').delete()
+    apps.get_model('team_management', 'EventCheckpoint').objects.filter(name='player_stats').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('team_management', '0009_match_events'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_opening_events, remove_opening_events),
+    ]
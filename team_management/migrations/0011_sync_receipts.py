@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('team_management', '0010_opening_balance_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncReceipt',
+            fields=[
+                ('id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='建立時間')),
+            ],
+            options={
+                'verbose_name': '同步紀錄',
+                'verbose_name_plural': '同步紀錄',
+            },
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('team_management', '0011_sync_receipts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='league',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='封存時間'),
+        ),
+        migrations.CreateModel(
+            name='TeamSeasonSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('matches', models.IntegerField(default=0, verbose_name='比賽數')),
+                ('finished', models.IntegerField(default=0, verbose_name='已結束比賽數')),
+                ('wins', models.IntegerField(default=0, verbose_name='勝')),
+                ('draws', models.IntegerField(default=0, verbose_name='平')),
+                ('losses', models.IntegerField(default=0, verbose_name='負')),
+                ('goals_for', models.IntegerField(default=0, verbose_name='得分')),
+                ('goals_against', models.IntegerField(default=0, verbose_name='失分')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='建立時間')),
+                ('league', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='team_management.league', verbose_name='聯賽')),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='team_management.team', verbose_name='球隊')),
+            ],
+            options={
+                'verbose_name': '球隊賽季戰績',
+                'verbose_name_plural': '球隊賽季戰績',
+                'unique_together': {('team', 'league')},
+            },
+        ),
+        migrations.CreateModel(
+            name='PlayerSeasonSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('matches_played', models.IntegerField(default=0, verbose_name='出賽數')),
+                ('goals', models.IntegerField(default=0, verbose_name='進球數')),
+                ('assists', models.IntegerField(default=0, verbose_name='助攻數')),
+                ('yellow_cards', models.IntegerField(default=0, verbose_name='黃牌數')),
+                ('red_cards', models.IntegerField(default=0, verbose_name='紅牌數')),
+                ('minutes_played', models.IntegerField(default=0, verbose_name='出場時間(分鐘)')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='建立時間')),
+                ('league', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='team_management.league', verbose_name='聯賽')),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='team_management.player', verbose_name='球員')),
+            ],
+            options={
+                'verbose_name': '球員賽季統計',
+                'verbose_name_plural': '球員賽季統計',
+                'unique_together': {('player', 'league')},
+            },
+        ),
+    ]
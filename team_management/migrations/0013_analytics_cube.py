@@ -0,0 +1,55 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('team_management', '0012_season_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CubeCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='名稱')),
+                ('refreshed_until', models.DateTimeField(blank=True, null=True, verbose_name='更新至')),
+            ],
+            options={
+                'verbose_name': '統計立方體進度',
+                'verbose_name_plural': '統計立方體進度',
+            },
+        ),
+        migrations.CreateModel(
+            name='AnalyticsCube',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='月份')),
+                ('group', models.CharField(max_length=50, verbose_name='組別')),
+                ('season', models.CharField(max_length=20, verbose_name='賽季')),
+                ('matches', models.IntegerField(default=0, verbose_name='比賽數')),
+                ('finished', models.IntegerField(default=0, verbose_name='已結束比賽數')),
+                ('wins', models.IntegerField(default=0, verbose_name='勝')),
+                ('draws', models.IntegerField(default=0, verbose_name='平')),
+                ('losses', models.IntegerField(default=0, verbose_name='負')),
+                ('goals_for', models.IntegerField(default=0, verbose_name='得分')),
+                ('goals_against', models.IntegerField(default=0, verbose_name='失分')),
+                ('goals', models.IntegerField(default=0, verbose_name='進球數')),
+                ('assists', models.IntegerField(default=0, verbose_name='助攻數')),
+                ('yellow_cards', models.IntegerField(default=0, verbose_name='黃牌數')),
+                ('red_cards', models.IntegerField(default=0, verbose_name='紅牌數')),
+                ('minutes_played', models.IntegerField(default=0, verbose_name='出場時間(分鐘)')),
+                ('league', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='team_management.league', verbose_name='聯賽')),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='team_management.team', verbose_name='球隊')),
+            ],
+            options={
+                'verbose_name': '統計立方體',
+                'verbose_name_plural': '統計立方體',
+                'indexes': [models.Index(fields=['season', 'month'], name='cube_season_month_idx'), models.Index(fields=['group', 'month'], name='cube_group_month_idx')],
+                'unique_together': {('team', 'league', 'month')},
+            },
+        ),
+    ]
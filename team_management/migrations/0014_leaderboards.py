@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('team_management', '0013_analytics_cube'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=80, verbose_name='範圍')),
+                ('matches', models.IntegerField(default=0, verbose_name='出賽數')),
+                ('goals', models.IntegerField(default=0, verbose_name='進球數')),
+                ('assists', models.IntegerField(default=0, verbose_name='助攻數')),
+                ('yellow_cards', models.IntegerField(default=0, verbose_name='黃牌數')),
+                ('red_cards', models.IntegerField(default=0, verbose_name='紅牌數')),
+                ('minutes_played', models.IntegerField(default=0, verbose_name='出場時間(分鐘)')),
+                ('contributions_per90', models.FloatField(default=0, verbose_name='每 90 分鐘進球加助攻')),
+                ('discipline', models.IntegerField(default=0, verbose_name='紀律積分')),
+                ('goals_rank', models.IntegerField(default=1, verbose_name='進球名次')),
+                ('assists_rank', models.IntegerField(default=1, verbose_name='助攻名次')),
+                ('per90_rank', models.IntegerField(default=1, verbose_name='每 90 分鐘名次')),
+                ('discipline_rank', models.IntegerField(default=1, verbose_name='紀律名次')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新時間')),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='team_management.player', verbose_name='球員')),
+            ],
+            options={
+                'verbose_name': '排行榜',
+                'verbose_name_plural': '排行榜',
+                'indexes': [models.Index(fields=['scope', 'goals'], name='leader_goals_idx'), models.Index(fields=['scope', 'assists'], name='leader_assists_idx'), models.Index(fields=['scope', 'contributions_per90'], name='leader_per90_idx'), models.Index(fields=['scope', 'discipline'], name='leader_discipline_idx')],
+                'unique_together': {('scope', 'player')},
+            },
+        ),
+    ]
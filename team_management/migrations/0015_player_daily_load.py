@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('team_management', '0014_leaderboards'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlayerDailyLoad',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='日期')),
+                ('minutes', models.IntegerField(default=0, verbose_name='出場時間(分鐘)')),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='team_management.player', verbose_name='球員')),
+            ],
+            options={
+                'verbose_name': '每日負荷',
+                'verbose_name_plural': '每日負荷',
+                'unique_together': {('player', 'day')},
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:48
+
+from django.db import migrations, models
+
+
+def mark_processed_events(apps, schema_editor):
+    """進度之前的事件都已套用到統計，標記為已衍生"""
+    MatchEvent = apps.get_model('team_management', 'MatchEvent')
+    EventCheckpoint = apps.get_model('team_management', 'EventCheckpoint')
+    last = EventCheckpoint.objects.filter(name='player_stats').values_list('last_event_id', flat=True).first() or 0
+    MatchEvent.objects.filter(id__lte=last).update(derived=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('team_management', '0015_player_daily_load'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='matchevent',
+            name='derived',
+            field=models.BooleanField(default=False, verbose_name='已衍生統計'),
+        ),
+        migrations.RunPython(mark_processed_events, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='matchevent',
+            index=models.Index(condition=models.Q(('derived', False)), fields=['id'], name='matchevent_pending_idx'),
+        ),
+    ]
@@ -1,8 +1,106 @@
 from django.db import models
+from django.db.models import BooleanField, ExpressionWrapper, Q, Value
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
+def _access_flag(user, coach_q):
+    """依角色產生布林 SQL 運算式：管理員恆為真、教練依 coach_q、其他角色恆為假"""
+    if user.user_type == 'admin':
+        return Value(True, output_field=BooleanField())
+    if user.user_type == 'coach':
+        return ExpressionWrapper(coach_q, output_field=BooleanField())
+    return Value(False, output_field=BooleanField())
+
+class RoleScopedQuerySet(models.QuerySet):
+    """依使用者角色限定範圍的 QuerySet
+
+    子類別以 coach_visible_q / coach_editable_q 描述教練的歸屬條件，
+    歸屬判斷因此直接寫在 SQL 的 WHERE 或 SELECT 中，不需在取出物件後再
+    逐一讀取 team.coach、match.league.coach 等外鍵。
+    """
+    # with_access() 會一併 select_related 的關聯（頁面與權限判斷會用到）
+    access_related = ()
+
+    def coach_visible_q(self, user):
+        raise NotImplementedError
+
+    def coach_editable_q(self, user):
+        return self.coach_visible_q(user)
+
+    def visible_to(self, user):
+        if user.user_type == 'admin':
+            return self.all()
+        if user.user_type == 'coach':
+            return self.filter(self.coach_visible_q(user))
+        return self.none()
+
+    def editable_by(self, user):
+        if user.user_type == 'admin':
+            return self.all()
+        if user.user_type == 'coach':
+            return self.filter(self.coach_editable_q(user))
+        return self.none()
+
+    def with_access(self, user):
+        """附加 is_editable 欄位，一次查詢即可取得物件與編輯權限"""
+        queryset = self.select_related(*self.access_related) if self.access_related else self
+        return queryset.annotate(is_editable=_access_flag(user, self.coach_editable_q(user)))
+
+class TeamQuerySet(RoleScopedQuerySet):
+    def coach_visible_q(self, user):
+        return Q(coach=user)
+
+class PlayerQuerySet(RoleScopedQuerySet):
+    access_related = ('team', 'user')
+
+    def coach_visible_q(self, user):
+        return Q(team__coach=user)
+
+class LeagueQuerySet(RoleScopedQuerySet):
+    def coach_visible_q(self, user):
+        return Q(coach=user)
+
+class MatchQuerySet(RoleScopedQuerySet):
+    access_related = ('league', 'team')
+
+    def coach_visible_q(self, user):
+        # league 與 team 都是正向外鍵，OR 條件不會產生重複列，不需要 distinct()
+        return Q(league__coach=user) | Q(team__coach=user)
+
+    def coach_editable_q(self, user):
+        return Q(league__coach=user)
+
+    def listing(self, user, filters=None):
+        """比賽列表，filters 為 {欄位查詢: 值}（已由 view 驗證）
+
+        教練可見的比賽是「負責的聯賽」或「指導的球隊」兩者之一；以 OR 連接時
+        SQLite 無法同時利用兩個外鍵索引，只能 JOIN 後掃描整張表。這裡改成兩個
+        分支各自走 (league, match_date) 與 (team, match_date) 索引，篩選條件
+        下推到每個分支，再以 UNION 合併 id（UNION 本身即去除重複）。
+        """
+        filters = filters or {}
+        if user.user_type != 'coach':
+            return self.visible_to(user).filter(**filters)
+        by_league = self.filter(league__in=League.objects.filter(coach=user).values('pk'), **filters)
+        by_team = self.filter(team__in=Team.objects.filter(coach=user).values('pk'), **filters)
+        return self.filter(pk__in=by_league.values('pk').union(by_team.values('pk')))
+
+    def with_access(self, user):
+        """除 is_editable（聯賽負責教練）外，另附加 is_team_managed（球隊教練，可管理出賽名單）"""
+        return super().with_access(user).annotate(
+            is_team_managed=_access_flag(user, Q(team__coach=user))
+        )
+
+class PlayerStatsQuerySet(RoleScopedQuerySet):
+    access_related = ('player', 'match')
+
+    def coach_visible_q(self, user):
+        return Q(player__team__coach=user)
+
+    def coach_editable_q(self, user):
+        return Q(player__team__coach=user) & Q(match__league__coach=user)
+
 class Team(models.Model):
     name = models.CharField(max_length=100, verbose_name='球隊名稱')
     coach = models.ForeignKey(
@@ -26,6 +124,8 @@ class Team(models.Model):
     leagues = models.ManyToManyField('League', blank=True, related_name='participating_teams', verbose_name='參加聯賽')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='建立時間')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='更新時間')
+
+    objects = TeamQuerySet.as_manager()
     
     class Meta:
         verbose_name = '球隊'
@@ -61,6 +161,8 @@ class Player(models.Model):
     technique = models.CharField(max_length=10, choices=ABILITY_CHOICES, verbose_name='技術')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='建立時間')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='更新時間')
+
+    objects = PlayerQuerySet.as_manager()
     
     class Meta:
         verbose_name = '球員'
@@ -97,6 +199,7 @@ class League(models.Model):
     start_date = models.DateField(verbose_name='開始日期')
     end_date = models.DateField(verbose_name='結束日期')
     description = models.TextField(blank=True, null=True, verbose_name='描述')
+    archived_at = models.DateTimeField(blank=True, null=True, verbose_name='封存時間')
     coach = models.ForeignKey(
         User,
         on_delete=models.SET_NULL,
@@ -107,6 +210,8 @@ class League(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='建立時間')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='更新時間')
+
+    objects = LeagueQuerySet.as_manager()
     
     class Meta:
         verbose_name = '聯賽'
@@ -142,10 +247,22 @@ class Match(models.Model):
     notes = models.TextField(blank=True, null=True, verbose_name='備註')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='建立時間')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='更新時間')
+
+    objects = MatchQuerySet.as_manager()
     
     class Meta:
         verbose_name = '比賽'
         verbose_name_plural = '比賽'
+        # 比賽列表的歸屬分支與各項篩選條件，都以 match_date 作為第二欄，
+        # 日期區間與排序可直接在索引內完成
+        indexes = [
+            models.Index(fields=['league', 'match_date'], name='match_league_date_idx'),
+            models.Index(fields=['team', 'match_date'], name='match_team_date_idx'),
+            models.Index(fields=['status', 'match_date'], name='match_status_date_idx'),
+            models.Index(fields=['venue', 'match_date'], name='match_venue_date_idx'),
+            models.Index(fields=['opponent_name', 'match_date'], name='match_opponent_date_idx'),
+            models.Index(fields=['match_date'], name='match_date_idx'),
+        ]
     
     def __str__(self):
         return f"{self.team.name} vs {self.opponent_name} - {self.match_date.strftime('%Y-%m-%d %H:%M')}"
@@ -160,6 +277,8 @@ class PlayerStats(models.Model):
     minutes_played = models.IntegerField(default=0, verbose_name='出場時間(分鐘)')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='建立時間')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='更新時間')
+
+    objects = PlayerStatsQuerySet.as_manager()
     
     class Meta:
         verbose_name = '球員統計'
@@ -185,3 +304,229 @@ class PlayerMatchParticipation(models.Model):
         participation_status = "參加" if self.is_participating else "不參加"
         return f"{self.player.nickname} - {self.match} ({participation_status})"
 
+
+class MatchEvent(models.Model):
+    """比賽事件紀錄（只能新增）
+
+    PlayerStats 的進球、助攻、黃牌、紅牌由事件加總而來（team_management/events.py），
+    出場時間在有換人事件時由換上／換下時間推算。更正時不修改舊事件，而是新增
+    delta 為負值的事件抵銷，因此任何時候重播全部事件都能得到相同的統計。
+    derived 只由衍生處理以查詢集 update 標記，事件內容本身不會變更。
+    """
+    EVENT_TYPES = [
+        ('goal', '進球'),
+        ('assist', '助攻'),
+        ('yellow', '黃牌'),
+        ('red', '紅牌'),
+        ('sub_in', '換上'),
+        ('sub_out', '換下'),
+    ]
+    SOURCES = [
+        ('sideline', '場邊記錄'),
+        ('live', '即時記分'),
+        ('manual', '手動調整'),
+        ('opening', '期初數據'),
+    ]
+
+    match = models.ForeignKey(Match, on_delete=models.CASCADE, verbose_name='比賽')
+    player = models.ForeignKey(Player, on_delete=models.CASCADE, verbose_name='球員')
+    event_type = models.CharField(max_length=10, choices=EVENT_TYPES, verbose_name='事件類型')
+    minute = models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='比賽分鐘')
+    delta = models.SmallIntegerField(default=1, verbose_name='增減')
+    source = models.CharField(max_length=10, choices=SOURCES, default='sideline', verbose_name='來源')
+    derived = models.BooleanField(default=False, verbose_name='已衍生統計')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='建立時間')
+
+    class Meta:
+        verbose_name = '比賽事件'
+        verbose_name_plural = '比賽事件'
+        indexes = [
+            models.Index(fields=['match', 'player'], name='matchevent_match_player_idx'),
+            # 只索引尚未衍生的事件，衍生程序依 id 順序讀取
+            models.Index(fields=['id'], condition=models.Q(derived=False), name='matchevent_pending_idx'),
+        ]
+
+    def __str__(self):
+        minute = f"{self.minute}'" if self.minute is not None else '-'
+        return f"{self.get_event_type_display()} {self.delta:+d} {self.player_id} @ {minute}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('比賽事件只能新增，請以 delta 為負值的事件更正。')
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError('比賽事件只能新增，請以 delta 為負值的事件更正。')
+
+class EventCheckpoint(models.Model):
+    """事件衍生處理的鎖（同一時間只有一個衍生程序）；last_event_id 是已衍生的最大事件 id，僅供查看"""
+    name = models.CharField(max_length=50, unique=True, verbose_name='名稱')
+    last_event_id = models.BigIntegerField(default=0, verbose_name='最後處理的事件')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新時間')
+
+    class Meta:
+        verbose_name = '事件處理進度'
+        verbose_name_plural = '事件處理進度'
+
+    def __str__(self):
+        return f"{self.name}: {self.last_event_id}"
+
+class SyncReceipt(models.Model):
+    """離線同步已套用的冪等鍵
+
+    主鍵是 (使用者, 用戶端鍵) 的 16 位元組雜湊（見 sync.py），不論用戶端的鍵多長，
+    索引大小都固定；只用來判斷重送，不保存原始內容。
+    """
+    id = models.UUIDField(primary_key=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='建立時間')
+
+    class Meta:
+        verbose_name = '同步紀錄'
+        verbose_name_plural = '同步紀錄'
+
+    def __str__(self):
+        return str(self.id)
+
+class TeamSeasonSummary(models.Model):
+    """已封存聯賽中球隊的賽季戰績（封存後比賽明細已刪除）"""
+    team = models.ForeignKey(Team, on_delete=models.CASCADE, verbose_name='球隊')
+    league = models.ForeignKey(League, on_delete=models.CASCADE, verbose_name='聯賽')
+    matches = models.IntegerField(default=0, verbose_name='比賽數')
+    finished = models.IntegerField(default=0, verbose_name='已結束比賽數')
+    wins = models.IntegerField(default=0, verbose_name='勝')
+    draws = models.IntegerField(default=0, verbose_name='平')
+    losses = models.IntegerField(default=0, verbose_name='負')
+    goals_for = models.IntegerField(default=0, verbose_name='得分')
+    goals_against = models.IntegerField(default=0, verbose_name='失分')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='建立時間')
+
+    class Meta:
+        verbose_name = '球隊賽季戰績'
+        verbose_name_plural = '球隊賽季戰績'
+        unique_together = ['team', 'league']
+
+    def __str__(self):
+        return f"{self.team} - {self.league}"
+
+class PlayerSeasonSummary(models.Model):
+    """已封存聯賽中球員的賽季統計（封存後比賽明細已刪除）"""
+    player = models.ForeignKey(Player, on_delete=models.CASCADE, verbose_name='球員')
+    league = models.ForeignKey(League, on_delete=models.CASCADE, verbose_name='聯賽')
+    matches_played = models.IntegerField(default=0, verbose_name='出賽數')
+    goals = models.IntegerField(default=0, verbose_name='進球數')
+    assists = models.IntegerField(default=0, verbose_name='助攻數')
+    yellow_cards = models.IntegerField(default=0, verbose_name='黃牌數')
+    red_cards = models.IntegerField(default=0, verbose_name='紅牌數')
+    minutes_played = models.IntegerField(default=0, verbose_name='出場時間(分鐘)')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='建立時間')
+
+    class Meta:
+        verbose_name = '球員賽季統計'
+        verbose_name_plural = '球員賽季統計'
+        unique_together = ['player', 'league']
+
+    def __str__(self):
+        return f"{self.player.nickname} - {self.league}"
+
+class AnalyticsCube(models.Model):
+    """統計立方體：每個 (球隊, 聯賽, 月份) 一列的預先彙總（team_management/cube.py）
+
+    組別與賽季由球隊、聯賽複製到每一列，依組別或賽季切片時不需 JOIN。
+    已封存聯賽的列保留不再更新，封存後仍可依月份查詢。
+    """
+    team = models.ForeignKey(Team, on_delete=models.CASCADE, verbose_name='球隊')
+    league = models.ForeignKey(League, on_delete=models.CASCADE, verbose_name='聯賽')
+    month = models.DateField(verbose_name='月份')
+    group = models.CharField(max_length=50, verbose_name='組別')
+    season = models.CharField(max_length=20, verbose_name='賽季')
+    matches = models.IntegerField(default=0, verbose_name='比賽數')
+    finished = models.IntegerField(default=0, verbose_name='已結束比賽數')
+    wins = models.IntegerField(default=0, verbose_name='勝')
+    draws = models.IntegerField(default=0, verbose_name='平')
+    losses = models.IntegerField(default=0, verbose_name='負')
+    goals_for = models.IntegerField(default=0, verbose_name='得分')
+    goals_against = models.IntegerField(default=0, verbose_name='失分')
+    goals = models.IntegerField(default=0, verbose_name='進球數')
+    assists = models.IntegerField(default=0, verbose_name='助攻數')
+    yellow_cards = models.IntegerField(default=0, verbose_name='黃牌數')
+    red_cards = models.IntegerField(default=0, verbose_name='紅牌數')
+    minutes_played = models.IntegerField(default=0, verbose_name='出場時間(分鐘)')
+
+    class Meta:
+        verbose_name = '統計立方體'
+        verbose_name_plural = '統計立方體'
+        unique_together = ['team', 'league', 'month']
+        indexes = [
+            models.Index(fields=['season', 'month'], name='cube_season_month_idx'),
+            models.Index(fields=['group', 'month'], name='cube_group_month_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.team_id} / {self.league_id} / {self.month:%Y-%m}"
+
+class CubeCheckpoint(models.Model):
+    """統計立方體的更新進度：refreshed_until 之前的變動都已反映在立方體中"""
+    name = models.CharField(max_length=50, unique=True, verbose_name='名稱')
+    refreshed_until = models.DateTimeField(blank=True, null=True, verbose_name='更新至')
+
+    class Meta:
+        verbose_name = '統計立方體進度'
+        verbose_name_plural = '統計立方體進度'
+
+    def __str__(self):
+        return f"{self.name}: {self.refreshed_until}"
+
+class LeaderboardEntry(models.Model):
+    """排行榜的一列：球員在一個範圍（聯賽，或同組別同賽季）內的累計數據與名次
+
+    名次在統計寫入時增量維護（team_management/leaderboards.py），查詢前 N 名
+    與個人名次都只需索引查找。名次採並列同名次（1, 2, 2, 4）。
+    """
+    scope = models.CharField(max_length=80, verbose_name='範圍')
+    player = models.ForeignKey(Player, on_delete=models.CASCADE, verbose_name='球員')
+    matches = models.IntegerField(default=0, verbose_name='出賽數')
+    goals = models.IntegerField(default=0, verbose_name='進球數')
+    assists = models.IntegerField(default=0, verbose_name='助攻數')
+    yellow_cards = models.IntegerField(default=0, verbose_name='黃牌數')
+    red_cards = models.IntegerField(default=0, verbose_name='紅牌數')
+    minutes_played = models.IntegerField(default=0, verbose_name='出場時間(分鐘)')
+    contributions_per90 = models.FloatField(default=0, verbose_name='每 90 分鐘進球加助攻')
+    discipline = models.IntegerField(default=0, verbose_name='紀律積分')
+    goals_rank = models.IntegerField(default=1, verbose_name='進球名次')
+    assists_rank = models.IntegerField(default=1, verbose_name='助攻名次')
+    per90_rank = models.IntegerField(default=1, verbose_name='每 90 分鐘名次')
+    discipline_rank = models.IntegerField(default=1, verbose_name='紀律名次')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新時間')
+
+    class Meta:
+        verbose_name = '排行榜'
+        verbose_name_plural = '排行榜'
+        unique_together = ['scope', 'player']
+        indexes = [
+            models.Index(fields=['scope', 'goals'], name='leader_goals_idx'),
+            models.Index(fields=['scope', 'assists'], name='leader_assists_idx'),
+            models.Index(fields=['scope', 'contributions_per90'], name='leader_per90_idx'),
+            models.Index(fields=['scope', 'discipline'], name='leader_discipline_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope} - {self.player_id}"
+
+class PlayerDailyLoad(models.Model):
+    """球員每天的出場時間（依比賽的當地日期加總）
+
+    由統計寫入時增量維護（team_management/workload.py）；滾動 7 天與 28 天的
+    負荷只需讀取一段日期範圍的列，不需掃描每名球員的所有比賽。
+    """
+    player = models.ForeignKey(Player, on_delete=models.CASCADE, verbose_name='球員')
+    day = models.DateField(verbose_name='日期')
+    minutes = models.IntegerField(default=0, verbose_name='出場時間(分鐘)')
+
+    class Meta:
+        verbose_name = '每日負荷'
+        verbose_name_plural = '每日負荷'
+        unique_together = ['player', 'day']
+
+    def __str__(self):
+        return f"{self.player_id} {self.day}: {self.minutes}"
+
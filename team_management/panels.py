@@ -0,0 +1,73 @@
+"""
+非同步頁面的面板查詢
+
+儀表板與統計頁由數個互不相依的面板組成（計數、球隊戰績、分布圖…）。
+同步 view 只能一個接一個查詢，頁面延遲是所有面板的總和。
+
+Django 4.2 的 async ORM（acount()、aaggregate() 等）底層仍以
+sync_to_async(thread_sensitive=True) 在同一條執行緒上依序執行，對同一個請求
+並不會真的並行。因此這裡把每個面板寫成普通的同步函式，由 run_panels()
+以 thread_sensitive=False 分派到執行緒池，各自使用獨立的資料庫連線同時查詢
+（SQLite 在 WAL 模式下讀取彼此不阻擋），頁面延遲約等於最慢的面板。
+
+呼叫端若正在交易中（ATOMIC_REQUESTS、測試案例），其他連線看不到尚未提交的
+資料，此時改為在原執行緒依序執行。ASYNC_PANEL_CONCURRENCY=False 也會停用並行。
+
+只有 ASGI 下才並行（呼叫端傳入 concurrent=live.is_asgi(request)）：WSGI 下每個
+請求都在新的事件迴圈中執行，執行緒池隨請求結束，每個面板都要開新連線並重新
+套用 SQLite PRAGMA，反而比依序查詢慢，且連線會留在已結束的執行緒中。ASGI 的
+執行緒池常駐，各執行緒的連線依 CONN_MAX_AGE 重複使用。
+"""
+import asyncio
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+
+
+def _load_user(request):
+    user = request.user
+    # 觸發 SimpleLazyObject 載入（session 與使用者查詢都是同步的資料庫存取）
+    user.is_authenticated
+    return user
+
+
+def async_login_required(view_func):
+    """login_required 的 async 版本（Django 4.2 的 login_required 不支援 async view）"""
+    @wraps(view_func)
+    async def _wrapped_view(request, *args, **kwargs):
+        user = await sync_to_async(_load_user)(request)
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view_func(request, *args, **kwargs)
+
+    return _wrapped_view
+
+
+def _in_transaction():
+    return connections[DEFAULT_DB_ALIAS].in_atomic_block
+
+
+def _isolated(func):
+    """在執行緒池中執行面板，前後依 CONN_MAX_AGE 回收該執行緒的連線"""
+    @wraps(func)
+    def _run():
+        close_old_connections()
+        try:
+            return func()
+        finally:
+            close_old_connections()
+
+    return _run
+
+
+async def run_panels(*funcs, concurrent=True):
+    """執行多個無參數的同步面板函式，依傳入順序回傳結果列表；concurrent=False 時依序執行"""
+    concurrent = concurrent and getattr(settings, 'ASYNC_PANEL_CONCURRENCY', True) and len(funcs) > 1
+    if concurrent and not await sync_to_async(_in_transaction)():
+        return list(await asyncio.gather(
+            *(sync_to_async(_isolated(func), thread_sensitive=False)() for func in funcs)
+        ))
+    return [await sync_to_async(func)() for func in funcs]
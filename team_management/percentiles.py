@@ -0,0 +1,165 @@
+"""
+球員表現百分位數
+
+教練想知道一名球員在同一聯賽，或同組別、同賽季所有聯賽（群體）中的位置。
+逐名球員以 SQL 計算「有多少人比他低」，群體越大越慢。這裡改從欄式快照
+（columnar.py）計算，不查詢資料庫：
+
+- 以向量運算把群體內的統計依球員加總（np.unique + bincount），算出各項
+  每 90 分鐘指標；出場未滿 LEADERBOARD_MIN_MINUTES 分鐘的球員不列入
+  每 90 分鐘指標的群體（出場時間指標則包含所有球員）。
+- 每個指標的數值排序一次後快取，群體內所有球員的百分位數以一次
+  np.searchsorted 求得；單一球員的百分位數則是兩次二分搜尋，O(log n)。
+- 百分位數 = (數值較低的人數 + 數值相同人數的一半) / 群體人數 × 100，
+  並列的球員得到相同的百分位數。越低越好的指標（紅黃牌）取 100 減去
+  百分位數，百分位數越高一律代表表現越好。
+
+快取以快照版本為鍵：遇到新版本的快照時清空所有群體（群體的陣列是計算
+出的副本，不參照舊快照的 mmap），最多保留 MAX_CACHED_COHORTS 個群體。
+已封存聯賽的明細不在快照中，不列入群體。
+"""
+import threading
+
+import numpy as np
+from django.conf import settings
+
+# 指標 → 顯示名稱；per90 指標的數值越高越好，LOWER_IS_BETTER 中的指標越低越好
+METRICS = {
+    'goals_per90': '每 90 分鐘進球',
+    'assists_per90': '每 90 分鐘助攻',
+    'contributions_per90': '每 90 分鐘進球加助攻',
+    'cards_per90': '每 90 分鐘紅黃牌',
+    'minutes_played': '出場時間',
+}
+LOWER_IS_BETTER = {'cards_per90'}
+QUARTILES = (25, 50, 75, 90)
+MAX_CACHED_COHORTS = 64
+
+
+class Cohort:
+    """一個群體的排序後指標陣列"""
+
+    def __init__(self, values):
+        # {指標: (依 player_id 排序的球員, 對應的數值, 排序後的數值)}
+        self.metrics = {
+            metric: (ids, metric_values, np.sort(metric_values))
+            for metric, (ids, metric_values) in values.items()
+        }
+
+    def percentiles(self, metric, values):
+        """數值（陣列）在群體中的百分位數；越低越好的指標已反轉"""
+        _, _, ordered = self.metrics[metric]
+        if not len(ordered):
+            return np.zeros(len(values))
+        below = np.searchsorted(ordered, values, side='left')
+        at_or_below = np.searchsorted(ordered, values, side='right')
+        result = (below + at_or_below) / 2 / len(ordered) * 100
+        return 100 - result if metric in LOWER_IS_BETTER else result
+
+    def lookup(self, metric, player_id):
+        """(數值, 百分位數)；球員不在此指標的群體中時回傳 None"""
+        ids, metric_values, _ = self.metrics[metric]
+        index = np.searchsorted(ids, player_id)
+        if index == len(ids) or ids[index] != player_id:
+            return None
+        value = metric_values[index]
+        return float(value), float(self.percentiles(metric, [value])[0])
+
+    def table(self, metric, player_ids=None):
+        """群體內（或限 player_ids）每名球員的 (player_id, 數值, 百分位數)，一次向量運算求得"""
+        ids, metric_values, _ = self.metrics[metric]
+        if player_ids is not None:
+            mask = np.isin(ids, player_ids)
+            ids, metric_values = ids[mask], metric_values[mask]
+        return list(zip(ids.tolist(), metric_values.tolist(), self.percentiles(metric, metric_values).tolist()))
+
+    def summary(self, metric):
+        """{'count', 'p25', 'p50', 'p75', 'p90'}"""
+        _, _, ordered = self.metrics[metric]
+        result = {'count': len(ordered)}
+        points = np.percentile(ordered, QUARTILES) if len(ordered) else [None] * len(QUARTILES)
+        for quartile, value in zip(QUARTILES, points):
+            result[f'p{quartile}'] = None if value is None else round(float(value), 4)
+        return result
+
+
+def _league_ids(snapshot, league_id=None, group=None, season=None):
+    if league_id is not None:
+        return np.array([league_id])
+    mask = (snapshot.column('leagues', 'group') == group) & (snapshot.column('leagues', 'season') == season)
+    return snapshot.column('leagues', 'id')[mask]
+
+
+_cached_version = None
+_cached = {}
+_cache_lock = threading.Lock()
+
+
+def cohort(snapshot, league_id=None, group=None, season=None):
+    """群體（單一聯賽，或同組別、同賽季的所有聯賽）的指標陣列；結果依快照版本快取"""
+    global _cached_version
+    # 關鍵字與位置參數、字串與整數都正規化成同一個鍵
+    if league_id is not None:
+        key = (int(league_id), None, None)
+    else:
+        key = (None, str(group), str(season))
+    with _cache_lock:
+        if _cached_version != snapshot.version:
+            _cached.clear()
+            _cached_version = snapshot.version
+        found = _cached.get(key)
+    if found is not None:
+        return found
+
+    found = _build_cohort(snapshot, *key)
+    with _cache_lock:
+        # 計算期間快照可能已換版，此時不寫入
+        if _cached_version != snapshot.version:
+            return found
+        if key not in _cached and len(_cached) >= MAX_CACHED_COHORTS:
+            _cached.pop(next(iter(_cached)))
+        return _cached.setdefault(key, found)
+
+
+def _build_cohort(snapshot, league_id=None, group=None, season=None):
+    mask = np.isin(snapshot.column('stats', 'league_id'), _league_ids(snapshot, league_id, group, season))
+    player_ids, inverse = np.unique(snapshot.column('stats', 'player_id')[mask], return_inverse=True)
+
+    def total(field):
+        return np.bincount(inverse, weights=snapshot.column('stats', field)[mask], minlength=len(player_ids))
+
+    minutes = total('minutes_played')
+    goals, assists = total('goals'), total('assists')
+    cards = total('yellow_cards') + total('red_cards')
+    eligible = minutes >= max(getattr(settings, 'LEADERBOARD_MIN_MINUTES', 90), 1)
+    per90 = 90 / np.where(eligible, minutes, 1)
+
+    values = {'minutes_played': (player_ids, minutes)}
+    for metric, counts in (('goals_per90', goals), ('assists_per90', assists),
+                           ('contributions_per90', goals + assists), ('cards_per90', cards)):
+        values[metric] = (player_ids[eligible], np.round((counts * per90)[eligible], 4))
+    return Cohort(values)
+
+
+def player_percentiles(snapshot, player_id, league_id=None, group=None, season=None):
+    """{指標: {'value', 'percentile', 'count', 'p25', ...}}；球員不在該指標群體中時 value 與 percentile 為 None"""
+    group_cohort = cohort(snapshot, league_id=league_id, group=group, season=season)
+    result = {}
+    for metric in METRICS:
+        found = group_cohort.lookup(metric, player_id)
+        value, percentile = found if found else (None, None)
+        result[metric] = dict(
+            group_cohort.summary(metric),
+            value=value,
+            percentile=None if percentile is None else round(percentile, 1),
+        )
+    return result
+
+
+def cohort_from_params(params):
+    """由查詢參數（league，或 group 加 season）決定群體；不完整時拋出 ValueError"""
+    if params.get('league'):
+        return {'league_id': int(params['league'])}
+    if params.get('group') and params.get('season'):
+        return {'group': params['group'], 'season': params['season']}
+    raise ValueError('請指定 league，或 group 與 season。')
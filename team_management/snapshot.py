@@ -0,0 +1,186 @@
+"""
+全俱樂部快照（club_snapshot / club_restore）
+
+dumpdata / loaddata 逐筆建立模型物件再經由序列化器轉換，資料量大時匯出、
+還原都要數十分鐘。快照改為：
+
+- 匯出：每個資料表以 values_list().iterator() 逐批讀取，每列寫成一個 JSON
+  陣列（欄位名稱只在表頭寫一次），整個檔案以 gzip 串流壓縮。
+- 還原：依外鍵相依順序，每批以單一 INSERT 寫入（與 bulk_create 相同的
+  批次插入，但以 raw 模式保留 created_at / updated_at 原值），全部在一個
+  交易中完成；外鍵檢查延到交易結束前以 check_constraints() 一次驗證。
+
+檔案格式（.jsonl.gz）：第一行是 {"snapshot": 版本, ...}；之後每個資料表
+一行 {"model": "app.Model", "columns": [...]}，接著是該表的資料列。
+
+範圍是 accounts 與 team_management 的所有資料表（含兩者之間的多對多
+中介表）。session、權限與群組由 migrate 或登入時產生，不在快照中。
+"""
+import datetime
+import gzip
+import json
+
+from django.apps import apps
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_APPS = ('accounts', 'team_management')
+# JSON 無法直接表示、還原時需要以 to_python() 轉回的欄位類型
+CONVERTED_TYPES = {'DateTimeField', 'DateField', 'TimeField', 'DurationField', 'DecimalField', 'UUIDField'}
+
+
+class SnapshotError(Exception):
+    pass
+
+
+class _SnapshotEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder 會把時間截到毫秒；快照保留完整的微秒"""
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def snapshot_models():
+    """快照包含的模型，依外鍵相依排序（被參照的表在前）"""
+    selected = []
+    for app_label in SNAPSHOT_APPS:
+        for model in apps.get_app_config(app_label).get_models():
+            selected.append(model)
+            for field in model._meta.local_many_to_many:
+                through = field.remote_field.through
+                if through._meta.auto_created and field.related_model._meta.app_label in SNAPSHOT_APPS:
+                    selected.append(through)
+
+    ordered = []
+    pending = list(selected)
+    while pending:
+        ready = [
+            model for model in pending
+            if all(
+                field.related_model not in pending or field.related_model is model
+                for field in model._meta.concrete_fields if field.is_relation
+            )
+        ]
+        if not ready:
+            raise SnapshotError('資料表之間有循環的外鍵參照，無法決定還原順序。')
+        ordered.extend(ready)
+        pending = [model for model in pending if model not in ready]
+    return ordered
+
+
+def _columns(model):
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def write_snapshot(path, chunk_size=2000, using=DEFAULT_DB_ALIAS):
+    """匯出快照到 path，回傳 {模型: 筆數}"""
+    models = snapshot_models()
+    counts = {}
+    encoder = _SnapshotEncoder(ensure_ascii=False, separators=(',', ':'))
+    with gzip.open(path, 'wt', encoding='utf-8') as output, transaction.atomic(using=using):
+        # 在同一個交易中讀取所有資料表，快照內的外鍵彼此一致
+        # （SQLite 的交易以 BEGIN IMMEDIATE 開始，匯出期間其他寫入會等待）
+        output.write(encoder.encode({
+            'snapshot': SNAPSHOT_VERSION,
+            'created_at': timezone.now(),
+            'models': [model._meta.label for model in models],
+        }) + '\n')
+        for model in models:
+            columns = _columns(model)
+            output.write(encoder.encode({'model': model._meta.label, 'columns': columns}) + '\n')
+            count = 0
+            rows = model._base_manager.using(using).order_by('pk').values_list(*columns)
+            for row in rows.iterator(chunk_size=chunk_size):
+                output.write(encoder.encode(row) + '\n')
+                count += 1
+            counts[model._meta.label] = count
+    return counts
+
+
+class _TableLoader:
+    """累積一個資料表的資料列，每批以單一 INSERT 寫入"""
+
+    def __init__(self, model, columns, using):
+        fields = {field.attname: field for field in model._meta.concrete_fields}
+        unknown = [column for column in columns if column not in fields]
+        if unknown:
+            raise SnapshotError(f'{model._meta.label} 沒有欄位 {", ".join(unknown)}，快照與目前的資料庫結構不符。')
+        self.model = model
+        self.using = using
+        self.fields = [fields[column] for column in columns]
+        self.converters = [
+            field.to_python if field.get_internal_type() in CONVERTED_TYPES else None for field in self.fields
+        ]
+        self.batch_size = max(connections[using].ops.bulk_batch_size(self.fields, [None] * 1000), 1)
+        self.pending = []
+        self.count = 0
+
+    def add(self, row):
+        instance = self.model()
+        for field, converter, value in zip(self.fields, self.converters, row):
+            setattr(instance, field.attname, converter(value) if converter and value is not None else value)
+        self.pending.append(instance)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            # raw=True：與 loaddata 相同，不執行 auto_now 等 pre_save，保留原本的時間
+            self.model._base_manager._insert(self.pending, fields=self.fields, using=self.using, raw=True)
+            self.count += len(self.pending)
+            self.pending = []
+
+
+def _clear(models, using):
+    for model in reversed(models):
+        model._base_manager.using(using).all()._raw_delete(using)
+
+
+def restore_snapshot(path, flush=False, using=DEFAULT_DB_ALIAS):
+    """由快照還原，回傳 {模型: 筆數}；flush=False 時資料庫必須沒有資料"""
+    models = snapshot_models()
+    by_label = {model._meta.label: model for model in models}
+    connection = connections[using]
+    counts = {}
+    with gzip.open(path, 'rt', encoding='utf-8') as stream, transaction.atomic(using=using):
+        header = json.loads(next(stream, 'null'))
+        if not isinstance(header, dict) or header.get('snapshot') != SNAPSHOT_VERSION:
+            raise SnapshotError('不是可辨識的快照檔案。')
+        if flush:
+            _clear(models, using)
+        elif any(model._base_manager.using(using).exists() for model in models):
+            raise SnapshotError('資料庫已有資料；若要覆蓋請加上 --flush。')
+
+        loader = None
+        with connection.constraint_checks_disabled():
+            for line in stream:
+                row = json.loads(line)
+                if isinstance(row, list):
+                    if loader is None:
+                        raise SnapshotError('快照格式錯誤：資料列之前缺少表頭。')
+                    loader.add(row)
+                    continue
+                if loader is not None:
+                    loader.flush()
+                    counts[loader.model._meta.label] = loader.count
+                model = by_label.get(row.get('model'))
+                if model is None:
+                    raise SnapshotError(f'未知的資料表 {row.get("model")}。')
+                loader = _TableLoader(model, row['columns'], using)
+            if loader is not None:
+                loader.flush()
+                counts[loader.model._meta.label] = loader.count
+        connection.check_constraints(table_names=[model._meta.db_table for model in models])
+
+        # 自動遞增序號（PostgreSQL 等）需調整到還原後的最大 id
+        sequence_sql = connection.ops.sequence_reset_sql(no_style(), models)
+        if sequence_sql:
+            with connection.cursor() as cursor:
+                for sql in sequence_sql:
+                    cursor.execute(sql)
+    return counts
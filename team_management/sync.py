@@ -0,0 +1,191 @@
+"""
+場邊離線同步
+
+球場網路不穩時，場邊裝置先把參加狀態、統計與事件排在本機佇列，恢復連線後
+一次送出整批。每筆變更帶有用戶端產生的冪等鍵（例如 UUID）；同一批可能因逾時
+而重送，伺服器必須保證每個鍵只套用一次：
+
+- 整批在一個交易中處理（run_write），每筆變更各自一個 savepoint，單筆錯誤
+  （含資料庫錯誤）只回報該筆，不影響其他變更。
+- 已套用的鍵記錄在 SyncReceipt。主鍵是 (使用者, 鍵) 的 BLAKE2b 16 位元組
+  雜湊，索引大小固定，整批只需一次 IN 查詢即可找出重送的鍵。
+- 場邊事件先收集起來，以一次 record_events() 寫入並衍生統計；統計是目標
+  總數，套用前先寫入排在它之前的事件，結果與用戶端的順序一致。
+
+回應逐筆列出 applied（已套用）、duplicate（先前已套用，略過）或 error。
+"""
+import hashlib
+import uuid
+
+from django.db import DatabaseError, transaction
+
+from .events import COUNTED_FIELDS, MAX_STAT_VALUES, clean_event, record_events, save_manual_stats
+from .models import Match, Player, PlayerMatchParticipation, SyncReceipt
+
+MAX_SYNC_ITEMS = 200
+MAX_KEY_LENGTH = 200
+
+SYNC_STAT_FIELDS = tuple(COUNTED_FIELDS.values()) + ('minutes_played',)
+
+
+class SyncError(Exception):
+    """單筆變更無法套用，訊息回傳給用戶端"""
+
+
+def receipt_id(user, key):
+    """(使用者, 用戶端鍵) → 16 位元組雜湊；不同使用者使用相同的鍵不會互相衝突"""
+    digest = hashlib.blake2b(f'{user.pk}:{key}'.encode(), digest_size=16).digest()
+    return uuid.UUID(bytes=digest)
+
+
+def _item_key(item):
+    key = item.get('key') if isinstance(item, dict) else None
+    if not isinstance(key, str) or not key or len(key) > MAX_KEY_LENGTH:
+        return None
+    return key
+
+
+def _item_int(item, name):
+    try:
+        return int(item[name])
+    except (KeyError, TypeError, ValueError):
+        raise SyncError(f'缺少或無效的 {name}。')
+
+
+class _Batch:
+    """一批變更共用的比賽權限與球員名單（各只查詢一次）"""
+
+    def __init__(self, user, items):
+        self.user = user
+        match_ids = set()
+        for item in items:
+            if isinstance(item, dict):
+                try:
+                    match_ids.add(int(item.get('match')))
+                except (TypeError, ValueError):
+                    pass
+        self.matches = {
+            match.id: match
+            for match in Match.objects.with_access(user).filter(id__in=match_ids)
+        }
+        self.team_players = {}
+        rows = Player.objects.filter(
+            team_id__in={match.team_id for match in self.matches.values()}
+        ).values_list('team_id', 'id')
+        for team_id, player_id in rows:
+            self.team_players.setdefault(team_id, set()).add(player_id)
+        self.events = []
+
+    def match_for(self, item, kind):
+        match = self.matches.get(_item_int(item, 'match'))
+        if match is None:
+            raise SyncError('找不到比賽。')
+        if self.user.user_type != 'admin':
+            # 名單由球隊教練管理；統計與事件另外允許聯賽負責教練（與即時記分相同）
+            allowed = match.is_team_managed
+            if kind != 'participation':
+                allowed = allowed or match.is_editable
+            if self.user.user_type != 'coach' or not allowed:
+                raise SyncError('您沒有權限修改此比賽。')
+        return match
+
+    def players_of(self, match):
+        return self.team_players.get(match.team_id, set())
+
+    def player_for(self, item, match):
+        player_id = _item_int(item, 'player')
+        if player_id not in self.players_of(match):
+            raise SyncError('球員不屬於此比賽的球隊。')
+        return player_id
+
+    def flush_events(self):
+        """寫入已收集的事件並衍生統計"""
+        if self.events:
+            record_events(self.events, source='sideline')
+            self.events = []
+
+
+def _apply_participation(batch, item):
+    match = batch.match_for(item, 'participation')
+    player_id = batch.player_for(item, match)
+    if not isinstance(item.get('is_participating'), bool):
+        raise SyncError('is_participating 必須是 true 或 false。')
+    PlayerMatchParticipation.objects.update_or_create(
+        player_id=player_id, match=match,
+        defaults={'is_participating': item['is_participating']},
+    )
+
+
+def _apply_stats(batch, item):
+    """統計是目標總數而非增量，重複套用結果相同"""
+    match = batch.match_for(item, 'stats')
+    player_id = batch.player_for(item, match)
+    values = item.get('values')
+    if not isinstance(values, dict) or not values or not set(values) <= set(SYNC_STAT_FIELDS):
+        raise SyncError('統計欄位不正確。')
+    if not all(isinstance(value, int) and not isinstance(value, bool) and value >= 0 for value in values.values()):
+        raise SyncError('統計數據必須是非負整數。')
+    for field, value in values.items():
+        if value > MAX_STAT_VALUES[field]:
+            raise SyncError(f'{field} 不可超過 {MAX_STAT_VALUES[field]}。')
+    save_manual_stats(match.id, {player_id: values})
+
+
+def _apply_event(batch, item):
+    match = batch.match_for(item, 'event')
+    try:
+        batch.events.append(clean_event(item, match.id, batch.players_of(match)))
+    except ValueError:
+        raise SyncError('事件內容不正確。')
+
+
+APPLIERS = {
+    'participation': _apply_participation,
+    'stats': _apply_stats,
+    'event': _apply_event,
+}
+
+
+def apply_sync_batch(user, items):
+    """在目前交易中套用一批離線變更，回傳逐筆結果（順序與 items 相同）
+
+    應透過 run_write() 呼叫，讓整批變更與冪等鍵在同一個交易中提交。
+    """
+    keys = [_item_key(item) for item in items]
+    ids = [receipt_id(user, key) if key else None for key in keys]
+    seen = set(SyncReceipt.objects.filter(id__in=[i for i in ids if i]).values_list('id', flat=True))
+    batch = _Batch(user, items)
+
+    results = []
+    receipts = []
+    for item, key, rid in zip(items, keys, ids):
+        if rid is None:
+            results.append({'key': key, 'status': 'error', 'error': '缺少或無效的冪等鍵。'})
+            continue
+        if rid in seen:
+            results.append({'key': key, 'status': 'duplicate'})
+            continue
+        applier = APPLIERS.get(item.get('kind'))
+        if applier is _apply_stats:
+            # 排在前面的事件先衍生，否則之後寫入的事件會疊加在目標總數上；
+            # 在 savepoint 外寫入，這筆統計失敗回滾時不會連帶丟失事件
+            batch.flush_events()
+        try:
+            if applier is None:
+                raise SyncError('不支援的變更類型。')
+            with transaction.atomic():
+                applier(batch, item)
+        except SyncError as exc:
+            results.append({'key': key, 'status': 'error', 'error': str(exc)})
+            continue
+        except DatabaseError:
+            # savepoint 已回滾，只有這筆失敗
+            results.append({'key': key, 'status': 'error', 'error': '無法寫入此筆變更。'})
+            continue
+        seen.add(rid)
+        receipts.append(SyncReceipt(id=rid))
+        results.append({'key': key, 'status': 'applied'})
+
+    batch.flush_events()
+    SyncReceipt.objects.bulk_create(receipts)
+    return results
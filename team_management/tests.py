@@ -1,9 +1,43 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import tempfile
+import threading
+from io import StringIO
+from unittest import mock
+
+import numpy as np
+from asgiref.sync import async_to_sync, sync_to_async
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, OperationalError, connection
+from django.core.management import CommandError, call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth import get_user_model
-from .models import Team, League, Player, Match, PlayerMatchParticipation, PlayerStats
+from .dashboard import GLOBAL_COUNTERS_KEY, global_counters
+from .archive import archive_league
+from .availability import availability_matrix
+from .columnar import monthly_trends, open_snapshot, write_columnar_snapshot
+from .cube import refresh_cube
+from .percentiles import Cohort, cohort, player_percentiles
+from .workload import rebuild_loads, rolling_loads
+from .leaderboards import group_scope, league_scope, rebuild_leaderboards
+from .events import delete_manual_stats, derive_pending, rebuild, record_events, save_manual_stats
+from .models import (
+	AnalyticsCube, LeaderboardEntry, Team, League, Player, Match, MatchEvent, PlayerDailyLoad, PlayerMatchParticipation,
+	PlayerSeasonSummary, PlayerStats, SyncReceipt, TeamSeasonSummary,
+)
+from .live import RESET, AsyncSubscriber, Broker, broker, format_event, match_channel, score_channel
+from .imports import StatsImporter
+from .panels import run_panels
+from .write_queue import WriteQueue
 from datetime import date, datetime, timedelta
 from django.utils import timezone
+from football_management_system.sqlite import pragma_statements
 
 User = get_user_model()
 
@@ -535,3 +569,1625 @@ class HealthCheckTests(TestCase):
 			{ 'status': 'ok', 'db': 'ok', 'app': 'tyfc-team-manus', 'elapsed_ms': resp.json()['elapsed_ms'] }
 		)
 
+
+
+class ConditionalGetTests(TestCase):
+	def setUp(self):
+		self.coach = User.objects.create_user(
+			username="coachetag", password="coachpass", user_type="coach", is_approved=True
+		)
+		self.team = Team.objects.create(name="EtagTeam", coach=self.coach, group="成人組")
+		self.league = League.objects.create(
+			name="EtagLeague",
+			season="2025",
+			group="成人組",
+			start_date=date.today(),
+			end_date=date.today(),
+			coach=self.coach,
+		)
+		self.match = Match.objects.create(
+			league=self.league,
+			team=self.team,
+			opponent_name="EtagOpp",
+			match_date=timezone.now() + timedelta(days=1),
+			venue="Arena",
+			status="scheduled",
+		)
+		self.client.login(username="coachetag", password="coachpass")
+
+	def test_matches_returns_304_when_unchanged(self):
+		resp = self.client.get(reverse("matches"))
+		self.assertEqual(resp.status_code, 200)
+		self.assertIn("ETag", resp)
+		self.assertIn("Last-Modified", resp)
+		self.assertIn("private", resp["Cache-Control"])
+		# 使用者已在快取中（含 updated_at）：只查 session 與版本彙總
+		with self.assertNumQueries(2):
+			resp = self.client.get(reverse("matches"), HTTP_IF_NONE_MATCH=resp["ETag"])
+		self.assertEqual(resp.status_code, 304)
+
+	def test_matches_etag_changes_after_edit_and_delete(self):
+		etag = self.client.get(reverse("matches"))["ETag"]
+		self.match.venue = "Arena 2"
+		self.match.save()
+		resp = self.client.get(reverse("matches"), HTTP_IF_NONE_MATCH=etag)
+		self.assertEqual(resp.status_code, 200)
+		etag = resp["ETag"]
+		Match.objects.filter(id=self.match.id).delete()
+		resp = self.client.get(reverse("matches"), HTTP_IF_NONE_MATCH=etag)
+		self.assertEqual(resp.status_code, 200)
+		self.assertNotEqual(resp["ETag"], etag)
+
+	def test_player_stats_etag_is_per_user(self):
+		etag = self.client.get(reverse("player_stats"))["ETag"]
+		User.objects.create_user(
+			username="coachetag2", password="coachpass", user_type="coach", is_approved=True
+		)
+		self.client.login(username="coachetag2", password="coachpass")
+		resp = self.client.get(reverse("player_stats"), HTTP_IF_NONE_MATCH=etag)
+		self.assertEqual(resp.status_code, 200)
+
+
+class SqliteTuningTests(TestCase):
+	def test_pragmas_applied_on_connection(self):
+		if connection.vendor != "sqlite":
+			self.skipTest("SQLite only")
+		with connection.cursor() as cursor:
+			cursor.execute("PRAGMA busy_timeout")
+			self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS["busy_timeout"])
+			cursor.execute("PRAGMA temp_store")
+			self.assertEqual(cursor.fetchone()[0], 2)  # 2 = MEMORY
+
+	def test_pragma_statements_reject_unknown_or_unsafe_values(self):
+		self.assertEqual(pragma_statements({"synchronous": "NORMAL"}), ["PRAGMA synchronous = NORMAL"])
+		with self.assertRaises(ValueError):
+			pragma_statements({"writable_schema": "ON"})
+		with self.assertRaises(ValueError):
+			pragma_statements({"synchronous": "OFF; DROP TABLE x"})
+
+
+class WriteQueueTests(TransactionTestCase):
+	def setUp(self):
+		self.coach = User.objects.create_user(
+			username="coachqueue", password="coachpass", user_type="coach", is_approved=True
+		)
+		self.queue = WriteQueue(window_ms=20)
+
+	def tearDown(self):
+		self.queue.stop(timeout=5)
+
+	def test_concurrent_writes_are_committed_and_results_returned(self):
+		results = []
+
+		def create_team(index):
+			results.append(self.queue.submit(
+				lambda: Team.objects.create(name=f"Q{index}", coach=self.coach, group="成人組").name
+			))
+
+		threads = [threading.Thread(target=create_team, args=(i,)) for i in range(8)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		self.assertEqual(sorted(results), sorted(f"Q{i}" for i in range(8)))
+		self.assertEqual(Team.objects.filter(name__startswith="Q").count(), 8)
+
+	def test_failed_write_does_not_affect_others(self):
+		def boom():
+			Team.objects.create(name="Rolled back", coach=self.coach, group="成人組")
+			raise ValueError("invalid")
+
+		with self.assertRaises(ValueError):
+			self.queue.submit(boom)
+		self.queue.submit(lambda: Team.objects.create(name="Kept", coach=self.coach, group="成人組"))
+		self.assertFalse(Team.objects.filter(name="Rolled back").exists())
+		self.assertTrue(Team.objects.filter(name="Kept").exists())
+
+	def test_busy_error_is_retried(self):
+		attempts = []
+
+		def flaky():
+			attempts.append(1)
+			if len(attempts) < 3:
+				raise OperationalError("database is locked")
+			return "ok"
+
+		self.assertEqual(self.queue.submit(flaky), "ok")
+		self.assertEqual(len(attempts), 3)
+
+
+class MatchParticipantsStatsTests(TestCase):
+	def setUp(self):
+		self.coach = User.objects.create_user(
+			username="coachcards", password="coachpass", user_type="coach", is_approved=True
+		)
+		player_user = User.objects.create_user(
+			username="playercards", password="playerpass", user_type="player", is_approved=True
+		)
+		team = Team.objects.create(name="CardTeam", coach=self.coach, group="成人組")
+		league = League.objects.create(
+			name="CardLeague", season="2025", group="成人組",
+			start_date=date.today(), end_date=date.today(), coach=self.coach,
+		)
+		self.match = Match.objects.create(
+			league=league, team=team, opponent_name="CardOpp",
+			match_date=timezone.now(), venue="Arena", status="finished",
+		)
+		self.player = Player.objects.create(
+			user=player_user, nickname="CardP", team=team, positions="DF",
+			age=20, stamina="優", speed="優", technique="優",
+		)
+
+	@override_settings(WRITE_QUEUE_ENABLED=True)
+	def test_multi_word_fields_are_saved(self):
+		self.client.login(username="coachcards", password="coachpass")
+		self.client.post(
+			reverse("match_participants", args=[self.match.id]),
+			{
+				f"player_{self.player.id}_yellow_cards": "1",
+				f"player_{self.player.id}_minutes_played": "75",
+				f"player_{self.player.id}_goals": "x",
+			},
+		)
+		stats = PlayerStats.objects.get(player=self.player, match=self.match)
+		self.assertEqual(stats.yellow_cards, 1)
+		self.assertEqual(stats.minutes_played, 75)
+		self.assertEqual(stats.goals, 0)
+
+
+class RoleScopedQuerySetTests(TestCase):
+	def setUp(self):
+		self.admin = User.objects.create_user(username="adminscope", password="x", user_type="admin", is_approved=True)
+		self.coach1 = User.objects.create_user(username="coachscope1", password="x", user_type="coach", is_approved=True)
+		self.coach2 = User.objects.create_user(username="coachscope2", password="x", user_type="coach", is_approved=True)
+		self.player_user = User.objects.create_user(username="playerscope", password="x", user_type="player", is_approved=True)
+		self.team1 = Team.objects.create(name="ScopeTeam1", coach=self.coach1, group="成人組")
+		self.league2 = League.objects.create(
+			name="ScopeLeague2", season="2025", group="成人組",
+			start_date=date.today(), end_date=date.today(), coach=self.coach2,
+		)
+		# coach1 的球隊參加 coach2 負責的聯賽
+		self.match = Match.objects.create(
+			league=self.league2, team=self.team1, opponent_name="ScopeOpp",
+			match_date=timezone.now(), venue="V", status="scheduled",
+		)
+		self.player = Player.objects.create(
+			user=self.player_user, nickname="ScopeP", team=self.team1, positions="FW",
+			age=18, stamina="優", speed="優", technique="優",
+		)
+		self.stats = PlayerStats.objects.create(player=self.player, match=self.match)
+
+	def test_visible_and_editable_scopes(self):
+		self.assertEqual(list(Match.objects.visible_to(self.coach1)), [self.match])
+		self.assertEqual(list(Match.objects.visible_to(self.coach2)), [self.match])
+		self.assertFalse(Match.objects.editable_by(self.coach1).exists())
+		self.assertTrue(Match.objects.editable_by(self.coach2).exists())
+		self.assertFalse(Match.objects.visible_to(self.player_user).exists())
+		self.assertTrue(PlayerStats.objects.visible_to(self.coach1).exists())
+		self.assertFalse(PlayerStats.objects.editable_by(self.coach1).exists())
+		self.assertEqual(Team.objects.visible_to(self.admin).count(), 1)
+
+	def test_with_access_fetches_object_and_flags_in_one_query(self):
+		with self.assertNumQueries(1):
+			match = Match.objects.with_access(self.coach1).get(id=self.match.id)
+			self.assertFalse(match.is_editable)
+			self.assertTrue(match.is_team_managed)
+			self.assertEqual(match.league.name, "ScopeLeague2")
+		with self.assertNumQueries(1):
+			stats = PlayerStats.objects.with_access(self.admin).get(id=self.stats.id)
+			self.assertTrue(stats.is_editable)
+			self.assertEqual(stats.player.nickname, "ScopeP")
+
+
+class MatchListingTests(TestCase):
+	def setUp(self):
+		self.coach = User.objects.create_user(username="listcoach", password="x", user_type="coach", is_approved=True)
+		other = User.objects.create_user(username="listother", password="x", user_type="coach", is_approved=True)
+		self.own_league = League.objects.create(
+			name="ListLeague", season="2025", group="成人組",
+			start_date=date.today(), end_date=date.today(), coach=self.coach,
+		)
+		other_league = League.objects.create(
+			name="OtherLeague", season="2025", group="成人組",
+			start_date=date.today(), end_date=date.today(), coach=other,
+		)
+		self.own_team = Team.objects.create(name="ListTeam", coach=self.coach, group="成人組")
+		other_team = Team.objects.create(name="OtherTeam", coach=other, group="成人組")
+		now = timezone.now()
+		# 聯賽與球隊都屬於同一位教練：兩個 UNION 分支都會命中，但只能出現一次
+		self.both = Match.objects.create(
+			league=self.own_league, team=self.own_team, opponent_name="A",
+			match_date=now - timedelta(days=40), venue="主場", status="finished",
+		)
+		self.by_team = Match.objects.create(
+			league=other_league, team=self.own_team, opponent_name="B",
+			match_date=now + timedelta(days=3), venue="客場", status="scheduled",
+		)
+		self.hidden = Match.objects.create(
+			league=other_league, team=other_team, opponent_name="C",
+			match_date=now, venue="主場", status="scheduled",
+		)
+
+	def test_union_listing_matches_or_scope_without_duplicates(self):
+		listing = Match.objects.listing(self.coach)
+		self.assertEqual(sorted(m.id for m in listing), [self.both.id, self.by_team.id])
+		self.assertEqual(set(listing), set(Match.objects.visible_to(self.coach)))
+		self.assertEqual(list(Match.objects.listing(self.coach, {"venue": "主場"})), [self.both])
+
+	def test_view_applies_filters_and_ignores_invalid_values(self):
+		self.client.login(username="listcoach", password="x")
+		url = reverse("matches")
+		response = self.client.get(url, {"status": "scheduled"})
+		self.assertEqual(list(response.context["matches"]), [self.by_team])
+		response = self.client.get(url, {"date_to": (date.today() - timedelta(days=40)).isoformat()})
+		self.assertEqual(list(response.context["matches"]), [self.both])
+		response = self.client.get(url, {"opponent": "B", "team": str(self.own_team.id)})
+		self.assertEqual(list(response.context["matches"]), [self.by_team])
+		response = self.client.get(url, {"status": "bogus", "league": "x", "date_from": "2025-13-01"})
+		self.assertEqual(response.context["selected"], {})
+		self.assertEqual(len(response.context["matches"]), 2)
+		self.assertNotContains(response, "OtherTeam")
+
+
+class DashboardCountersTests(TestCase):
+	def setUp(self):
+		cache.delete(GLOBAL_COUNTERS_KEY)
+		self.coach = User.objects.create_user(username="dccoach", password="x", user_type="coach", is_approved=True)
+		User.objects.create_user(username="dcpending", password="x", user_type="player", is_approved=False)
+		self.team = Team.objects.create(name="CounterTeam", coach=self.coach, group="成人組")
+		Team.objects.create(name="EmptyTeam", coach=self.coach, group="成人組")
+		league = League.objects.create(
+			name="CounterLeague", season="2025", group="成人組",
+			start_date=date.today(), end_date=date.today(), coach=self.coach,
+		)
+		for days, status in ((1, "scheduled"), (2, "scheduled"), (3, "cancelled"), (-1, "scheduled")):
+			Match.objects.create(
+				league=league, team=self.team, opponent_name="X",
+				match_date=timezone.now() + timedelta(days=days), venue="V", status=status,
+			)
+		for index in range(3):
+			user = User.objects.create_user(username=f"dcplayer{index}", password="x", user_type="player", is_approved=True)
+			Player.objects.create(
+				user=user, nickname=f"DC{index}", team=self.team, positions="FW",
+				age=18, stamina="優", speed="優", technique="優",
+			)
+
+	def tearDown(self):
+		cache.delete(GLOBAL_COUNTERS_KEY)
+
+	def test_global_counters_use_two_queries_then_cache(self):
+		with self.assertNumQueries(2):
+			counters = global_counters()
+		self.assertEqual(counters, {
+			"total_users": 5, "approved_users": 4, "total_teams": 2, "upcoming_matches": 2,
+		})
+		with self.assertNumQueries(0):
+			global_counters()
+
+	def test_coach_dashboard_annotates_player_counts(self):
+		global_counters()
+		self.client.login(username="dccoach", password="x")
+		with self.assertNumQueries(5):
+			# session、使用者與球員 id（快取未命中）、my_teams、近期比賽
+			resp = self.client.get(reverse("dashboard"))
+		self.assertContains(resp, "3 名球員")
+		self.assertContains(resp, "0 名球員")
+		self.assertEqual(resp.context["total_teams"], 2)
+
+
+class AsyncStatisticsTests(TestCase):
+	def setUp(self):
+		self.coach = User.objects.create_user(username="ascoach", password="x", user_type="coach", is_approved=True)
+		self.team = Team.objects.create(name="AsyncTeam", coach=self.coach, group="成人組")
+		league = League.objects.create(
+			name="AsyncLeague", season="2025", group="成人組",
+			start_date=date.today(), end_date=date.today(), coach=self.coach,
+		)
+		scores = ((3, 1, "finished"), (0, 2, "finished"), (1, 1, "finished"), (5, 0, "scheduled"))
+		self.matches = [
+			Match.objects.create(
+				league=league, team=self.team, opponent_name="O", match_date=timezone.now(),
+				venue="V", status=status, our_score=ours, opponent_score=theirs,
+			)
+			for ours, theirs, status in scores
+		]
+		user = User.objects.create_user(username="asplayer", password="x", user_type="player", is_approved=True)
+		self.player = Player.objects.create(
+			user=user, nickname="AsyncP", team=self.team, positions="FW",
+			age=18, stamina="優", speed="優", technique="優",
+		)
+		for match, goals in zip(self.matches[:2], (2, 1)):
+			PlayerStats.objects.create(player=self.player, match=match, goals=goals, minutes_played=90)
+			PlayerMatchParticipation.objects.create(player=self.player, match=match, is_participating=True)
+
+	def test_views_are_coroutines(self):
+		from . import views
+		self.assertTrue(asyncio.iscoroutinefunction(views.dashboard))
+		self.assertTrue(asyncio.iscoroutinefunction(views.statistics))
+
+	def test_coach_statistics_records_and_totals(self):
+		self.client.login(username="ascoach", password="x")
+		resp = self.client.get(reverse("statistics"))
+		self.assertEqual(resp.status_code, 200)
+		team = resp.context["my_teams"][0]
+		self.assertEqual(
+			(team.player_count, team.total_matches, team.wins, team.losses, team.draws), (1, 4, 1, 1, 1)
+		)
+		self.assertEqual(resp.context["my_teams_count"], 1)
+		player_stat = resp.context["player_statistics"][0]
+		self.assertEqual(player_stat["total_goals"], 3)
+		self.assertEqual(player_stat["total_minutes"], 180)
+		self.assertEqual(player_stat["matches_played"], 2)
+
+	def test_player_statistics_and_anonymous_redirect(self):
+		self.client.login(username="asplayer", password="x")
+		resp = self.client.get(reverse("statistics"))
+		self.assertEqual(resp.context["player_stats"]["total_goals"], 3)
+		self.assertEqual(resp.context["player_stats"]["matches_played"], 2)
+		self.client.logout()
+		resp = self.client.get(reverse("statistics"))
+		self.assertEqual(resp.status_code, 302)
+		self.assertIn("/accounts/login/", resp["Location"])
+
+
+class RunPanelsTests(TransactionTestCase):
+	def test_panels_run_concurrently_outside_transactions(self):
+		barrier = threading.Barrier(2, timeout=5)
+
+		def panel(value):
+			# 兩個面板必須同時在不同執行緒中等待，barrier 才會放行
+			barrier.wait()
+			return value, threading.get_ident(), Team.objects.count()
+
+		results = async_to_sync(run_panels)(lambda: panel("a"), lambda: panel("b"))
+		self.assertEqual([r[0] for r in results], ["a", "b"])
+		self.assertNotEqual(results[0][1], results[1][1])
+
+	def test_wsgi_requests_run_panels_in_sequence(self):
+		# WSGI 下（concurrent=False）不建立執行緒與新連線，使用請求本身的連線
+		results = async_to_sync(run_panels)(threading.get_ident, threading.get_ident, concurrent=False)
+		self.assertEqual(results[0], results[1])
+
+	@override_settings(ASYNC_PANEL_CONCURRENCY=False)
+	def test_concurrency_can_be_disabled(self):
+		results = async_to_sync(run_panels)(threading.get_ident, threading.get_ident)
+		self.assertEqual(results[0], results[1])
+
+
+def _loop_subscriber(test, maxsize):
+	"""在測試自己的事件迴圈上建立 AsyncSubscriber，回傳訂閱者與同步讀取函式"""
+	loop = asyncio.new_event_loop()
+	test.addCleanup(loop.close)
+
+	async def create():
+		return AsyncSubscriber(maxsize)
+
+	subscriber = loop.run_until_complete(create())
+	return subscriber, lambda timeout: loop.run_until_complete(subscriber.get(timeout))
+
+
+class LiveBrokerTests(TestCase):
+	async def test_publish_replay_and_overflow(self):
+		broker = Broker(history=3)
+		subscriber = AsyncSubscriber(maxsize=2)
+		self.assertEqual(broker.subscribe("c", subscriber), [])
+		first = broker.publish("c", "participation", {"player_id": 1})
+		self.assertEqual(await subscriber.get(0.1), first)
+		second = broker.publish("c", "participation", {"player_id": 2})
+		self.assertEqual(broker.subscribe("c", AsyncSubscriber(2), last_event_id=first.id), [second])
+		for index in range(3):
+			broker.publish("c", "participation", {"player_id": index})
+		# 佇列溢位後只剩 reset，提示頁面重新載入
+		self.assertIs(await subscriber.get(0.1), RESET)
+		self.assertIsNone(await subscriber.get(0.01))
+		broker.unsubscribe("c", subscriber)
+		self.assertEqual(broker.subscriber_count("c"), 1)
+		self.assertIn('event: participation\ndata: {"player_id":1}', format_event(first))
+
+
+@override_settings(LIVE_KEEPALIVE_SECONDS=0.05, LIVE_STREAM_MAX_SECONDS=0.3)
+class ParticipantsStreamTests(TestCase):
+	def setUp(self):
+		self.coach = User.objects.create_user(username="livecoach", password="x", user_type="coach", is_approved=True)
+		self.other = User.objects.create_user(username="liveother", password="x", user_type="coach", is_approved=True)
+		self.team = Team.objects.create(name="LiveTeam", coach=self.coach, group="成人組")
+		league = League.objects.create(
+			name="LiveLeague", season="2025", group="成人組",
+			start_date=date.today(), end_date=date.today(), coach=self.other,
+		)
+		self.match = Match.objects.create(
+			league=league, team=self.team, opponent_name="O",
+			match_date=timezone.now() + timedelta(days=1), venue="V", status="scheduled",
+		)
+		user = User.objects.create_user(username="liveplayer", password="x", user_type="player", is_approved=True)
+		self.player = Player.objects.create(
+			user=user, nickname="LiveP", team=self.team, positions="FW",
+			age=18, stamina="優", speed="優", technique="優",
+		)
+		self.url = reverse("match_participants_stream", args=[self.match.id])
+
+	def test_participation_save_publishes_after_commit(self):
+		subscriber, get = _loop_subscriber(self, 10)
+		channel = match_channel(self.match.id)
+		broker.subscribe(channel, subscriber)
+		try:
+			with self.captureOnCommitCallbacks(execute=True):
+				PlayerMatchParticipation.objects.create(player=self.player, match=self.match, is_participating=False)
+			message = get(0.1)
+			self.assertEqual(message.event, "participation")
+			self.assertEqual(message.data, {"player_id": self.player.id, "is_participating": False})
+		finally:
+			broker.unsubscribe(channel, subscriber)
+
+	async def test_stream_replays_missed_events_and_checks_access(self):
+		missed = broker.publish(match_channel(self.match.id), "participation", {"player_id": self.player.id, "is_participating": True})
+		await sync_to_async(self.async_client.force_login)(self.coach)
+		resp = await self.async_client.get(self.url, headers={"Last-Event-ID": str(missed.id - 1)})
+		self.assertEqual(resp["Content-Type"], "text/event-stream")
+		chunks = [chunk async for chunk in resp.streaming_content]
+		body = b"".join(c if isinstance(c, bytes) else c.encode() for c in chunks).decode()
+		self.assertIn(f"id: {missed.id}\nevent: participation", body)
+		self.assertIn(": keepalive", body)
+		self.assertEqual(broker.subscriber_count(match_channel(self.match.id)), 0)
+		await sync_to_async(self.async_client.force_login)(self.other)
+		self.assertEqual((await self.async_client.get(self.url)).status_code, 403)
+
+	def test_wsgi_serves_no_stream(self):
+		# 同步 worker 不保留長連線：串流回傳 204（EventSource 不再重連），頁面也不建立 EventSource
+		self.client.login(username="livecoach", password="x")
+		resp = self.client.get(self.url)
+		self.assertEqual(resp.status_code, 204)
+		self.assertEqual(broker.subscriber_count(match_channel(self.match.id)), 0)
+		resp = self.client.get(reverse("match_participants", args=[self.match.id]))
+		self.assertFalse(resp.context["live_stream"])
+		self.assertNotContains(resp, "EventSource")
+		self.client.login(username="liveother", password="x")
+		self.assertEqual(self.client.get(self.url).status_code, 403)
+
+	async def test_stream_pushes_live_events_under_asgi(self):
+		await sync_to_async(self.async_client.force_login)(self.coach)
+		resp = await self.async_client.get(self.url)
+		broker.publish(match_channel(self.match.id), "participation", {"player_id": 7, "is_participating": False})
+		chunks = [chunk async for chunk in resp.streaming_content]
+		body = b"".join(c if isinstance(c, bytes) else c.encode() for c in chunks).decode()
+		self.assertIn('data: {"player_id":7,"is_participating":false}', body)
+
+
+class LiveScoringTests(TestCase):
+	def setUp(self):
+		self.coach = User.objects.create_user(username="scorecoach", password="x", user_type="coach", is_approved=True)
+		other = User.objects.create_user(username="scoreother", password="x", user_type="coach", is_approved=True)
+		self.team = Team.objects.create(name="ScoreTeam", coach=self.coach, group="成人組")
+		league = League.objects.create(
+			name="ScoreLeague", season="2025", group="成人組",
+			start_date=date.today(), end_date=date.today(), coach=other,
+		)
+		self.match = Match.objects.create(
+			league=league, team=self.team, opponent_name="O",
+			match_date=timezone.now(), venue="V", status="scheduled",
+		)
+		user = User.objects.create_user(username="scoreplayer", password="x", user_type="player", is_approved=True)
+		self.player = Player.objects.create(
+			user=user, nickname="ScoreP", team=self.team, positions="FW",
+			age=18, stamina="優", speed="優", technique="優",
+		)
+		self.url = reverse("match_live", args=[self.match.id])
+
+	def test_increments_use_f_updates_and_broadcast_after_commit(self):
+		subscriber, get = _loop_subscriber(self, 10)
+		channel = score_channel(self.match.id)
+		broker.subscribe(channel, subscriber)
+		self.client.login(username="scorecoach", password="x")
+		try:
+			with self.captureOnCommitCallbacks(execute=True):
+				resp = self.client.post(self.url, {"our": "1"})
+			self.assertEqual(resp.json(), {"our_score": 1, "opponent_score": 0, "status": "in_progress"})
+			with self.captureOnCommitCallbacks(execute=True):
+				resp = self.client.post(self.url, {"opponent": "-1", "player": self.player.id, "stat": "goals", "step": "2"})
+			self.assertEqual(resp.json()["stat"], {"player_id": self.player.id, "field": "goals", "value": 2})
+			events = [get(0.1) for _ in range(3)]
+			self.assertEqual([m.event for m in events], ["score", "score", "stat"])
+			# 比分不會被扣成負數
+			self.assertEqual(events[1].data["opponent_score"], 0)
+		finally:
+			broker.unsubscribe(channel, subscriber)
+		self.match.refresh_from_db()
+		self.assertEqual((self.match.our_score, self.match.opponent_score), (1, 0))
+		self.assertEqual(PlayerStats.objects.get(player=self.player, match=self.match).goals, 2)
+
+	def test_validation_and_roles(self):
+		self.client.login(username="scorecoach", password="x")
+		self.assertEqual(self.client.post(self.url, {"our": "9"}).status_code, 400)
+		self.assertEqual(self.client.post(self.url, {"player": self.player.id, "stat": "notes"}).status_code, 400)
+		self.client.login(username="scoreplayer", password="x")
+		resp = self.client.get(self.url)
+		self.assertEqual(resp.status_code, 200)
+		self.assertFalse(resp.context["can_score"])
+		self.assertEqual(self.client.post(self.url, {"our": "1"}).status_code, 403)
+		other_player = User.objects.create_user(username="outsider", password="x", user_type="player", is_approved=True)
+		self.client.force_login(other_player)
+		self.assertEqual(self.client.get(self.url).status_code, 302)
+		self.assertEqual(self.client.get(reverse("match_live_stream", args=[self.match.id])).status_code, 403)
+		self.assertEqual(self.client.get(reverse("match_live_state", args=[self.match.id])).status_code, 403)
+
+	def test_wsgi_page_polls_state_instead_of_streaming(self):
+		PlayerStats.objects.create(player=self.player, match=self.match, goals=2)
+		Match.objects.filter(pk=self.match.pk).update(our_score=3, opponent_score=1)
+		self.client.login(username="scoreplayer", password="x")
+		resp = self.client.get(self.url)
+		self.assertFalse(resp.context["live_stream"])
+		self.assertNotContains(resp, "EventSource")
+		self.assertContains(resp, reverse("match_live_state", args=[self.match.id]))
+		self.assertEqual(self.client.get(reverse("match_live_stream", args=[self.match.id])).status_code, 204)
+		with self.assertNumQueries(3):  # session、比賽（含權限）、球員數據
+			data = self.client.get(reverse("match_live_state", args=[self.match.id])).json()
+		self.assertEqual((data["our_score"], data["opponent_score"]), (3, 1))
+		self.assertIn({"player_id": self.player.id, "field": "goals", "value": 2}, data["stats"])
+
+
+class MatchEventTests(TestCase):
+	def setUp(self):
+		self.coach = User.objects.create_user(username="evcoach", password="x", user_type="coach", is_approved=True)
+		self.team = Team.objects.create(name="EventTeam", coach=self.coach, group="成人組")
+		league = League.objects.create(
+			name="EventLeague", season="2025", group="成人組",
+			start_date=date.today(), end_date=date.today(), coach=self.coach,
+		)
+		self.match = Match.objects.create(
+			league=league, team=self.team, opponent_name="O",
+			match_date=timezone.now(), venue="V", status="in_progress",
+		)
+		self.players = []
+		for index in range(2):
+			user = User.objects.create_user(username=f"evplayer{index}", password="x", user_type="player", is_approved=True)
+			self.players.append(Player.objects.create(
+				user=user, nickname=f"EvP{index}", team=self.team, positions="FW",
+				age=18, stamina="優", speed="優", technique="優",
+			))
+
+	def _event(self, player, event_type, minute=None, delta=1):
+		return {"match_id": self.match.id, "player_id": player.id, "event_type": event_type, "minute": minute, "delta": delta}
+
+	def _stats(self, player):
+		return PlayerStats.objects.values("goals", "assists", "yellow_cards", "red_cards", "minutes_played").get(
+			player=player, match=self.match
+		)
+
+	@override_settings(MATCH_EVENT_DERIVE_INLINE=False)
+	def test_batches_derive_same_totals_as_replay(self):
+		first, second = self.players
+		record_events([
+			self._event(first, "goal", 10), self._event(first, "goal", 30), self._event(second, "assist", 30),
+			self._event(first, "sub_out", 60), self._event(second, "sub_in", 60), self._event(second, "yellow", 70),
+			self._event(first, "goal", 30, delta=-1),
+		])
+		self.assertFalse(PlayerStats.objects.exists())
+		self.assertEqual(derive_pending(batch_size=3), 7)
+		self.assertEqual(derive_pending(), 0)
+		derived = [self._stats(player) for player in self.players]
+		self.assertEqual(derived[0], {"goals": 1, "assists": 0, "yellow_cards": 0, "red_cards": 0, "minutes_played": 60})
+		self.assertEqual(derived[1]["minutes_played"], 30)
+		PlayerStats.objects.update(goals=99, minutes_played=0)
+		rebuild()
+		self.assertEqual([self._stats(player) for player in self.players], derived)
+
+	@override_settings(MATCH_EVENT_DERIVE_INLINE=False)
+	def test_late_committed_lower_ids_are_still_derived(self):
+		# 寫入不鎖定進度列；較小的 id 較晚提交（PostgreSQL）時，下一次衍生仍會處理
+		with CaptureQueriesContext(connection) as queries:
+			record_events([self._event(self.players[0], "goal", 10)])
+		self.assertNotIn("team_management_eventcheckpoint", " ".join(q["sql"] for q in queries.captured_queries))
+		self.assertEqual(derive_pending(), 1)
+		for event_id in (100002, 100001):
+			MatchEvent.objects.bulk_create([MatchEvent(id=event_id, match=self.match, player=self.players[0], event_type="goal")])
+			self.assertEqual(derive_pending(), 1)
+		self.assertEqual(self._stats(self.players[0])["goals"], 3)
+
+	def test_manual_minutes_skipped_when_substitutions_exist(self):
+		record_events([self._event(self.players[0], "sub_in", 30)])
+		save_manual_stats(self.match.id, {
+			self.players[0].id: {"minutes_played": 90, "goals": 1},
+			self.players[1].id: {"minutes_played": 45},
+		})
+		self.assertEqual((self._stats(self.players[0])["minutes_played"], self._stats(self.players[0])["goals"]), (60, 1))
+		self.assertEqual(self._stats(self.players[1])["minutes_played"], 45)
+		rebuild([self.match.id])
+		self.assertEqual(self._stats(self.players[0])["minutes_played"], 60)
+
+	def test_events_are_append_only(self):
+		event = record_events([self._event(self.players[0], "red", 80)])[0]
+		event = MatchEvent.objects.get(id=event.id)
+		event.minute = 81
+		with self.assertRaises(ValueError):
+			event.save()
+		with self.assertRaises(ValueError):
+			event.delete()
+
+	def test_manual_form_edits_become_correction_events(self):
+		player = self.players[0]
+		self.client.login(username="evcoach", password="x")
+		url = reverse("match_participants", args=[self.match.id])
+		self.client.post(url, {f"player_{player.id}_goals": "3", f"player_{player.id}_minutes_played": "45"})
+		self.client.post(url, {f"player_{player.id}_goals": "1"})
+		self.assertEqual(
+			list(MatchEvent.objects.filter(player=player).values_list("event_type", "delta", "source")),
+			[("goal", 3, "manual"), ("goal", -2, "manual")],
+		)
+		self.assertEqual(self._stats(player)["goals"], 1)
+		self.assertEqual(self._stats(player)["minutes_played"], 45)
+		rebuild([self.match.id])
+		self.assertEqual(self._stats(player)["goals"], 1)
+
+	def test_sideline_ingest_endpoint(self):
+		self.client.login(username="evcoach", password="x")
+		url = reverse("match_events", args=[self.match.id])
+		payload = {"events": [
+			{"player": self.players[0].id, "type": "goal", "minute": 5},
+			{"player": self.players[1].id, "type": "assist", "minute": 5},
+		]}
+		resp = self.client.post(url, json.dumps(payload), content_type="application/json")
+		self.assertEqual(resp.status_code, 201)
+		self.assertEqual(resp.json(), {"recorded": 2})
+		self.assertEqual(self._stats(self.players[1])["assists"], 1)
+		bad = {"events": [{"player": self.players[0].id, "type": "own_goal"}]}
+		resp = self.client.post(url, json.dumps(bad), content_type="application/json")
+		self.assertEqual(resp.status_code, 400)
+		self.assertEqual(MatchEvent.objects.count(), 2)
+
+
+class SyncChangesTests(TestCase):
+	def setUp(self):
+		self.coach = User.objects.create_user(username="synccoach", password="x", user_type="coach", is_approved=True)
+		other = User.objects.create_user(username="syncother", password="x", user_type="coach", is_approved=True)
+		self.team = Team.objects.create(name="SyncTeam", coach=self.coach, group="成人組")
+		other_team = Team.objects.create(name="SyncOther", coach=other, group="成人組")
+		league = League.objects.create(
+			name="SyncLeague", season="2025", group="成人組",
+			start_date=date.today(), end_date=date.today(), coach=other,
+		)
+		self.match = Match.objects.create(
+			league=league, team=self.team, opponent_name="O",
+			match_date=timezone.now(), venue="V", status="in_progress",
+		)
+		self.other_match = Match.objects.create(
+			league=league, team=other_team, opponent_name="O",
+			match_date=timezone.now(), venue="V",
+		)
+		user = User.objects.create_user(username="syncplayer", password="x", user_type="player", is_approved=True)
+		self.player = Player.objects.create(
+			user=user, nickname="SyncP", team=self.team, positions="FW",
+			age=18, stamina="優", speed="優", technique="優",
+		)
+		self.client.login(username="synccoach", password="x")
+
+	def _sync(self, items):
+		return self.client.post(reverse("sync_changes"), json.dumps({"items": items}), content_type="application/json")
+
+	def test_applies_batch_and_skips_replayed_keys(self):
+		items = [
+			{"key": "a1", "kind": "participation", "match": self.match.id, "player": self.player.id, "is_participating": False},
+			{"key": "a2", "kind": "event", "match": self.match.id, "player": self.player.id, "type": "goal", "minute": 12},
+			{"key": "a3", "kind": "stats", "match": self.match.id, "player": self.player.id, "values": {"assists": 2, "minutes_played": 70}},
+		]
+		response = self._sync(items)
+		self.assertEqual([r["status"] for r in response.json()["results"]], ["applied"] * 3)
+		# 逾時後整批重送：不會重複計算進球
+		response = self._sync(items + [dict(items[1], key="a4")])
+		self.assertEqual([r["status"] for r in response.json()["results"]], ["duplicate"] * 3 + ["applied"])
+		stats = PlayerStats.objects.get(player=self.player, match=self.match)
+		self.assertEqual((stats.goals, stats.assists, stats.minutes_played), (2, 2, 70))
+		self.assertFalse(PlayerMatchParticipation.objects.get(player=self.player, match=self.match).is_participating)
+		self.assertEqual(SyncReceipt.objects.count(), 4)
+
+	def test_stats_apply_after_earlier_events(self):
+		# 統計是目標總數：先記錄的進球事件不會再疊加到 goals=1 上
+		response = self._sync([
+			{"key": "d1", "kind": "event", "match": self.match.id, "player": self.player.id, "type": "goal", "minute": 5},
+			{"key": "d2", "kind": "stats", "match": self.match.id, "player": self.player.id, "values": {"goals": 1}},
+		])
+		self.assertEqual([r["status"] for r in response.json()["results"]], ["applied"] * 2)
+		self.assertEqual(PlayerStats.objects.get(player=self.player, match=self.match).goals, 1)
+
+	def test_reports_errors_per_item(self):
+		response = self._sync([
+			{"key": "b1", "kind": "event", "match": self.other_match.id, "player": self.player.id, "type": "goal"},
+			{"key": "b2", "kind": "stats", "match": self.match.id, "player": self.player.id, "values": {"goals": -1}},
+			{"kind": "event", "match": self.match.id, "player": self.player.id, "type": "goal"},
+			{"key": "b3", "kind": "event", "match": self.match.id, "player": self.player.id, "type": "yellow"},
+			{"key": "b3", "kind": "event", "match": self.match.id, "player": self.player.id, "type": "yellow"},
+		])
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(
+			[r["status"] for r in response.json()["results"]],
+			["error", "error", "error", "applied", "duplicate"],
+		)
+		self.assertEqual(MatchEvent.objects.count(), 1)
+		self.assertEqual(PlayerStats.objects.get(player=self.player, match=self.match).yellow_cards, 1)
+
+	def test_rejects_stats_above_limit(self):
+		response = self._sync([
+			{"key": "e1", "kind": "stats", "match": self.match.id, "player": self.player.id, "values": {"goals": 40000}},
+			{"key": "e2", "kind": "stats", "match": self.match.id, "player": self.player.id, "values": {"minutes_played": 131}},
+			{"key": "e3", "kind": "stats", "match": self.match.id, "player": self.player.id, "values": {"goals": 3}},
+		])
+		self.assertEqual([r["status"] for r in response.json()["results"]], ["error", "error", "applied"])
+		self.assertEqual(PlayerStats.objects.get(player=self.player, match=self.match).goals, 3)
+
+	def test_database_error_only_fails_its_item(self):
+		items = [
+			{"key": "f1", "kind": "event", "match": self.match.id, "player": self.player.id, "type": "goal", "minute": 5},
+			{"key": "f2", "kind": "stats", "match": self.match.id, "player": self.player.id, "values": {"assists": 1}},
+			{"key": "f3", "kind": "participation", "match": self.match.id, "player": self.player.id, "is_participating": False},
+		]
+		with mock.patch("team_management.sync.save_manual_stats", side_effect=DatabaseError):
+			response = self._sync(items)
+		self.assertEqual([r["status"] for r in response.json()["results"]], ["applied", "error", "applied"])
+		# 失敗的統計回滾時，先寫入的事件不受影響；未記錄冪等鍵，重送時可再套用
+		self.assertEqual(PlayerStats.objects.get(player=self.player, match=self.match).goals, 1)
+		self.assertFalse(PlayerMatchParticipation.objects.get(player=self.player, match=self.match).is_participating)
+		response = self._sync(items)
+		self.assertEqual([r["status"] for r in response.json()["results"]], ["duplicate", "applied", "duplicate"])
+
+	def test_players_cannot_sync(self):
+		self.client.login(username="syncplayer", password="x")
+		response = self._sync([{"key": "c1", "kind": "participation", "match": self.match.id, "player": self.player.id, "is_participating": True}])
+		self.assertEqual(response.status_code, 403)
+		self.assertFalse(SyncReceipt.objects.exists())
+
+
+class ApiTests(TestCase):
+	def setUp(self):
+		self.coach = User.objects.create_user(username="apicoach", password="x", user_type="coach", is_approved=True)
+		other = User.objects.create_user(username="apiother", password="x", user_type="coach", is_approved=True)
+		self.team = Team.objects.create(name="ApiTeam", coach=self.coach, group="成人組")
+		self.other_team = Team.objects.create(name="ApiOther", coach=other, group="成人組")
+		self.league = League.objects.create(
+			name="ApiLeague", season="2025", group="成人組",
+			start_date=date.today(), end_date=date.today(), coach=self.coach,
+		)
+		self.players = []
+		for index in range(3):
+			user = User.objects.create_user(username=f"apiplayer{index}", password="x", user_type="player", is_approved=True)
+			self.players.append(Player.objects.create(
+				user=user, nickname=f"ApiP{index}", team=self.team, jersey_number=index + 1, positions="FW",
+				age=18, stamina="優", speed="優", technique="優",
+			))
+		self.client.login(username="apicoach", password="x")
+
+	def _json(self, method, url, data):
+		return getattr(self.client, method)(url, json.dumps(data), content_type="application/json")
+
+	def test_cursor_pagination_with_sparse_fields(self):
+		url = reverse("api_players")
+		first = self.client.get(url, {"limit": 2, "fields": "nickname,team_name"}).json()
+		self.assertEqual(first["results"][0], {"id": self.players[0].id, "nickname": "ApiP0", "team_name": "ApiTeam"})
+		second = self.client.get(url, {"limit": 2, "cursor": first["next_cursor"]}).json()
+		self.assertEqual([row["id"] for row in second["results"]], [self.players[2].id])
+		self.assertIsNone(second["next_cursor"])
+		self.assertEqual(self.client.get(url, {"fields": "password"}).status_code, 400)
+
+	def test_invalid_filter_values_return_400(self):
+		for name, params in (("api_players", {"team": "abc"}), ("api_matches", {"league": "x"}),
+							 ("api_matches", {"team": "1.5"}), ("api_player-stats", {"match": "zz"}),
+							 ("api_player-stats", {"player": "q"}), ("api_participations", {"player": "q"}),
+							 ("api_participations", {"match": "!"})):
+			response = self.client.get(reverse(name), params)
+			self.assertEqual(response.status_code, 400, (name, params))
+			self.assertIn("必須是整數", response.json()["error"])
+		self.assertEqual(self.client.get(reverse("api_players"), {"team": str(self.team.id)}).status_code, 200)
+
+	def test_list_uses_role_scope(self):
+		response = self.client.get(reverse("api_teams"), {"fields": "name,leagues"})
+		self.assertEqual([row["name"] for row in response.json()["results"]], ["ApiTeam"])
+		self.assertEqual(self.client.get(reverse("api_teams_detail", args=[self.other_team.id])).status_code, 404)
+		self.client.logout()
+		self.assertEqual(self.client.get(reverse("api_teams")).status_code, 401)
+
+	def test_create_match_seeds_participation_and_stats_become_events(self):
+		response = self._json("post", reverse("api_matches"), {
+			"league": self.league.id, "team": self.team.id, "opponent_name": "API FC",
+			"match_date": "2030-01-01T10:00:00+08:00", "venue": "V",
+		})
+		self.assertEqual(response.status_code, 201)
+		match_id = response.json()["id"]
+		self.assertEqual(PlayerMatchParticipation.objects.filter(match_id=match_id).count(), 3)
+		response = self._json("post", reverse("api_player-stats"), {"player": self.players[0].id, "match": match_id, "goals": 2})
+		self.assertEqual(response.json()["goals"], 2)
+		response = self._json("patch", reverse("api_player-stats_detail", args=[response.json()["id"]]), {"goals": 1})
+		self.assertEqual(response.json()["goals"], 1)
+		self.assertEqual(list(MatchEvent.objects.order_by("id").values_list("delta", flat=True)), [2, -1])
+		response = self._json("post", reverse("api_players"), {"nickname": "X", "team": self.other_team.id})
+		self.assertEqual(response.status_code, 400)
+
+	def test_player_can_update_own_future_participation_only(self):
+		match = Match.objects.create(
+			league=self.league, team=self.team, opponent_name="O",
+			match_date=timezone.now() + timedelta(days=1), venue="V",
+		)
+		own = PlayerMatchParticipation.objects.create(player=self.players[0], match=match)
+		other = PlayerMatchParticipation.objects.create(player=self.players[1], match=match)
+		self.client.login(username="apiplayer0", password="x")
+		response = self._json("patch", reverse("api_participations_detail", args=[own.id]), {"is_participating": False})
+		self.assertEqual(response.json()["is_participating"], False)
+		response = self._json("patch", reverse("api_participations_detail", args=[other.id]), {"is_participating": False})
+		self.assertEqual(response.status_code, 404)
+		self.assertEqual(self.client.delete(reverse("api_participations_detail", args=[own.id])).status_code, 405)
+
+
+class PlayerStatsExportTests(TestCase):
+	def setUp(self):
+		self.coach = User.objects.create_user(username="excoach", password="x", user_type="coach", is_approved=True)
+		other = User.objects.create_user(username="exother", password="x", user_type="coach", is_approved=True)
+		league = League.objects.create(
+			name="ExLeague", season="2025", group="成人組",
+			start_date=date.today(), end_date=date.today(), coach=self.coach,
+		)
+		for name, coach in (("ExTeam", self.coach), ("ExOther", other)):
+			team = Team.objects.create(name=name, coach=coach, group="成人組")
+			match = Match.objects.create(league=league, team=team, opponent_name="對手", match_date=timezone.now(), venue="V")
+			user = User.objects.create_user(username=f"ex{name}", password="x", user_type="player", is_approved=True)
+			player = Player.objects.create(
+				user=user, nickname=f"{name}球員", team=team, positions="FW",
+				age=18, stamina="優", speed="優", technique="優",
+			)
+			PlayerStats.objects.create(player=player, match=match, goals=2, minutes_played=90)
+		self.client.login(username="excoach", password="x")
+
+	def _body(self, response):
+		return b"".join(response.streaming_content).decode("utf-8")
+
+	def test_csv_export_is_streamed_and_scoped(self):
+		response = self.client.get(reverse("player_stats_export", args=["csv"]))
+		self.assertTrue(response.streaming)
+		lines = self._body(response).lstrip("\ufeff").splitlines()
+		self.assertEqual(lines[0].split(",")[:2], ["player_id", "player"])
+		self.assertEqual(len(lines), 2)
+		self.assertIn("ExTeam球員", lines[1])
+
+	def test_jsonl_export_and_filters(self):
+		rows = [json.loads(line) for line in self._body(
+			self.client.get(reverse("player_stats_export", args=["jsonl"]), {"season": "2025"})
+		).splitlines()]
+		self.assertEqual([(row["team"], row["goals"], row["opponent"]) for row in rows], [("ExTeam", 2, "對手")])
+		self.assertEqual(self.client.get(reverse("player_stats_export", args=["jsonl"]), {"team": "x"}).status_code, 400)
+		self.assertEqual(self.client.get(reverse("player_stats_export", args=["xml"])).status_code, 404)
+
+	def test_command_exports_all_rows(self):
+		out = StringIO()
+		call_command("export_player_stats", "--format", "jsonl", stdout=out)
+		self.assertEqual(len(out.getvalue().splitlines()), 2)
+
+
+class CsvImportTests(TestCase):
+	def setUp(self):
+		self.coach = User.objects.create_user(username="imcoach", password="x", user_type="coach", is_approved=True)
+		self.team = Team.objects.create(name="ImTeam", coach=self.coach, group="成人組")
+		self.league = League.objects.create(
+			name="ImLeague", season="2025", group="成人組",
+			start_date=date.today(), end_date=date.today(), coach=self.coach,
+		)
+		self.match = Match.objects.create(league=self.league, team=self.team, opponent_name="O", match_date=timezone.now(), venue="V")
+		for index in range(3):
+			User.objects.create_user(username=f"imp{index}", password="x", user_type="player", is_approved=True)
+		self.client.login(username="imcoach", password="x")
+
+	def _upload(self, kind, text, **extra):
+		upload = SimpleUploadedFile("data.csv", text.encode("utf-8-sig"), content_type="text/csv")
+		return self.client.post(reverse("data_import"), {"kind": kind, "file": upload, **extra})
+
+	def test_players_import_reports_row_errors_and_seeds_participation(self):
+		response = self._upload("players", (
+			"username,nickname,team,age,positions,stamina,speed,technique,jersey_number\n"
+			"imp0,甲,ImTeam,18,FW|MF,優,佳,普,7\n"
+			"imp1,乙,ImTeam,18,FW,優,佳,普,7\n"
+			"nobody,丙,ImTeam,18,FW,優,佳,普,8\n"
+			"imp2,丁,ImTeam,abc,FW,優,佳,普,9\n"
+		))
+		result = response.context["result"]
+		self.assertEqual(result.created, 1)
+		self.assertEqual([line for line, _ in result.errors], [3, 4, 5])
+		player = Player.objects.get(user__username="imp0")
+		self.assertEqual(player.positions, "FW,MF")
+		self.assertTrue(PlayerMatchParticipation.objects.filter(player=player, match=self.match, is_participating=True).exists())
+
+	def test_overlong_values_are_row_errors(self):
+		response = self._upload("players", (
+			"username,nickname,team,age,positions,stamina,speed,technique\n"
+			f"imp0,{'長' * 51},ImTeam,18,FW,優,佳,普\n"
+			"imp1,乙,ImTeam,18,FW,優,佳,普\n"
+		))
+		result = response.context["result"]
+		self.assertEqual(result.created, 1)
+		self.assertEqual([line for line, _ in result.errors], [2])
+		self.assertIn("nickname", result.errors[0][1])
+		self.assertFalse(Player.objects.filter(user__username="imp0").exists())
+
+		response = self._upload("matches", (
+			"league,season,team,opponent_name,match_date,venue\n"
+			f"ImLeague,2025,ImTeam,{'隊' * 101},2030-01-01 10:00,場地\n"
+			f"ImLeague,2025,ImTeam,對手,2030-01-01 10:00,{'地' * 201}\n"
+		))
+		result = response.context["result"]
+		self.assertEqual(result.created, 0)
+		self.assertEqual([(line, message.split("：")[0]) for line, message in result.errors], [(2, "opponent_name"), (3, "venue")])
+		self.assertEqual(Match.objects.count(), 1)
+
+	def test_matches_import_in_chunks_and_dry_run(self):
+		Player.objects.create(
+			user=User.objects.get(username="imp0"), nickname="P", team=self.team, positions="FW",
+			age=18, stamina="優", speed="優", technique="優",
+		)
+		rows = "".join(f"ImLeague,2025,ImTeam,對手{index},2030-01-0{index + 1} 10:00,場地\n" for index in range(3))
+		text = "league,season,team,opponent_name,match_date,venue\n" + rows
+		self.assertEqual(self._upload("matches", text, dry_run="on").context["result"].created, 3)
+		self.assertEqual(Match.objects.count(), 1)
+		with self.settings(IMPORT_CHUNK_SIZE=2):
+			self.assertEqual(self._upload("matches", text).context["result"].created, 3)
+		self.assertEqual(PlayerMatchParticipation.objects.count(), 3)
+
+	def test_stats_import_records_events(self):
+		player = Player.objects.create(
+			user=User.objects.get(username="imp0"), nickname="P", team=self.team, positions="FW",
+			age=18, stamina="優", speed="優", technique="優",
+		)
+		directory = tempfile.TemporaryDirectory()
+		self.addCleanup(directory.cleanup)
+		path = os.path.join(directory.name, "stats.csv")
+		with open(path, "w", encoding="utf-8") as handle:
+			handle.write(f"player_id,match_id,goals,minutes_played\n{player.id},{self.match.id},2,90\n{player.id},999,1,\n")
+		out, err = StringIO(), StringIO()
+		call_command("import_csv", "stats", path, stdout=out, stderr=err)
+		self.assertIn("第 3 行", err.getvalue())
+		stats = PlayerStats.objects.get(player=player, match=self.match)
+		self.assertEqual((stats.goals, stats.minutes_played), (2, 90))
+		self.assertEqual(MatchEvent.objects.get().source, "manual")
+
+	def test_stats_limits_and_failed_chunks_are_errors(self):
+		player = Player.objects.create(
+			user=User.objects.get(username="imp0"), nickname="P", team=self.team, positions="FW",
+			age=18, stamina="優", speed="優", technique="優",
+		)
+		other = Match.objects.create(league=self.league, team=self.team, opponent_name="O2", match_date=timezone.now(), venue="V")
+		text = (
+			"player_id,match_id,goals\n"
+			f"{player.id},{self.match.id},40000\n"
+			f"{player.id},{self.match.id},2\n"
+			f"{player.id},{other.id},1\n"
+		)
+		calls = []
+
+		def fail_second(match_id, updates):
+			calls.append(match_id)
+			if len(calls) == 2:
+				raise DatabaseError
+			save_manual_stats(match_id, updates)
+
+		with mock.patch("team_management.imports.save_manual_stats", side_effect=fail_second):
+			result = StatsImporter(self.coach).run(StringIO(text), chunk_size=1)
+		self.assertEqual(result.created, 1)
+		self.assertEqual([line for line, _ in result.errors], [2, 4])
+		self.assertIn("不可大於 99", result.errors[0][1])
+		self.assertEqual(PlayerStats.objects.get(player=player, match=self.match).goals, 2)
+		self.assertFalse(PlayerStats.objects.filter(match=other).exists())
+
+
+class ClubSnapshotTests(TestCase):
+	def setUp(self):
+		coach = User.objects.create_user(username="snapcoach", password="x", user_type="coach", is_approved=True)
+		self.team = Team.objects.create(name="SnapTeam", coach=coach, group="成人組")
+		league = League.objects.create(
+			name="SnapLeague", season="2025", group="成人組",
+			start_date=date.today(), end_date=date.today(), coach=coach,
+		)
+		self.team.leagues.add(league)
+		match = Match.objects.create(league=league, team=self.team, opponent_name="O", match_date=timezone.now(), venue="V")
+		user = User.objects.create_user(username="snapplayer", password="x", user_type="player", is_approved=True)
+		player = Player.objects.create(
+			user=user, nickname="快照", team=self.team, positions="FW",
+			age=18, stamina="優", speed="優", technique="優",
+		)
+		record_events([{"match_id": match.id, "player_id": player.id, "event_type": "goal"}])
+		Team.objects.filter(id=self.team.id).update(updated_at=timezone.now() - timedelta(days=3))
+		directory = tempfile.TemporaryDirectory()
+		self.addCleanup(directory.cleanup)
+		self.path = os.path.join(directory.name, "club.jsonl.gz")
+
+	def test_restore_reproduces_snapshot(self):
+		call_command("club_snapshot", self.path, stdout=StringIO())
+		before = Team.objects.values("id", "name", "updated_at").get()
+		Team.objects.all().delete()
+		User.objects.all().delete()
+		call_command("club_restore", self.path, "--flush", stdout=StringIO())
+		self.assertEqual(Team.objects.values("id", "name", "updated_at").get(), before)
+		self.assertEqual(list(Team.objects.get().leagues.values_list("name", flat=True)), ["SnapLeague"])
+		self.assertEqual(PlayerStats.objects.get().goals, 1)
+		self.assertEqual(MatchEvent.objects.count(), 1)
+		self.assertTrue(User.objects.get(username="snapplayer").check_password("x"))
+
+	def test_restore_refuses_to_overwrite_without_flush(self):
+		call_command("club_snapshot", self.path, stdout=StringIO())
+		with self.assertRaises(CommandError):
+			call_command("club_restore", self.path, stdout=StringIO())
+		self.assertEqual(Team.objects.count(), 1)
+
+
+class SeasonArchiveTests(TestCase):
+	def setUp(self):
+		self.coach = User.objects.create_user(username="arcoach", password="x", user_type="coach", is_approved=True)
+		self.team = Team.objects.create(name="ArchiveTeam", coach=self.coach, group="成人組")
+		old = date.today() - timedelta(days=800)
+		self.league = League.objects.create(
+			name="OldLeague", season="2023", group="成人組", start_date=old, end_date=old, coach=self.coach,
+		)
+		user = User.objects.create_user(username="arplayer", password="x", user_type="player", is_approved=True)
+		self.player = Player.objects.create(
+			user=user, nickname="封存", team=self.team, positions="FW",
+			age=18, stamina="優", speed="優", technique="優",
+		)
+		for ours, theirs in ((2, 0), (1, 1)):
+			match = Match.objects.create(
+				league=self.league, team=self.team, opponent_name="O", match_date=timezone.now() - timedelta(days=800),
+				venue="V", status="finished", our_score=ours, opponent_score=theirs,
+			)
+			PlayerMatchParticipation.objects.create(player=self.player, match=match, is_participating=True)
+			record_events([{"match_id": match.id, "player_id": self.player.id, "event_type": "goal"}])
+
+	def statistics(self, username):
+		self.client.login(username=username, password="x")
+		return self.client.get(reverse("statistics")).context
+
+	def test_archive_keeps_statistics_totals(self):
+		coach_before = self.statistics("arcoach")
+		player_before = self.statistics("arplayer")["player_stats"]
+		call_command("archive_seasons", stdout=StringIO())
+
+		self.assertIsNotNone(League.objects.get().archived_at)
+		self.assertFalse(Match.objects.exists())
+		self.assertFalse(PlayerStats.objects.exists() or MatchEvent.objects.exists())
+		self.assertEqual(TeamSeasonSummary.objects.values_list("matches", "wins", "draws", "goals_for").get(), (2, 1, 1, 3))
+		self.assertEqual(PlayerSeasonSummary.objects.values_list("matches_played", "goals").get(), (2, 2))
+
+		coach_after = self.statistics("arcoach")
+		team_before, team_after = coach_before["my_teams"][0], coach_after["my_teams"][0]
+		self.assertEqual(
+			(team_after.total_matches, team_after.wins, team_after.draws, team_after.losses),
+			(team_before.total_matches, team_before.wins, team_before.draws, team_before.losses),
+		)
+		self.assertEqual(coach_after["player_statistics"][0]["total_goals"], 2)
+		self.assertEqual(coach_after["player_statistics"][0]["matches_played"], 2)
+		player_after = self.statistics("arplayer")
+		self.assertEqual(player_after["player_stats"], player_before)
+		self.assertEqual(len(player_after["archived_seasons"]), 1)
+
+	def test_open_or_recent_leagues_are_skipped(self):
+		Match.objects.create(
+			league=self.league, team=self.team, opponent_name="O", match_date=timezone.now(), venue="V",
+		)
+		recent = League.objects.create(
+			name="Recent", season="2026", group="成人組", start_date=date.today(), end_date=date.today(), coach=self.coach,
+		)
+		out = StringIO()
+		call_command("archive_seasons", stdout=out)
+		self.assertIn("沒有", out.getvalue())
+		self.assertFalse(League.objects.filter(archived_at__isnull=False).exists())
+		self.assertEqual(Match.objects.count(), 3)
+		self.assertIsNone(recent.archived_at)
+
+	def test_dry_run_changes_nothing(self):
+		out = StringIO()
+		call_command("archive_seasons", "--dry-run", stdout=out)
+		self.assertIn("OldLeague", out.getvalue())
+		self.assertEqual(Match.objects.count(), 2)
+		self.assertFalse(TeamSeasonSummary.objects.exists())
+
+
+class AnalyticsCubeTests(TestCase):
+	def setUp(self):
+		self.admin = User.objects.create_user(username="cubeadmin", password="x", user_type="admin", is_approved=True)
+		coach = User.objects.create_user(username="cubecoach", password="x", user_type="coach", is_approved=True)
+		self.team = Team.objects.create(name="CubeTeam", coach=coach, group="成人組")
+		other = Team.objects.create(name="OtherTeam", coach=self.admin, group="國中組")
+		self.league = League.objects.create(
+			name="CubeLeague", season="2025", group="成人組",
+			start_date=date(2025, 1, 1), end_date=date(2025, 12, 31), coach=coach,
+		)
+		user = User.objects.create_user(username="cubeplayer", password="x", user_type="player", is_approved=True)
+		self.player = Player.objects.create(
+			user=user, nickname="立方", team=self.team, positions="FW",
+			age=18, stamina="優", speed="優", technique="優",
+		)
+		self.matches = []
+		for team, day, ours, theirs in ((self.team, date(2025, 3, 5), 2, 1), (self.team, date(2025, 3, 20), 0, 0),
+										(self.team, date(2025, 4, 2), 1, 3), (other, date(2025, 4, 9), 4, 0)):
+			self.matches.append(Match.objects.create(
+				league=self.league, team=team, opponent_name="O", venue="V", status="finished",
+				match_date=timezone.make_aware(datetime.combine(day, datetime.min.time()) + timedelta(hours=15)),
+				our_score=ours, opponent_score=theirs,
+			))
+		record_events([
+			{"match_id": self.matches[0].id, "player_id": self.player.id, "event_type": "goal"},
+			{"match_id": self.matches[0].id, "player_id": self.player.id, "event_type": "goal"},
+			{"match_id": self.matches[2].id, "player_id": self.player.id, "event_type": "yellow"},
+		])
+
+	def cells(self):
+		return {
+			(row["team_id"], row["month"]): row
+			for row in AnalyticsCube.objects.values("team_id", "month", "matches", "wins", "draws", "losses", "goals", "yellow_cards", "group")
+		}
+
+	def test_full_refresh_aggregates_by_team_league_month(self):
+		self.assertEqual(refresh_cube(), 3)
+		cells = self.cells()
+		march = cells[(self.team.id, date(2025, 3, 1))]
+		self.assertEqual((march["matches"], march["wins"], march["draws"], march["goals"]), (2, 1, 1, 2))
+		april = cells[(self.team.id, date(2025, 4, 1))]
+		self.assertEqual((april["losses"], april["yellow_cards"], april["group"]), (1, 1, "成人組"))
+
+	def test_incremental_refresh_matches_full_rebuild(self):
+		refresh_cube()
+		record_events([{"match_id": self.matches[1].id, "player_id": self.player.id, "event_type": "goal"}])
+		Match.objects.filter(id=self.matches[2].id).update(our_score=5, updated_at=timezone.now())
+		self.matches[3].delete()
+		delete_manual_stats(PlayerStats.objects.get(match=self.matches[0]))
+		refresh_cube()
+		incremental = self.cells()
+		refresh_cube(full=True)
+		self.assertEqual(incremental, self.cells())
+		march = incremental[(self.team.id, date(2025, 3, 1))]
+		self.assertEqual(march["goals"], 1)
+		self.assertEqual(incremental[(self.team.id, date(2025, 4, 1))]["wins"], 1)
+		self.assertEqual(len(incremental), 2)
+
+	def test_slice_view_sums_cube_rows(self):
+		refresh_cube()
+		self.client.login(username="cubeadmin", password="x")
+		resp = self.client.get(reverse("statistics_cube"), {"by": "group", "month_from": "2025-04"})
+		self.assertEqual(resp.status_code, 200)
+		self.assertEqual([(row["label"], row["matches"]) for row in resp.context["rows"]], [("國中組", 1), ("成人組", 1)])
+		self.assertEqual(resp.context["totals"]["goals_for"], 5)
+		self.assertEqual(self.client.get(reverse("statistics_cube"), {"month_from": "bad"}).status_code, 400)
+
+		self.client.login(username="cubecoach", password="x")
+		resp = self.client.get(reverse("statistics_cube"))
+		self.assertEqual([row["label"] for row in resp.context["rows"]], ["2025-03", "2025-04"])
+		self.assertEqual(resp.context["totals"]["matches"], 3)
+
+		self.client.login(username="cubeplayer", password="x")
+		self.assertEqual(self.client.get(reverse("statistics_cube")).status_code, 302)
+
+	def test_archived_league_cells_are_kept(self):
+		refresh_cube()
+		archive_league(self.league)
+		refresh_cube()
+		self.assertFalse(Match.objects.exists())
+		self.assertEqual(sum(AnalyticsCube.objects.values_list("matches", flat=True)), 4)
+
+
+class ColumnarReadTransactionTests(TransactionTestCase):
+	def test_snapshot_reads_without_write_lock(self):
+		directory = tempfile.TemporaryDirectory()
+		self.addCleanup(directory.cleanup)
+		with CaptureQueriesContext(connection) as queries:
+			write_columnar_snapshot(directory.name)
+		statements = [query["sql"] for query in queries.captured_queries]
+		self.assertEqual((statements[0], statements[-1]), ("BEGIN", "COMMIT"))
+		self.assertFalse(any("IMMEDIATE" in sql for sql in statements))
+		self.assertFalse(connection.in_atomic_block)
+
+
+class ColumnarSnapshotTests(TestCase):
+	def setUp(self):
+		directory = tempfile.TemporaryDirectory()
+		self.addCleanup(directory.cleanup)
+		override = override_settings(ANALYTICS_SNAPSHOT_DIR=directory.name, ANALYTICS_SNAPSHOT_KEEP=1)
+		override.enable()
+		self.addCleanup(override.disable)
+		self.directory = directory.name
+
+		User.objects.create_user(username="coladmin", password="x", user_type="admin", is_approved=True)
+		self.coach = User.objects.create_user(username="colcoach", password="x", user_type="coach", is_approved=True)
+		other_coach = User.objects.create_user(username="colother", password="x", user_type="coach", is_approved=True)
+		self.team = Team.objects.create(name="ColTeam", coach=self.coach, group="成人組")
+		self.other = Team.objects.create(name="ColOther", coach=other_coach, group="成人組")
+		league = League.objects.create(
+			name="ColLeague", season="2025", group="成人組",
+			start_date=date(2025, 1, 1), end_date=date(2025, 12, 31), coach=self.coach,
+		)
+		user = User.objects.create_user(username="colplayer", password="x", user_type="player", is_approved=True)
+		self.player = Player.objects.create(
+			user=user, nickname="欄式", team=self.team, positions="FW",
+			age=18, stamina="優", speed="優", technique="優",
+		)
+		for team, day, ours, theirs in ((self.team, date(2025, 5, 3), 3, 1), (self.team, date(2025, 6, 7), 0, 1),
+										(self.other, date(2025, 6, 8), 2, 2)):
+			match = Match.objects.create(
+				league=league, team=team, opponent_name="O", venue="V", status="finished",
+				match_date=timezone.make_aware(datetime.combine(day, datetime.min.time()) + timedelta(hours=10)),
+				our_score=ours, opponent_score=theirs,
+			)
+			if team == self.team:
+				PlayerStats.objects.create(player=self.player, match=match, goals=ours, minutes_played=90)
+
+	def test_snapshot_is_memory_mapped_and_switches_versions(self):
+		write_columnar_snapshot()
+		snapshot = open_snapshot()
+		self.assertIsInstance(snapshot.column("stats", "goals"), np.memmap)
+		self.assertEqual(list(snapshot.column("players", "nickname")), ["欄式"])
+		self.assertEqual(list(snapshot.coach_team_ids(self.coach.id)), [self.team.id])
+
+		Match.objects.filter(team=self.other).delete()
+		write_columnar_snapshot()
+		self.assertIsNot(open_snapshot(), snapshot)
+		self.assertEqual(len(open_snapshot().column("matches", "id")), 2)
+		# 只保留最新的版本
+		self.assertEqual(len([name for name in os.listdir(self.directory) if name != "CURRENT"]), 1)
+
+	def test_monthly_trends(self):
+		write_columnar_snapshot()
+		months = monthly_trends(open_snapshot())
+		self.assertEqual([row["month"] for row in months], ["2025-05", "2025-06"])
+		self.assertEqual((months[1]["matches"], months[1]["losses"], months[1]["draws"]), (2, 1, 1))
+		self.assertEqual(months[0]["goals"], 3)
+		mine = monthly_trends(open_snapshot(), player_id=self.player.id)
+		self.assertEqual([row["matches"] for row in mine], [1, 1])
+
+	def test_trends_endpoint_scopes_and_reads_only_snapshot(self):
+		self.client.login(username="colcoach", password="x")
+		self.assertEqual(self.client.get(reverse("analytics_trends")).status_code, 503)
+		write_columnar_snapshot()
+		# 只有載入 session 的查詢（使用者來自快取）
+		with self.assertNumQueries(1):
+			resp = self.client.get(reverse("analytics_trends"))
+		self.assertEqual([row["matches"] for row in resp.json()["months"]], [1, 1])
+		self.assertEqual(self.client.get(reverse("analytics_trends"), {"team": self.other.id}).status_code, 403)
+
+		self.client.login(username="colplayer", password="x")
+		resp = self.client.get(reverse("analytics_trends"), {"player": 999})
+		self.assertEqual(sum(row["goals"] for row in resp.json()["months"]), 3)
+
+		resp = self.client.get(reverse("statistics"))
+		self.assertIsNotNone(resp.context["analytics_snapshot_at"])
+
+
+class LeaderboardTests(TestCase):
+	def setUp(self):
+		coach = User.objects.create_user(username="lbcoach", password="x", user_type="coach", is_approved=True)
+		self.team = Team.objects.create(name="LbTeam", coach=coach, group="成人組")
+		self.leagues = [
+			League.objects.create(
+				name=name, season="2025", group="成人組",
+				start_date=date(2025, 1, 1), end_date=date(2025, 12, 31), coach=coach,
+			)
+			for name in ("LbCup", "LbLeague")
+		]
+		self.players = []
+		for index in range(3):
+			user = User.objects.create_user(username=f"lbplayer{index}", password="x", user_type="player", is_approved=True)
+			self.players.append(Player.objects.create(
+				user=user, nickname=f"榜{index}", team=self.team, positions="FW",
+				age=18, stamina="優", speed="優", technique="優",
+			))
+		self.matches = [
+			Match.objects.create(league=league, team=self.team, opponent_name="O", match_date=timezone.now(), venue="V")
+			for league in self.leagues
+		]
+		self.goals(self.matches[0], {0: 2, 1: 1, 2: 1})
+
+	def goals(self, match, counts):
+		record_events([
+			{"match_id": match.id, "player_id": self.players[index].id, "event_type": "goal", "delta": count}
+			for index, count in counts.items()
+		])
+
+	def ranks(self, scope, field="goals_rank"):
+		return dict(LeaderboardEntry.objects.filter(scope=scope).values_list("player__nickname", field))
+
+	def entries(self):
+		return list(LeaderboardEntry.objects.order_by("scope", "player_id").values_list(
+			"scope", "player_id", "matches", "goals", "goals_rank", "assists_rank", "per90_rank", "discipline_rank",
+		))
+
+	def test_ranks_update_incrementally_and_match_rebuild(self):
+		scope = league_scope(self.leagues[0].id)
+		self.assertEqual(self.ranks(scope), {"榜0": 1, "榜1": 2, "榜2": 2})
+		self.goals(self.matches[0], {2: 2})
+		self.assertEqual(self.ranks(scope), {"榜0": 2, "榜1": 3, "榜2": 1})
+		self.goals(self.matches[1], {1: 3})
+		self.assertEqual(self.ranks(group_scope("成人組", "2025")), {"榜0": 3, "榜1": 1, "榜2": 2})
+
+		incremental = self.entries()
+		rebuild_leaderboards()
+		self.assertEqual(self.entries(), incremental)
+
+	def test_deleting_match_or_player_updates_ranks(self):
+		self.goals(self.matches[1], {2: 5})
+		group = group_scope("成人組", "2025")
+		self.assertEqual(self.ranks(group)["榜2"], 1)
+		self.matches[1].delete()
+		self.assertEqual(self.ranks(group), {"榜0": 1, "榜1": 2, "榜2": 2})
+		self.assertFalse(LeaderboardEntry.objects.filter(scope=league_scope(self.leagues[1].id)).exists())
+		self.players[0].delete()
+		self.assertEqual(self.ranks(group), {"榜1": 1, "榜2": 1})
+
+	def test_moving_match_or_regrouping_league_updates_boards(self):
+		self.goals(self.matches[1], {1: 3})
+		match = Match.objects.get(pk=self.matches[0].pk)
+		match.league = self.leagues[1]
+		match.save()
+		self.assertFalse(LeaderboardEntry.objects.filter(scope=league_scope(self.leagues[0].id)).exists())
+		self.assertEqual(self.ranks(league_scope(self.leagues[1].id)), {"榜0": 2, "榜1": 1, "榜2": 3})
+
+		league = League.objects.get(pk=self.leagues[1].pk)
+		league.season = "2026"
+		league.save()
+		self.assertFalse(LeaderboardEntry.objects.filter(scope=group_scope("成人組", "2025")).exists())
+		self.assertEqual(self.ranks(group_scope("成人組", "2026")), {"榜0": 2, "榜1": 1, "榜2": 3})
+		incremental = self.entries()
+		rebuild_leaderboards()
+		self.assertEqual(self.entries(), incremental)
+
+	def test_api_returns_top_and_my_rank(self):
+		self.client.login(username="lbplayer2", password="x")
+		url = reverse("api_leaderboards")
+		data = self.client.get(url, {"league": self.leagues[0].id, "limit": 2}).json()
+		self.assertEqual([(row["nickname"], row["rank"], row["value"]) for row in data["top"]], [("榜0", 1, 2), ("榜1", 2, 1)])
+		self.assertEqual((data["me"]["nickname"], data["me"]["rank"]), ("榜2", 2))
+		data = self.client.get(url, {"group": "成人組", "season": "2025", "metric": "discipline"}).json()
+		self.assertEqual(data["me"]["value"], 0)
+		self.assertEqual(self.client.get(url, {"league": self.leagues[0].id, "metric": "x"}).status_code, 400)
+		self.assertEqual(self.client.get(url).status_code, 400)
+
+		resp = self.client.get(reverse("leaderboards"), {"league": self.leagues[0].id, "metric": "goals"})
+		self.assertEqual(resp.status_code, 200)
+		self.assertEqual(resp.context["me"]["rank"], 2)
+		self.assertEqual(len(resp.context["top"]), 3)
+
+
+class PercentileTests(TestCase):
+	def setUp(self):
+		directory = tempfile.TemporaryDirectory()
+		self.addCleanup(directory.cleanup)
+		override = override_settings(ANALYTICS_SNAPSHOT_DIR=directory.name, LEADERBOARD_MIN_MINUTES=90)
+		override.enable()
+		self.addCleanup(override.disable)
+
+		User.objects.create_user(username="pctadmin", password="x", user_type="admin", is_approved=True)
+		self.coach = User.objects.create_user(username="pctcoach", password="x", user_type="coach", is_approved=True)
+		other_coach = User.objects.create_user(username="pctother", password="x", user_type="coach", is_approved=True)
+		self.team = Team.objects.create(name="PctTeam", coach=self.coach, group="成人組")
+		other = Team.objects.create(name="PctOther", coach=other_coach, group="成人組")
+		self.league = League.objects.create(
+			name="PctLeague", season="2025", group="成人組",
+			start_date=date(2025, 1, 1), end_date=date(2025, 12, 31), coach=self.coach,
+		)
+		match = Match.objects.create(
+			league=self.league, team=self.team, opponent_name="O", venue="V", status="finished",
+			match_date=timezone.now() - timedelta(days=7), our_score=5, opponent_score=0,
+		)
+		# 進球 0、1、1、3（各 90 分鐘），最後一名只出場 30 分鐘
+		self.players = []
+		for index, (goals, minutes) in enumerate(((0, 90), (1, 90), (1, 90), (3, 90), (2, 30))):
+			user = User.objects.create_user(username=f"pct{index}", password="x", user_type="player", is_approved=True)
+			player = Player.objects.create(
+				user=user, nickname=f"百分{index}", team=self.team if index else other, positions="FW",
+				age=18, stamina="優", speed="優", technique="優",
+			)
+			PlayerStats.objects.create(player=player, match=match, goals=goals, minutes_played=minutes)
+			self.players.append(player)
+		write_columnar_snapshot()
+
+	def test_percentiles_split_ties_and_skip_short_minutes(self):
+		result = {
+			player.id: player_percentiles(open_snapshot(), player.id, league_id=self.league.id)
+			for player in self.players
+		}
+		self.assertEqual([result[player.id]["goals_per90"]["percentile"] for player in self.players[:4]],
+						 [12.5, 50.0, 50.0, 87.5])
+		short = result[self.players[4].id]
+		self.assertIsNone(short["goals_per90"]["value"])
+		self.assertEqual(short["goals_per90"]["count"], 4)
+		# 出場時間指標包含所有球員
+		self.assertEqual(short["minutes_played"]["percentile"], 10.0)
+		self.assertEqual(short["minutes_played"]["count"], 5)
+
+	def test_cohort_is_cached_per_snapshot_and_table_matches_lookups(self):
+		snapshot = open_snapshot()
+		group = cohort(snapshot, group="成人組", season="2025")
+		self.assertIs(cohort(snapshot, group="成人組", season="2025"), group)
+		self.assertIs(cohort(snapshot, None, "成人組", "2025"), group)
+		self.assertIs(cohort(snapshot, str(self.league.id)), cohort(snapshot, league_id=self.league.id))
+		for player_id, value, percentile in group.table("goals_per90"):
+			self.assertEqual(group.lookup("goals_per90", player_id), (value, percentile))
+		self.assertEqual(group.summary("goals_per90")["p50"], 1.0)
+
+		write_columnar_snapshot()
+		self.assertIsNot(cohort(open_snapshot(), group="成人組", season="2025"), group)
+
+	def test_lower_is_better_metrics_are_inverted(self):
+		group = Cohort({"cards_per90": (np.array([1, 2, 3]), np.array([0.0, 1.0, 2.0]))})
+		self.assertEqual([round(row[2], 1) for row in group.table("cards_per90")], [83.3, 50.0, 16.7])
+
+	def test_endpoint_scopes_players(self):
+		url = reverse("analytics_percentiles")
+		self.client.login(username="pct1", password="x")
+		resp = self.client.get(url, {"league": self.league.id, "player": self.players[3].id})
+		# 球員只能查看自己
+		self.assertEqual(resp.json()["player"], self.players[1].id)
+		self.assertEqual(resp.json()["metrics"]["goals_per90"]["percentile"], 50.0)
+
+		self.client.login(username="pctcoach", password="x")
+		self.assertEqual(self.client.get(url, {"group": "成人組"}).status_code, 400)
+		resp = self.client.get(url, {"league": self.league.id, "player": self.players[0].id})
+		self.assertEqual(resp.status_code, 403)
+		resp = self.client.get(url, {"group": "成人組", "season": "2025", "metric": "goals_per90"})
+		self.assertEqual([row["player"] for row in resp.json()["players"]],
+						 [self.players[3].id, self.players[1].id, self.players[2].id])
+
+
+class WorkloadTests(TestCase):
+	def setUp(self):
+		self.coach = User.objects.create_user(username="wlcoach", password="x", user_type="coach", is_approved=True)
+		other_coach = User.objects.create_user(username="wlother", password="x", user_type="coach", is_approved=True)
+		self.team = Team.objects.create(name="WlTeam", coach=self.coach, group="成人組")
+		self.other = Team.objects.create(name="WlOther", coach=other_coach, group="成人組")
+		self.league = League.objects.create(
+			name="WlLeague", season="2025", group="成人組",
+			start_date=date(2025, 1, 1), end_date=date(2025, 12, 31), coach=self.coach,
+		)
+		user = User.objects.create_user(username="wlplayer", password="x", user_type="player", is_approved=True)
+		self.player = Player.objects.create(
+			user=user, nickname="負荷", team=self.team, positions="MF",
+			age=18, stamina="優", speed="優", technique="優",
+		)
+
+	def match_on(self, day, hour=10):
+		return Match.objects.create(
+			league=self.league, team=self.team, opponent_name="O", venue="V", status="finished",
+			match_date=timezone.make_aware(datetime.combine(day, datetime.min.time()) + timedelta(hours=hour)),
+		)
+
+	def loads(self):
+		return list(PlayerDailyLoad.objects.filter(player=self.player).order_by("day").values_list("day", "minutes"))
+
+	def test_daily_loads_follow_stats_and_match_changes(self):
+		morning, evening = self.match_on(date(2025, 6, 1)), self.match_on(date(2025, 6, 1), hour=18)
+		save_manual_stats(morning.id, {self.player.id: {"minutes_played": 90}})
+		save_manual_stats(evening.id, {self.player.id: {"minutes_played": 60}})
+		self.assertEqual(self.loads(), [(date(2025, 6, 1), 150)])
+
+		# 改期：新舊兩天都重新計算
+		evening = Match.objects.get(pk=evening.pk)
+		evening.match_date += timedelta(days=2)
+		evening.save()
+		self.assertEqual(self.loads(), [(date(2025, 6, 1), 90), (date(2025, 6, 3), 60)])
+
+		morning.delete()
+		self.assertEqual(self.loads(), [(date(2025, 6, 3), 60)])
+		PlayerDailyLoad.objects.all().delete()
+		self.assertEqual(rebuild_loads(), 1)
+		self.assertEqual(self.loads(), [(date(2025, 6, 3), 60)])
+
+	def test_rolling_acute_and_chronic_loads(self):
+		end = date(2025, 6, 30)
+		for offset in (0, 14, 21):
+			PlayerDailyLoad.objects.create(player=self.player, day=end - timedelta(days=offset), minutes=90)
+		dates, acute, chronic, ratio = rolling_loads([self.player.id], end, days=2)
+		self.assertEqual(dates, [end - timedelta(days=1), end])
+		self.assertEqual(acute.tolist(), [[0, 90]])
+		# 28 天的每週平均：180 ÷ 4 與 270 ÷ 4
+		self.assertEqual(chronic.tolist(), [[45, 67.5]])
+		self.assertEqual(ratio[0, 0], 0)
+		self.assertAlmostEqual(ratio[0, 1], 90 / 67.5)
+		_, _, _, empty = rolling_loads([self.player.id], date(2024, 1, 1), days=1)
+		self.assertTrue(np.isnan(empty[0, 0]))
+
+	def test_heatmap_view_is_scoped_to_managed_teams(self):
+		PlayerDailyLoad.objects.create(player=self.player, day=date(2025, 6, 30), minutes=90)
+		self.client.login(username="wlplayer", password="x")
+		self.assertEqual(self.client.get(reverse("workload")).status_code, 302)
+
+		self.client.login(username="wlcoach", password="x")
+		resp = self.client.get(reverse("workload"), {"end": "2025-06-30", "days": 7})
+		self.assertEqual(resp.status_code, 200)
+		self.assertEqual(len(resp.context["dates"]), 7)
+		current = resp.context["rows"][0]["current"]
+		self.assertEqual((current["acute"], current["ratio"], current["band"]), (90, 4.0, "danger"))
+		self.assertEqual(self.client.get(reverse("workload"), {"team": self.other.id}).status_code, 403)
+		self.assertEqual(self.client.get(reverse("workload"), {"end": "06/30"}).status_code, 400)
+
+
+class AvailabilityTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.coach = User.objects.create_user(username="avcoach", password="x", user_type="coach", is_approved=True)
+		other_coach = User.objects.create_user(username="avother", password="x", user_type="coach", is_approved=True)
+		self.team = Team.objects.create(name="AvTeam", coach=self.coach, group="成人組")
+		self.other = Team.objects.create(name="AvOther", coach=other_coach, group="成人組")
+		league = League.objects.create(
+			name="AvLeague", season="2025", group="成人組",
+			start_date=date(2025, 1, 1), end_date=date(2030, 12, 31), coach=self.coach,
+		)
+		self.players = []
+		for nickname in ("甲", "乙", "丙"):
+			user = User.objects.create_user(username=f"av{nickname}", password="x", user_type="player", is_approved=True)
+			self.players.append(Player.objects.create(
+				user=user, nickname=nickname, team=self.team, positions="DF",
+				age=18, stamina="優", speed="優", technique="優",
+			))
+		now = timezone.now()
+		self.upcoming = [
+			Match.objects.create(league=league, team=self.team, opponent_name=f"U{day}", venue="V",
+								 status="scheduled", match_date=now + timedelta(days=day))
+			for day in (1, 8, 15)
+		]
+		finished = [
+			Match.objects.create(league=league, team=self.team, opponent_name=f"F{day}", venue="V",
+								 status="finished", match_date=now - timedelta(days=day))
+			for day in (7, 14)
+		]
+		first, second, _ = self.players
+		for player, match, participating in ((first, self.upcoming[0], True), (first, self.upcoming[1], False),
+											 (second, self.upcoming[0], False), (first, finished[0], True),
+											 (first, finished[1], True), (second, finished[0], True),
+											 (second, finished[1], False)):
+			PlayerMatchParticipation.objects.create(player=player, match=match, is_participating=participating)
+		cache.clear()
+
+	def test_matrix_comes_from_one_pivot_query_and_is_cached(self):
+		# 比賽、樞紐查詢、球員各一次
+		with self.assertNumQueries(3):
+			matrix = availability_matrix(self.team.id, 2)
+		self.assertEqual([match["id"] for match in matrix["matches"]], [match.id for match in self.upcoming[:2]])
+		rows = {row["nickname"]: row for row in matrix["players"]}
+		self.assertEqual(rows["甲"]["cells"], ["yes", "no"])
+		self.assertEqual(rows["乙"]["cells"], ["no", "unknown"])
+		self.assertEqual(rows["丙"]["cells"], ["unknown", "unknown"])
+		self.assertEqual([rows[name]["available"] for name in ("甲", "乙", "丙")], [1, 0, 0])
+		self.assertEqual([rows[name]["attendance_rate"] for name in ("甲", "乙", "丙")], [1.0, 0.5, None])
+		# 不同場數共用同一筆快取
+		with self.assertNumQueries(0):
+			self.assertEqual(len(availability_matrix(self.team.id, 3)["matches"]), 3)
+
+	def test_participation_change_invalidates_cache(self):
+		availability_matrix(self.team.id)
+		with self.captureOnCommitCallbacks(execute=True):
+			PlayerMatchParticipation.objects.create(player=self.players[2], match=self.upcoming[2])
+		rows = {row["nickname"]: row for row in availability_matrix(self.team.id)["players"]}
+		self.assertEqual(rows["丙"]["cells"], ["unknown", "unknown", "yes"])
+
+		with self.captureOnCommitCallbacks(execute=True):
+			self.upcoming[0].delete()
+		self.assertEqual(len(availability_matrix(self.team.id)["matches"]), 2)
+
+	def test_moving_player_invalidates_both_teams(self):
+		availability_matrix(self.team.id)
+		availability_matrix(self.other.id)
+		player = Player.objects.get(id=self.players[0].id)
+		player.team = self.other
+		with self.captureOnCommitCallbacks(execute=True):
+			player.save()
+		self.assertNotIn("甲", [row["nickname"] for row in availability_matrix(self.team.id)["players"]])
+		self.assertIn("甲", [row["nickname"] for row in availability_matrix(self.other.id)["players"]])
+
+	def test_participation_uses_loaded_player(self):
+		# 只有 INSERT，不再另外查詢球員所屬球隊
+		with self.assertNumQueries(1):
+			PlayerMatchParticipation.objects.create(player=self.players[2], match=self.upcoming[2])
+
+	def test_views_are_scoped_to_managed_teams(self):
+		self.client.login(username="av甲", password="x")
+		self.assertEqual(self.client.get(reverse("availability")).status_code, 302)
+		self.assertEqual(self.client.get(reverse("api_availability")).status_code, 404)
+
+		self.client.login(username="avcoach", password="x")
+		resp = self.client.get(reverse("availability"), {"matches": 1})
+		self.assertEqual(resp.status_code, 200)
+		self.assertEqual(len(resp.context["matches"]), 1)
+		self.assertEqual(self.client.get(reverse("availability"), {"team": self.other.id}).status_code, 403)
+		data = self.client.get(reverse("api_availability"), {"team": self.team.id}).json()
+		self.assertEqual(len(data["matches"]), 3)
+		rows = {row["nickname"]: row for row in data["players"]}
+		self.assertEqual(rows["甲"]["cells"], ["yes", "no", "unknown"])
+		self.assertEqual(self.client.get(reverse("api_availability"), {"team": self.other.id}).status_code, 404)
+
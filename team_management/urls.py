@@ -22,6 +22,13 @@ urlpatterns = [
     path('matches/<int:match_id>/edit/', views.match_edit, name='match_edit'),
     path('matches/<int:match_id>/delete/', views.match_delete, name='match_delete'),
     path('matches/<int:match_id>/participants/', views.match_participants, name='match_participants'),
+    path('matches/<int:match_id>/participants/stream/', views.match_participants_stream, name='match_participants_stream'),
+    path('matches/<int:match_id>/live/', views.match_live, name='match_live'),
+    path('matches/<int:match_id>/live/stream/', views.match_live_stream, name='match_live_stream'),
+    path('matches/<int:match_id>/live/state/', views.match_live_state, name='match_live_state'),
+    path('matches/<int:match_id>/events/', views.match_events, name='match_events'),
+    path('matches/availability/', views.availability, name='availability'),
+    path('matches/sync/', views.sync_changes, name='sync_changes'),
     
     # Player Matches URLs
     path('my-matches/', views.my_matches, name='my_matches'),
@@ -33,14 +40,23 @@ urlpatterns = [
     path('leagues/<int:league_id>/edit/', views.league_edit, name='league_edit'),
     path('leagues/<int:league_id>/delete/', views.league_delete, name='league_delete'),
     
+    # CSV Import
+    path('import/', views.data_import, name='data_import'),
+
     # Statistics
     path('statistics/', views.statistics, name='statistics'),
+    path('statistics/cube/', views.statistics_cube, name='statistics_cube'),
+    path('statistics/trends/', views.analytics_trends, name='analytics_trends'),
+    path('statistics/percentiles/', views.analytics_percentiles, name='analytics_percentiles'),
+    path('statistics/workload/', views.workload, name='workload'),
+    path('statistics/leaderboards/', views.leaderboards, name='leaderboards'),
 
     # Player Stats (list + CRUD) - underscore variant to match existing redirects
     path('player_stats/', views.player_stats, name='player_stats'),
     path('player_stats/create/', views.player_stats_create, name='player_stats_create'),
     path('player_stats/<int:stats_id>/edit/', views.player_stats_edit, name='player_stats_edit'),
     path('player_stats/<int:stats_id>/delete/', views.player_stats_delete, name='player_stats_delete'),
+    path('player_stats/export.<str:fmt>', views.player_stats_export, name='player_stats_export'),
     # Optional hyphenated aliases for cleaner URLs
     path('player-stats/', views.player_stats),
     path('player-stats/create/', views.player_stats_create),
@@ -1,81 +1,172 @@
+import io
+import json
+
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Count, Q
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
 from django.contrib.auth import get_user_model
-from .models import Team, Player, League, Match, PlayerStats, PlayerMatchParticipation
+from .models import (
+    AnalyticsCube, Team, Player, League, Match, PlayerStats, PlayerMatchParticipation, PlayerSeasonSummary,
+    TeamSeasonSummary,
+)
 from django.utils import timezone
 from datetime import datetime, timedelta
-from django.http import JsonResponse
+from django.http import Http404, HttpResponseBadRequest, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from .conditional import conditional_view
+from .panels import async_login_required, run_panels
+from .dashboard import coach_teams, global_counters
+from .archive import archived_player_totals, archived_team_totals
+from .columnar import monthly_trends, open_snapshot
+from .percentiles import METRICS as PERCENTILE_METRICS, cohort, cohort_from_params, player_percentiles
+from .workload import DEFAULT_DAYS as WORKLOAD_DAYS, MAX_DAYS as WORKLOAD_MAX_DAYS, RATIO_BANDS, squad_heatmap
+from .availability import DEFAULT_MATCHES as AVAILABILITY_MATCHES, availability_matrix, max_matches
+from .cube import CUBE_DIMENSIONS, cube_refreshed_until, filter_cube, slice_cube
+from .leaderboards import METRICS, league_scope, leaderboard, scope_from_params
+from .events import (
+    EVENT_TYPES_BY_FIELD, clean_event, delete_manual_stats, event_totals, record_events, save_manual_stats,
+)
+from .exports import EXPORT_FORMATS, export_lines, filter_export
+from .imports import IMPORTERS
+from .sync import MAX_SYNC_ITEMS, apply_sync_batch
+from .live import event_stream_response, is_asgi, match_channel, publish_on_commit, score_channel
+from .write_queue import run_write
+from accounts.user_cache import get_player_ids
 
 User = get_user_model()
 
-@login_required
-def dashboard(request):
+STATS_FIELDS = ['goals', 'assists', 'yellow_cards', 'red_cards', 'minutes_played']
+
+IMPORT_KINDS = [
+    ('players', '球員', 'username, nickname, team, age, positions, stamina, speed, technique, jersey_number, height, weight'),
+    ('matches', '比賽', 'league, season, team, opponent_name, match_date, venue, status, our_score, opponent_score, notes'),
+    ('stats', '球員統計', 'player_id, match_id, goals, assists, yellow_cards, red_cards, minutes_played'),
+]
+
+def _manages(user):
+    """管理員與教練可進入管理頁面"""
+    return user.user_type in ('admin', 'coach')
+
+def _visible_leagues(user):
+    """聯賽列表可見範圍；無權限時回傳 None"""
+    return League.objects.visible_to(user) if _manages(user) else None
+
+def _visible_matches(user):
+    """比賽列表可見範圍；無權限時回傳 None"""
+    return Match.objects.listing(user) if _manages(user) else None
+
+def _parse_filter_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return None
+
+def _match_filters(params):
+    """將比賽列表的 GET 參數轉為 (ORM 查詢條件, 表單回填值)；不合法的參數直接忽略"""
+    lookups = {}
+    selected = {}
+    date_from = _parse_filter_date(params.get('date_from'))
+    if date_from:
+        lookups['match_date__gte'] = timezone.make_aware(date_from)
+        selected['date_from'] = params['date_from']
+    date_to = _parse_filter_date(params.get('date_to'))
+    if date_to:
+        # 結束日期包含當天，以「小於隔天 00:00」表示，仍可使用 match_date 索引
+        lookups['match_date__lt'] = timezone.make_aware(date_to + timedelta(days=1))
+        selected['date_to'] = params['date_to']
+    status = params.get('status')
+    if status in dict(Match._meta.get_field('status').choices):
+        lookups['status'] = status
+        selected['status'] = status
+    for name, lookup in (('league', 'league_id'), ('team', 'team_id')):
+        value = params.get(name, '')
+        if value.isdigit():
+            lookups[lookup] = int(value)
+            selected[name] = int(value)
+    for name, lookup in (('venue', 'venue'), ('opponent', 'opponent_name')):
+        value = params.get(name, '').strip()
+        if value:
+            lookups[lookup] = value
+            selected[name] = value
+    return lookups, selected
+
+def _visible_player_stats(user):
+    """球員統計列表可見範圍；無權限時回傳 None"""
+    return PlayerStats.objects.visible_to(user) if _manages(user) else None
+
+def _dashboard_recent_matches(**filters):
+    return list(Match.objects.filter(
+        match_date__gte=timezone.now() - timedelta(days=30), **filters
+    ).select_related('team', 'league').order_by('match_date')[:5])
+
+def _dashboard_player_panels(user):
+    player_id, team_id = get_player_ids(user)
+    if player_id is None:
+        return {'player_profile': None}
+    return {
+        'player_profile': Player.objects.select_related('team__coach').get(id=player_id),
+        # 球員近期比賽
+        'recent_matches': _dashboard_recent_matches(team_id=team_id),
+        # 球員統計
+        'player_stats': PlayerStats.objects.filter(player_id=player_id).aggregate(
+            total_matches=Count('match'),
+            total_goals=Count('goals'),
+            total_assists=Count('assists'),
+            total_minutes=Count('minutes_played')
+        ),
+    }
+
+@async_login_required
+async def dashboard(request):
+    user = request.user
     context = {}
+    panels = [global_counters]
+    if user.user_type == 'admin':
+        panels.append(lambda: list(User.objects.filter(is_approved=False)))
+    elif user.user_type == 'coach':
+        panels.append(lambda: coach_teams(user))
+        # 修改近期比賽查詢，包含更多資訊
+        panels.append(lambda: _dashboard_recent_matches(team__coach=user))
+    elif user.user_type == 'player':
+        panels.append(lambda: _dashboard_player_panels(user))
+    results = await run_panels(*panels, concurrent=is_asgi(request))
+    counters = results[0]
     
     # 基本統計
-    if request.user.user_type == 'admin':
-        context['total_users'] = User.objects.count()
-        context['approved_users'] = User.objects.filter(is_approved=True).count()
-        context['pending_users'] = User.objects.filter(is_approved=False)
+    if user.user_type == 'admin':
+        context['total_users'] = counters['total_users']
+        context['approved_users'] = counters['approved_users']
+        context['pending_users'] = results[1]
     
     # 球隊數量統計 - 根據使用者類型調整
-    if request.user.user_type == 'admin':
-        context['total_teams'] = Team.objects.count()
-    elif request.user.user_type == 'coach':
-        context['total_teams'] = Team.objects.filter(coach=request.user).count()
+    if user.user_type == 'admin':
+        context['total_teams'] = counters['total_teams']
+    elif user.user_type == 'coach':
+        context['my_teams'] = results[1]
+        context['total_teams'] = len(context['my_teams'])
     else:
         context['total_teams'] = 0  # 球員不顯示球隊數量
-    context['upcoming_matches'] = Match.objects.filter(
-        match_date__gte=timezone.now(),
-        status='scheduled'
-    ).count()
+    context['upcoming_matches'] = counters['upcoming_matches']
     
     # 教練專用資料
-    if request.user.user_type == 'coach':
-        context['my_teams'] = Team.objects.filter(coach=request.user)
-        # 修改近期比賽查詢，包含更多資訊
-        context['recent_matches'] = Match.objects.filter(
-            Q(team__coach=request.user),
-            match_date__gte=timezone.now() - timedelta(days=30)
-        ).select_related('team', 'league').order_by('match_date')[:5]
+    if user.user_type == 'coach':
+        context['recent_matches'] = results[2]
     
     # 球員專用資料
-    if request.user.user_type == 'player':
-        try:
-            player_profile = Player.objects.get(user=request.user)
-            context['player_profile'] = player_profile
-            
-            # 球員近期比賽
-            context['recent_matches'] = Match.objects.filter(
-                team=player_profile.team,
-                match_date__gte=timezone.now() - timedelta(days=30)
-            ).select_related('team', 'league').order_by('match_date')[:5]
-            
-            # 球員統計
-            stats = PlayerStats.objects.filter(player=player_profile).aggregate(
-                total_matches=Count('match'),
-                total_goals=Count('goals'),
-                total_assists=Count('assists'),
-                total_minutes=Count('minutes_played')
-            )
-            context['player_stats'] = stats
-        except Player.DoesNotExist:
-            context['player_profile'] = None
+    if user.user_type == 'player':
+        context.update(results[1])
     
-    return render(request, 'dashboard.html', context)
+    return await sync_to_async(render)(request, 'dashboard.html', context)
 
 # Teams Views
 @login_required
 def teams(request):
-    if request.user.user_type == 'admin':
-        teams = Team.objects.all()
-    elif request.user.user_type == 'coach':
-        teams = Team.objects.filter(coach=request.user)
-    else:
+    if not _manages(request.user):
         messages.error(request, '您沒有權限查看此頁面。')
         return redirect('/dashboard/')
+    teams = Team.objects.visible_to(request.user).select_related('coach').prefetch_related('leagues')
     
     return render(request, 'team_management/teams.html', {'teams': teams})
 
@@ -117,10 +208,7 @@ def team_create(request):
     coaches = User.objects.filter(user_type='coach', is_approved=True) if request.user.user_type == 'admin' else None
     
     # 獲取可選的聯賽
-    if request.user.user_type == 'admin':
-        leagues = League.objects.all()
-    else:
-        leagues = League.objects.filter(coach=request.user)
+    leagues = League.objects.visible_to(request.user)
     
     return render(request, 'team_management/team_form.html', {
         'coaches': coaches,
@@ -130,10 +218,10 @@ def team_create(request):
 
 @login_required
 def team_edit(request, team_id):
-    team = get_object_or_404(Team, id=team_id)
+    team = get_object_or_404(Team.objects.with_access(request.user), id=team_id)
     
     # 權限檢查
-    if request.user.user_type == 'coach' and team.coach != request.user:
+    if request.user.user_type == 'coach' and not team.is_editable:
         messages.error(request, '您只能編輯自己的球隊。')
         return redirect('/dashboard/teams/')
     elif request.user.user_type not in ['admin', 'coach']:
@@ -166,10 +254,7 @@ def team_edit(request, team_id):
     coaches = User.objects.filter(user_type='coach', is_approved=True) if request.user.user_type == 'admin' else None
     
     # 獲取可選的聯賽
-    if request.user.user_type == 'admin':
-        leagues = League.objects.all()
-    else:
-        leagues = League.objects.filter(coach=request.user)
+    leagues = League.objects.visible_to(request.user)
     
     return render(request, 'team_management/team_form.html', {
         'team': team,
@@ -180,10 +265,10 @@ def team_edit(request, team_id):
 
 @login_required
 def team_delete(request, team_id):
-    team = get_object_or_404(Team, id=team_id)
+    team = get_object_or_404(Team.objects.with_access(request.user), id=team_id)
     
     # 權限檢查
-    if request.user.user_type == 'coach' and team.coach != request.user:
+    if request.user.user_type == 'coach' and not team.is_editable:
         messages.error(request, '您只能刪除自己的球隊。')
         return redirect('/dashboard/teams/')
     elif request.user.user_type not in ['admin', 'coach']:
@@ -201,13 +286,10 @@ def team_delete(request, team_id):
 # Players Views
 @login_required
 def players(request):
-    if request.user.user_type == 'admin':
-        players = Player.objects.all()
-    elif request.user.user_type == 'coach':
-        players = Player.objects.filter(team__coach=request.user)
-    else:
+    if not _manages(request.user):
         messages.error(request, '您沒有權限查看此頁面。')
         return redirect('/dashboard/')
+    players = Player.objects.visible_to(request.user).select_related('team')
     
     return render(request, 'team_management/players.html', {'players': players})
 
@@ -231,10 +313,10 @@ def player_create(request):
         technique = request.POST.get('technique')
         
         user = get_object_or_404(User, id=user_id, user_type='player')
-        team = get_object_or_404(Team, id=team_id)
+        team = get_object_or_404(Team.objects.with_access(request.user), id=team_id)
         
         # 權限檢查
-        if request.user.user_type == 'coach' and team.coach != request.user:
+        if request.user.user_type == 'coach' and not team.is_editable:
             messages.error(request, '您只能為自己的球隊新增球員。')
             return redirect('/dashboard/players/')
         
@@ -242,7 +324,7 @@ def player_create(request):
         if jersey_number and Player.objects.filter(team=team, jersey_number=jersey_number).exists():
             messages.error(request, f'球衣號碼 {jersey_number} 在此球隊已被使用。')
             return render(request, 'team_management/player_form.html', {
-                'teams': Team.objects.filter(coach=request.user) if request.user.user_type == 'coach' else Team.objects.all(),
+                'teams': Team.objects.visible_to(request.user),
                 'users': User.objects.filter(user_type='player', is_approved=True),
                 'action': 'create'
             })
@@ -251,7 +333,7 @@ def player_create(request):
         if not positions:
             messages.error(request, '請至少選擇一個位置。')
             return render(request, 'team_management/player_form.html', {
-                'teams': Team.objects.filter(coach=request.user) if request.user.user_type == 'coach' else Team.objects.all(),
+                'teams': Team.objects.visible_to(request.user),
                 'users': User.objects.filter(user_type='player', is_approved=True),
                 'action': 'create'
             })
@@ -282,7 +364,7 @@ def player_create(request):
         messages.success(request, f'球員 {player.nickname} 建立成功！已設定預設參加所有比賽。')
         return redirect('/dashboard/players/')
     
-    teams = Team.objects.filter(coach=request.user) if request.user.user_type == 'coach' else Team.objects.all()
+    teams = Team.objects.visible_to(request.user)
     users = User.objects.filter(user_type='player', is_approved=True)
     
     return render(request, 'team_management/player_form.html', {
@@ -293,10 +375,10 @@ def player_create(request):
 
 @login_required
 def player_edit(request, player_id):
-    player = get_object_or_404(Player, id=player_id)
+    player = get_object_or_404(Player.objects.with_access(request.user), id=player_id)
     
     # 權限檢查
-    if request.user.user_type == 'coach' and player.team.coach != request.user:
+    if request.user.user_type == 'coach' and not player.is_editable:
         messages.error(request, '您只能編輯自己球隊的球員。')
         return redirect('/dashboard/players/')
     elif request.user.user_type not in ['admin', 'coach']:
@@ -315,17 +397,17 @@ def player_edit(request, player_id):
         speed = request.POST.get('speed')
         technique = request.POST.get('technique')
         
-        team = get_object_or_404(Team, id=team_id)
+        team = get_object_or_404(Team.objects.with_access(request.user), id=team_id)
         
         # 權限檢查
-        if request.user.user_type == 'coach' and team.coach != request.user:
+        if request.user.user_type == 'coach' and not team.is_editable:
             messages.error(request, '您只能將球員分配到自己的球隊。')
             return redirect('/dashboard/players/')
         
         # 檢查球衣號碼是否重複（排除自己，如果有提供）
         if jersey_number and Player.objects.filter(team=team, jersey_number=jersey_number).exclude(id=player.id).exists():
             messages.error(request, f'球衣號碼 {jersey_number} 在此球隊已被使用。')
-            teams = Team.objects.filter(coach=request.user) if request.user.user_type == 'coach' else Team.objects.all()
+            teams = Team.objects.visible_to(request.user)
             return render(request, 'team_management/player_form.html', {
                 'player': player,
                 'teams': teams,
@@ -335,7 +417,7 @@ def player_edit(request, player_id):
         # 檢查位置是否有選擇
         if not positions:
             messages.error(request, '請至少選擇一個位置。')
-            teams = Team.objects.filter(coach=request.user) if request.user.user_type == 'coach' else Team.objects.all()
+            teams = Team.objects.visible_to(request.user)
             return render(request, 'team_management/player_form.html', {
                 'player': player,
                 'teams': teams,
@@ -357,7 +439,7 @@ def player_edit(request, player_id):
         messages.success(request, f'球員 {player.nickname} 更新成功！')
         return redirect('/dashboard/players/')
     
-    teams = Team.objects.filter(coach=request.user) if request.user.user_type == 'coach' else Team.objects.all()
+    teams = Team.objects.visible_to(request.user)
     
     return render(request, 'team_management/player_form.html', {
         'player': player,
@@ -367,10 +449,10 @@ def player_edit(request, player_id):
 
 @login_required
 def player_delete(request, player_id):
-    player = get_object_or_404(Player, id=player_id)
+    player = get_object_or_404(Player.objects.with_access(request.user), id=player_id)
     
     # 權限檢查
-    if request.user.user_type == 'coach' and player.team.coach != request.user:
+    if request.user.user_type == 'coach' and not player.is_editable:
         messages.error(request, '您只能刪除自己球隊的球員。')
         return redirect('/dashboard/players/')
     elif request.user.user_type not in ['admin', 'coach']:
@@ -387,12 +469,10 @@ def player_delete(request, player_id):
 
 # Leagues Views
 @login_required
+@conditional_view(_visible_leagues)
 def leagues(request):
-    if request.user.user_type == "admin":
-        leagues = League.objects.all()
-    elif request.user.user_type == "coach":
-        leagues = League.objects.filter(coach=request.user)
-    else:
+    leagues = _visible_leagues(request.user)
+    if leagues is None:
         messages.error(request, "您沒有權限查看此頁面。")
         return redirect("/dashboard/")
 
@@ -451,10 +531,10 @@ def league_create(request):
 
 @login_required
 def league_edit(request, league_id):
-    league = get_object_or_404(League, id=league_id)
+    league = get_object_or_404(League.objects.with_access(request.user), id=league_id)
 
     # 權限檢查
-    if request.user.user_type == "coach" and league.coach != request.user:
+    if request.user.user_type == "coach" and not league.is_editable:
         messages.error(request, "您只能編輯自己負責的聯賽。")
         return redirect("/dashboard/leagues/")
     elif request.user.user_type not in ["admin", "coach"]:
@@ -507,10 +587,10 @@ def league_edit(request, league_id):
 
 @login_required
 def league_delete(request, league_id):
-    league = get_object_or_404(League, id=league_id)
+    league = get_object_or_404(League.objects.with_access(request.user), id=league_id)
 
     # 權限檢查
-    if request.user.user_type == "coach" and league.coach != request.user:
+    if request.user.user_type == "coach" and not league.is_editable:
         messages.error(request, "您只能刪除自己負責的聯賽。")
         return redirect("/dashboard/leagues/")
     elif request.user.user_type not in ["admin", "coach"]:
@@ -527,16 +607,26 @@ def league_delete(request, league_id):
 
 # Matches Views
 @login_required
+@conditional_view(_visible_matches, ('updated_at', 'league__updated_at', 'team__updated_at'))
 def matches(request):
-    if request.user.user_type == 'admin':
-        matches = Match.objects.all()
-    elif request.user.user_type == 'coach':
-        matches = Match.objects.filter(Q(league__coach=request.user) | Q(team__coach=request.user)).distinct()
-    else:
+    matches = _visible_matches(request.user)
+    if matches is None:
         messages.error(request, '您沒有權限查看此頁面。')
         return redirect('/dashboard/')
     
-    return render(request, 'team_management/matches.html', {'matches': matches})
+    lookups, selected = _match_filters(request.GET)
+    visible = matches.order_by()
+    matches = Match.objects.listing(request.user, lookups).select_related('league', 'team').order_by('-match_date')
+    # 場地、對手下拉選單只列出使用者可見比賽中出現過的值
+    return render(request, 'team_management/matches.html', {
+        'matches': matches,
+        'selected': selected,
+        'status_choices': Match._meta.get_field('status').choices,
+        'league_choices': League.objects.visible_to(request.user).order_by('name'),
+        'team_choices': Team.objects.visible_to(request.user).order_by('name'),
+        'venue_choices': visible.values_list('venue', flat=True).distinct().order_by('venue'),
+        'opponent_choices': visible.values_list('opponent_name', flat=True).distinct().order_by('opponent_name'),
+    })
 
 @login_required
 def match_create(request):
@@ -600,8 +690,8 @@ def match_create(request):
         messages.success(request, f'比賽 {match.opponent_name} 建立成功！已為所有球員設定預設參加。')
         return redirect('/dashboard/matches/')
     
-    leagues = League.objects.filter(coach=request.user) if request.user.user_type == 'coach' else League.objects.all()
-    teams = Team.objects.filter(coach=request.user) if request.user.user_type == 'coach' else Team.objects.all()
+    leagues = League.objects.visible_to(request.user)
+    teams = Team.objects.visible_to(request.user)
     
     return render(request, 'team_management/match_form.html', {
         'leagues': leagues,
@@ -611,10 +701,10 @@ def match_create(request):
 
 @login_required
 def match_edit(request, match_id):
-    match = get_object_or_404(Match, id=match_id)
+    match = get_object_or_404(Match.objects.with_access(request.user), id=match_id)
     
     # 權限檢查
-    if request.user.user_type == 'coach' and match.league.coach != request.user:
+    if request.user.user_type == 'coach' and not match.is_editable:
         messages.error(request, '您只能編輯自己負責聯賽的比賽。')
         return redirect('/dashboard/matches/')
     elif request.user.user_type not in ['admin', 'coach']:
@@ -664,8 +754,8 @@ def match_edit(request, match_id):
         messages.success(request, f'比賽 {match.opponent_name} 更新成功！')
         return redirect('/dashboard/matches/')
     
-    leagues = League.objects.filter(coach=request.user) if request.user.user_type == 'coach' else League.objects.all()
-    teams = Team.objects.filter(coach=request.user) if request.user.user_type == 'coach' else Team.objects.all()
+    leagues = League.objects.visible_to(request.user)
+    teams = Team.objects.visible_to(request.user)
     
     return render(request, 'team_management/match_form.html', {
         'match': match,
@@ -676,10 +766,10 @@ def match_edit(request, match_id):
 
 @login_required
 def match_delete(request, match_id):
-    match = get_object_or_404(Match, id=match_id)
+    match = get_object_or_404(Match.objects.with_access(request.user), id=match_id)
     
     # 權限檢查
-    if request.user.user_type == 'coach' and match.league.coach != request.user:
+    if request.user.user_type == 'coach' and not match.is_editable:
         messages.error(request, '您只能刪除自己負責聯賽的比賽。')
         return redirect('/dashboard/matches/')
     elif request.user.user_type not in ['admin', 'coach']:
@@ -694,12 +784,24 @@ def match_delete(request, match_id):
     
     return render(request, 'team_management/match_confirm_delete.html', {'match': match})
 
+def _replace_manual_stats(stats, player_id, match_id, values):
+    """編輯統計；改到其他球員或比賽時，原紀錄以抵銷事件歸零後刪除，紅黃牌一併移到新紀錄"""
+    if (player_id, match_id) != (stats.player_id, stats.match_id):
+        values = dict(values, yellow_cards=stats.yellow_cards, red_cards=stats.red_cards)
+        delete_manual_stats(stats)
+    save_manual_stats(match_id, {player_id: values})
+
+def _save_participant_stats(match, updates):
+    """寫入一場比賽多名球員的統計數據；updates 為 {player_id: {欄位: 數值}}"""
+    player_ids = Player.objects.filter(id__in=updates, team=match.team).values_list('id', flat=True)
+    save_manual_stats(match.id, {player_id: updates[player_id] for player_id in player_ids})
+
 @login_required
 def match_participants(request, match_id):
-    match = get_object_or_404(Match, id=match_id)
+    match = get_object_or_404(Match.objects.with_access(request.user), id=match_id)
     
     # 權限檢查
-    if request.user.user_type == 'coach' and match.team.coach != request.user:
+    if request.user.user_type == 'coach' and not match.is_team_managed:
         messages.error(request, '您只能查看自己球隊的比賽參與情況。')
         return redirect('/dashboard/matches/')
     elif request.user.user_type not in ['admin', 'coach']:
@@ -708,37 +810,19 @@ def match_participants(request, match_id):
     
     # 處理POST請求 - 更新球員數據
     if request.method == 'POST':
+        # 欄位名稱格式: player_<id>_<field>，field 本身可能含底線（例如 yellow_cards）
+        updates = {}
         for key, value in request.POST.items():
             if key.startswith('player_'):
-                parts = key.split('_')
-                if len(parts) == 3:
-                    player_id = parts[1]
-                    field_name = parts[2]
-                    
+                parts = key.split('_', 2)
+                if len(parts) == 3 and parts[1].isdigit() and parts[2] in STATS_FIELDS:
                     try:
-                        player = Player.objects.get(id=player_id, team=match.team)
-                        
-                        # 獲取或創建PlayerStats記錄
-                        player_stats, created = PlayerStats.objects.get_or_create(
-                            player=player,
-                            match=match,
-                            defaults={
-                                'goals': 0,
-                                'assists': 0,
-                                'yellow_cards': 0,
-                                'red_cards': 0,
-                                'minutes_played': 0
-                            }
-                        )
-                        
-                        # 更新對應欄位
-                        if field_name in ['goals', 'assists', 'yellow_cards', 'red_cards', 'minutes_played']:
-                            setattr(player_stats, field_name, int(value) if value else 0)
-                            player_stats.save()
-                    
-                    except (Player.DoesNotExist, ValueError):
+                        updates.setdefault(int(parts[1]), {})[parts[2]] = int(value) if value else 0
+                    except ValueError:
                         continue
         
+        run_write(_save_participant_stats, match, updates)
+        
         messages.success(request, '球員數據已更新成功！')
         return redirect(f'/dashboard/matches/{match_id}/participants/')
     
@@ -779,20 +863,223 @@ def match_participants(request, match_id):
     
     return render(request, 'team_management/match_participants.html', {
         'match': match,
-        'players': team_players
+        'players': team_players,
+        # 只有 ASGI 下提供即時推播（見 live.py）
+        'live_stream': is_asgi(request),
     })
 
+def _participants_access(user, match_id):
+    """與 match_participants 相同的權限：管理員，或比賽所屬球隊的教練"""
+    match = get_object_or_404(Match.objects.with_access(user), id=match_id)
+    return user.user_type == 'admin' or (user.user_type == 'coach' and match.is_team_managed)
+
+@async_login_required
+async def match_participants_stream(request, match_id):
+    """match_participants 頁面的 SSE 串流，推送球員參加狀態的變動"""
+    if not await sync_to_async(_participants_access)(request.user, match_id):
+        return HttpResponseForbidden()
+    return event_stream_response(request, match_channel(match_id))
+
+# Live Scoring Views
+LIVE_STAT_FIELDS = ('goals', 'assists', 'yellow_cards', 'red_cards')
+LIVE_MAX_STEP = 5
+# WSGI 下即時比分頁改為輪詢的間隔秒數（不提供 SSE，見 live.py）
+LIVE_POLL_SECONDS = 15
+
+def _live_match(user, match_id):
+    """即時比分頁的權限，回傳 (match, can_score)；無權觀看時 match 為 None
+
+    管理員與聯賽、球隊教練可以記分；該隊球員（與其家長）可以觀看。
+    """
+    match = get_object_or_404(Match.objects.with_access(user), id=match_id)
+    if user.user_type == 'admin':
+        return match, True
+    if user.user_type == 'coach':
+        can_score = match.is_editable or match.is_team_managed
+        return (match if can_score else None), can_score
+    player_id, team_id = get_player_ids(user)
+    return (match if team_id is not None and team_id == match.team_id else None), False
+
+def _parse_step(value):
+    """增量必須是 -LIVE_MAX_STEP ~ LIVE_MAX_STEP 的整數（負值用於更正）"""
+    try:
+        step = int(value or 0)
+    except (TypeError, ValueError):
+        return None
+    return step if -LIVE_MAX_STEP <= step <= LIVE_MAX_STEP else None
+
+def _parse_live_increments(data, match):
+    """解析記分請求；不合法時回傳 None"""
+    increments = {'our': _parse_step(data.get('our')), 'opponent': _parse_step(data.get('opponent'))}
+    if None in increments.values():
+        return None
+    increments.update(player_id=None, field=None, step=0)
+    if data.get('player'):
+        step = _parse_step(data.get('step', 1))
+        field = data.get('stat')
+        if step is None or field not in LIVE_STAT_FIELDS or not str(data['player']).isdigit():
+            return None
+        player_id = int(data['player'])
+        if not Player.objects.filter(id=player_id, team_id=match.team_id).exists():
+            return None
+        increments.update(player_id=player_id, field=field, step=step)
+    return increments
+
+def _apply_live_increments(match_id, our, opponent, player_id, field, step):
+    """以 F() 運算式原子地累加比分、新增球員數據事件，提交後推播給觀看中的頁面
+
+    兩位記分員同時送出時，資料庫各自在目前值上累加，不會互相覆蓋。
+    第一筆記分會把「已安排」的比賽切換為「進行中」。
+    """
+    now = timezone.now()
+    Match.objects.filter(id=match_id).update(
+        our_score=Greatest(Coalesce(F('our_score'), 0) + our, 0),
+        opponent_score=Greatest(Coalesce(F('opponent_score'), 0) + opponent, 0),
+        status=Case(When(status='scheduled', then=Value('in_progress')), default=F('status')),
+        updated_at=now,
+    )
+    result = Match.objects.values('our_score', 'opponent_score', 'status').get(id=match_id)
+    publish_on_commit(score_channel(match_id), 'score', result)
+
+    if player_id is not None:
+        # 球員數據以事件記錄，PlayerStats 由事件衍生
+        current = event_totals(match_id, [player_id]).get((player_id, field), 0)
+        step = max(step, -current)
+        if step:
+            record_events([{
+                'match_id': match_id, 'player_id': player_id,
+                'event_type': EVENT_TYPES_BY_FIELD[field], 'delta': step,
+            }], source='live')
+        stat = {'player_id': player_id, 'field': field, 'value': current + step}
+        publish_on_commit(score_channel(match_id), 'stat', stat)
+        result = dict(result, stat=stat)
+    return result
+
+@login_required
+def match_live(request, match_id):
+    """即時比分：GET 顯示比分頁（記分員另有記分按鈕），POST 記錄一次增量"""
+    match, can_score = _live_match(request.user, match_id)
+    if match is None:
+        messages.error(request, '您沒有權限查看此比賽。')
+        return redirect('/dashboard/')
+    
+    if request.method == 'POST':
+        if not can_score:
+            return JsonResponse({'error': '您沒有權限記錄比分。'}, status=403)
+        increments = _parse_live_increments(request.POST, match)
+        if increments is None:
+            return JsonResponse({'error': '記分參數不正確。'}, status=400)
+        return JsonResponse(run_write(_apply_live_increments, match.id, **increments))
+    
+    stats = {
+        row['player_id']: row
+        for row in PlayerStats.objects.filter(match=match).values('player_id', *LIVE_STAT_FIELDS)
+    }
+    players = list(Player.objects.filter(team_id=match.team_id).only('id', 'nickname', 'jersey_number'))
+    for player in players:
+        row = stats.get(player.id, {})
+        player.live_stats = [(field, row.get(field, 0)) for field in LIVE_STAT_FIELDS]
+    return render(request, 'team_management/match_live.html', {
+        'match': match,
+        'can_score': can_score,
+        'players': players,
+        'live_stream': is_asgi(request),
+        'poll_seconds': LIVE_POLL_SECONDS,
+    })
+
+@login_required
+def match_live_state(request, match_id):
+    """即時比分頁在 WSGI 下的輪詢端點：目前的比分與球員數據（JSON），每次兩個小查詢"""
+    match, can_score = _live_match(request.user, match_id)
+    if match is None:
+        return JsonResponse({'error': '您沒有權限查看此比賽。'}, status=403)
+    rows = PlayerStats.objects.filter(match_id=match.id).values('player_id', *LIVE_STAT_FIELDS)
+    return JsonResponse({
+        'our_score': match.our_score,
+        'opponent_score': match.opponent_score,
+        'status': match.status,
+        'stats': [
+            {'player_id': row['player_id'], 'field': field, 'value': row[field]}
+            for row in rows for field in LIVE_STAT_FIELDS
+        ],
+    })
+
+@async_login_required
+async def match_live_stream(request, match_id):
+    """即時比分頁的 SSE 串流，推送比分與球員數據的變動"""
+    match, can_score = await sync_to_async(_live_match)(request.user, match_id)
+    if match is None:
+        return HttpResponseForbidden()
+    return event_stream_response(request, score_channel(match_id))
+
+MAX_EVENTS_PER_REQUEST = 500
+
+def _parse_event_batch(items, match):
+    """驗證場邊送出的事件；回傳 (事件列表, 錯誤訊息)"""
+    if not isinstance(items, list) or not items:
+        return None, '缺少事件資料。'
+    if len(items) > MAX_EVENTS_PER_REQUEST:
+        return None, f'每次最多 {MAX_EVENTS_PER_REQUEST} 筆事件。'
+    team_players = set(Player.objects.filter(team_id=match.team_id).values_list('id', flat=True))
+    events = []
+    for index, item in enumerate(items):
+        try:
+            events.append(clean_event(item, match.id, team_players))
+        except ValueError:
+            return None, f'第 {index + 1} 筆事件內容不正確。'
+    return events, None
+
+@login_required
+def match_events(request, match_id):
+    """場邊批次記錄比賽事件（JSON）：{"events": [{"player", "type", "minute", "delta"}, ...]}"""
+    if request.method != 'POST':
+        return JsonResponse({'error': '只接受 POST。'}, status=405)
+    match, can_score = _live_match(request.user, match_id)
+    if match is None or not can_score:
+        return JsonResponse({'error': '您沒有權限記錄此比賽的事件。'}, status=403)
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'JSON 格式不正確。'}, status=400)
+    events, error = _parse_event_batch(payload.get('events') if isinstance(payload, dict) else None, match)
+    if error:
+        return JsonResponse({'error': error}, status=400)
+    created = run_write(record_events, events)
+    return JsonResponse({'recorded': len(created)}, status=201)
+
+@login_required
+def sync_changes(request):
+    """場邊離線佇列的批次同步（JSON）：{"items": [{"key", "kind", "match", "player", ...}, ...]}
+
+    kind 為 participation（is_participating）、stats（values: {欄位: 總數}）或
+    event（type、minute、delta）；回傳逐筆結果，重送的鍵標記為 duplicate。
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': '只接受 POST。'}, status=405)
+    if request.user.user_type not in ('admin', 'coach'):
+        return JsonResponse({'error': '只有管理員和教練可以同步比賽資料。'}, status=403)
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'JSON 格式不正確。'}, status=400)
+    items = payload.get('items') if isinstance(payload, dict) else None
+    if not isinstance(items, list) or not items:
+        return JsonResponse({'error': '缺少同步資料。'}, status=400)
+    if len(items) > MAX_SYNC_ITEMS:
+        return JsonResponse({'error': f'每次最多 {MAX_SYNC_ITEMS} 筆變更。'}, status=400)
+    results = run_write(apply_sync_batch, request.user, items)
+    return JsonResponse({'results': results})
+
 # Player Stats Views
 @login_required
+@conditional_view(_visible_player_stats, ('updated_at', 'player__updated_at', 'match__updated_at'))
 def player_stats(request):
-    if request.user.user_type == 'admin':
-        stats = PlayerStats.objects.all()
-    elif request.user.user_type == 'coach':
-        stats = PlayerStats.objects.filter(player__team__coach=request.user)
-    else:
+    stats = _visible_player_stats(request.user)
+    if stats is None:
         messages.error(request, '您沒有權限查看此頁面。')
         return redirect('/dashboard/')
     
+    stats = stats.select_related('player', 'match')
     return render(request, 'team_management/player_stats.html', {'stats': stats})
 
 @login_required
@@ -804,31 +1091,33 @@ def player_stats_create(request):
     if request.method == 'POST':
         player_id = request.POST.get('player')
         match_id = request.POST.get('match')
-        goals = request.POST.get('goals') or 0
-        assists = request.POST.get('assists') or 0
-        minutes_played = request.POST.get('minutes_played') or 0
+        try:
+            goals = int(request.POST.get('goals') or 0)
+            assists = int(request.POST.get('assists') or 0)
+            minutes_played = int(request.POST.get('minutes_played') or 0)
+        except ValueError:
+            messages.error(request, '統計數據必須是整數。')
+            return redirect('/dashboard/player_stats/')
         
-        player = get_object_or_404(Player, id=player_id)
-        match = get_object_or_404(Match, id=match_id)
+        player = get_object_or_404(Player.objects.with_access(request.user), id=player_id)
+        match = get_object_or_404(Match.objects.with_access(request.user), id=match_id)
         
         # 權限檢查
-        if request.user.user_type == 'coach' and (player.team.coach != request.user or match.league.coach != request.user):
+        if request.user.user_type == 'coach' and not (player.is_editable and match.is_editable):
             messages.error(request, '您只能為自己球隊的球員和自己負責聯賽的比賽新增統計數據。')
             return redirect('/dashboard/player_stats/')
         
-        stats = PlayerStats.objects.create(
-            player=player,
-            match=match,
-            goals=goals,
-            assists=assists,
-            minutes_played=minutes_played
-        )
+        run_write(save_manual_stats, match.id, {player.id: {
+            'goals': goals,
+            'assists': assists,
+            'minutes_played': minutes_played
+        }})
         
         messages.success(request, '球員統計數據建立成功！')
         return redirect('/dashboard/player_stats/')
     
-    players = Player.objects.filter(team__coach=request.user) if request.user.user_type == 'coach' else Player.objects.all()
-    matches = Match.objects.filter(league__coach=request.user) if request.user.user_type == 'coach' else Match.objects.all()
+    players = Player.objects.visible_to(request.user)
+    matches = Match.objects.editable_by(request.user)
     
     return render(request, 'team_management/player_stats_form.html', {
         'players': players,
@@ -838,10 +1127,10 @@ def player_stats_create(request):
 
 @login_required
 def player_stats_edit(request, stats_id):
-    stats = get_object_or_404(PlayerStats, id=stats_id)
+    stats = get_object_or_404(PlayerStats.objects.with_access(request.user), id=stats_id)
     
     # 權限檢查
-    if request.user.user_type == 'coach' and (stats.player.team.coach != request.user or stats.match.league.coach != request.user):
+    if request.user.user_type == 'coach' and not stats.is_editable:
         messages.error(request, '您只能編輯自己球隊的球員和自己負責聯賽的比賽統計數據。')
         return redirect('/dashboard/player_stats/')
     elif request.user.user_type not in ['admin', 'coach']:
@@ -851,30 +1140,33 @@ def player_stats_edit(request, stats_id):
     if request.method == 'POST':
         player_id = request.POST.get('player')
         match_id = request.POST.get('match')
-        goals = request.POST.get('goals') or 0
-        assists = request.POST.get('assists') or 0
-        minutes_played = request.POST.get('minutes_played') or 0
+        try:
+            goals = int(request.POST.get('goals') or 0)
+            assists = int(request.POST.get('assists') or 0)
+            minutes_played = int(request.POST.get('minutes_played') or 0)
+        except ValueError:
+            messages.error(request, '統計數據必須是整數。')
+            return redirect('/dashboard/player_stats/')
         
-        player = get_object_or_404(Player, id=player_id)
-        match = get_object_or_404(Match, id=match_id)
+        player = get_object_or_404(Player.objects.with_access(request.user), id=player_id)
+        match = get_object_or_404(Match.objects.with_access(request.user), id=match_id)
         
         # 權限檢查
-        if request.user.user_type == 'coach' and (player.team.coach != request.user or match.league.coach != request.user):
+        if request.user.user_type == 'coach' and not (player.is_editable and match.is_editable):
             messages.error(request, '您只能將統計數據分配給自己球隊的球員和自己負責聯賽的比賽。')
             return redirect('/dashboard/player_stats/')
         
-        stats.player = player
-        stats.match = match
-        stats.goals = goals
-        stats.assists = assists
-        stats.minutes_played = minutes_played
-        stats.save()
+        run_write(_replace_manual_stats, stats, player.id, match.id, {
+            'goals': goals,
+            'assists': assists,
+            'minutes_played': minutes_played
+        })
         
         messages.success(request, '球員統計數據更新成功！')
         return redirect('/dashboard/player_stats/')
     
-    players = Player.objects.filter(team__coach=request.user) if request.user.user_type == 'coach' else Player.objects.all()
-    matches = Match.objects.filter(league__coach=request.user) if request.user.user_type == 'coach' else Match.objects.all()
+    players = Player.objects.visible_to(request.user)
+    matches = Match.objects.editable_by(request.user)
     
     return render(request, 'team_management/player_stats_form.html', {
         'stats': stats,
@@ -885,10 +1177,10 @@ def player_stats_edit(request, stats_id):
 
 @login_required
 def player_stats_delete(request, stats_id):
-    stats = get_object_or_404(PlayerStats, id=stats_id)
+    stats = get_object_or_404(PlayerStats.objects.with_access(request.user), id=stats_id)
     
     # 權限檢查
-    if request.user.user_type == 'coach' and (stats.player.team.coach != request.user or stats.match.league.coach != request.user):
+    if request.user.user_type == 'coach' and not stats.is_editable:
         messages.error(request, '您只能刪除自己球隊的球員和自己負責聯賽的比賽統計數據。')
         return redirect('/dashboard/player_stats/')
     elif request.user.user_type not in ['admin', 'coach']:
@@ -896,12 +1188,61 @@ def player_stats_delete(request, stats_id):
         return redirect('/dashboard/')
     
     if request.method == 'POST':
-        stats.delete()
+        run_write(delete_manual_stats, stats)
         messages.success(request, '球員統計數據已刪除。')
         return redirect('/dashboard/player_stats/')
     
     return render(request, 'team_management/player_stats_confirm_delete.html', {'stats': stats})
 
+@login_required
+def player_stats_export(request, fmt):
+    """串流匯出球員統計（csv 或 jsonl），範圍與 player_stats 相同；可用 season、league、team、player 篩選"""
+    if fmt not in EXPORT_FORMATS:
+        raise Http404
+    stats = _visible_player_stats(request.user)
+    if stats is None:
+        messages.error(request, '您沒有權限查看此頁面。')
+        return redirect('/dashboard/')
+    try:
+        stats = filter_export(stats, request.GET)
+    except ValueError:
+        return HttpResponseBadRequest('篩選條件不正確。')
+    content_type, extension = EXPORT_FORMATS[fmt]
+    response = StreamingHttpResponse(export_lines(stats, fmt), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="player_stats.{extension}"'
+    return response
+
+# 匯入頁面最多列出的錯誤筆數（完整錯誤可改用 import_csv 指令查看）
+MAX_DISPLAYED_IMPORT_ERRORS = 200
+
+@login_required
+def data_import(request):
+    """上傳 CSV 批次匯入球員、比賽或球員統計"""
+    if not _manages(request.user):
+        messages.error(request, '您沒有權限執行此操作。')
+        return redirect('/dashboard/')
+
+    context = {'kinds': IMPORT_KINDS}
+    if request.method == 'POST':
+        kind = request.POST.get('kind')
+        upload = request.FILES.get('file')
+        if kind not in IMPORTERS or upload is None:
+            messages.error(request, '請選擇匯入類型與 CSV 檔案。')
+            return render(request, 'team_management/data_import.html', context)
+        # 以文字串流逐列讀取上傳的檔案；utf-8-sig 略過 Excel 加上的 BOM
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        try:
+            result = IMPORTERS[kind](request.user).run(stream, dry_run=request.POST.get('dry_run') == 'on')
+        except UnicodeDecodeError:
+            messages.error(request, 'CSV 檔案必須是 UTF-8 編碼。')
+            return render(request, 'team_management/data_import.html', context)
+        context.update({
+            'kind': kind,
+            'result': result,
+            'errors': result.errors[:MAX_DISPLAYED_IMPORT_ERRORS],
+        })
+    return render(request, 'team_management/data_import.html', context)
+
 # User Management Views
 @login_required
 def user_management(request):
@@ -940,164 +1281,170 @@ def reject_user(request, user_id):
 
 
 
-@login_required
-def statistics(request):
-    """統計數據頁面 - 根據用戶類型顯示相應的統計數據"""
-    context = {}
-    
-    if request.user.user_type == 'admin':
-        # 管理員可以看到所有數據
-        context['total_teams'] = Team.objects.count()
-        context['total_players'] = Player.objects.count()
-        context['total_matches'] = Match.objects.count()
-        context['finished_matches'] = Match.objects.filter(status='finished').count()
+MATCH_STATUS_LABELS = {
+    'scheduled': '已安排',
+    'in_progress': '進行中',
+    'finished': '已完成',
+    'cancelled': '已取消',
+    'postponed': '已延期'
+}
 
-        # 球隊統計
-        teams = Team.objects.all()
-        team_stats = []
-        for team in teams:
-            players_count = Player.objects.filter(team=team).count()
-            matches = Match.objects.filter(team=team)
-            matches_count = matches.count()
-
-            # 計算勝負平 - 只統計已結束的比賽
-            wins = 0
-            losses = 0
-            draws = 0
-            for match in matches.filter(status__in=['finished']):
-                if match.our_score is not None and match.opponent_score is not None:
-                    if match.our_score > match.opponent_score:
-                        wins += 1
-                    elif match.our_score < match.opponent_score:
-                        losses += 1
-                    else:
-                        draws += 1
-
-            # 動態屬性
-            team.player_count = players_count
-            team.total_matches = matches_count
-            team.wins = wins
-            team.losses = losses
-            team.draws = draws
-            team_stats.append(team)
-
-        context['teams'] = team_stats
+def _team_records(teams):
+    """球隊附加球員數、比賽數與勝負平（只統計已結束且有比分的比賽），一次查詢完成
 
+    已封存聯賽的戰績另以一次查詢取自 TeamSeasonSummary 後加上。
+    """
+    finished = Q(match__status='finished')
+    teams = list(teams.annotate(
+        player_count=Count('player', distinct=True),
+        total_matches=Count('match', distinct=True),
+        wins=Count('match', filter=finished & Q(match__our_score__gt=F('match__opponent_score')), distinct=True),
+        losses=Count('match', filter=finished & Q(match__our_score__lt=F('match__opponent_score')), distinct=True),
+        draws=Count('match', filter=finished & Q(match__our_score=F('match__opponent_score')), distinct=True),
+    ))
+    archived = archived_team_totals([team.id for team in teams])
+    for team in teams:
+        totals = archived.get(team.id)
+        if totals:
+            team.total_matches += totals['matches']
+            team.wins += totals['wins']
+            team.draws += totals['draws']
+            team.losses += totals['losses']
+    return teams
+
+def _stat_sums(prefix=''):
+    """各項統計欄位加總（無資料時為 0），prefix 用於從 Player 經由關聯加總"""
+    return {
+        'total_goals': Coalesce(Sum(prefix + 'goals'), 0),
+        'total_assists': Coalesce(Sum(prefix + 'assists'), 0),
+        'total_yellow_cards': Coalesce(Sum(prefix + 'yellow_cards'), 0),
+        'total_red_cards': Coalesce(Sum(prefix + 'red_cards'), 0),
+        'total_minutes': Coalesce(Sum(prefix + 'minutes_played'), 0),
+    }
+
+def _finished_participations(**filters):
+    return PlayerMatchParticipation.objects.filter(
+        is_participating=True, match__status='finished', **filters
+    )
+
+def _match_totals():
+    """比賽總數與已結束數，包含已封存聯賽的比賽"""
+    totals = Match.objects.aggregate(
+        total_matches=Count('pk'),
+        finished_matches=Count('pk', filter=Q(status='finished')),
+    )
+    archived = TeamSeasonSummary.objects.aggregate(
+        matches=Coalesce(Sum('matches'), 0), finished=Coalesce(Sum('finished'), 0)
+    )
+    totals['total_matches'] += archived['matches']
+    totals['finished_matches'] += archived['finished']
+    return totals
+
+def _admin_statistics_panels():
+    return [
+        lambda: {'total_teams': Team.objects.count()},
+        lambda: {'total_players': Player.objects.count()},
+        lambda: _match_totals(),
+        # 球隊統計
+        lambda: {'teams': _team_records(Team.objects.select_related('coach'))},
         # 組別分布數據
-        from django.db.models import Count
-        group_data = Team.objects.values('group').annotate(count=Count('group'))
+        lambda: {'group_data': list(Team.objects.values('group').annotate(count=Count('group')))},
+        # 比賽狀態分布數據
+        lambda: {'match_status_data': list(Match.objects.values('status').annotate(count=Count('status')))},
+    ]
+
+# _stat_sums() 的名稱 → 封存彙總的欄位
+ARCHIVED_STAT_FIELDS = {
+    'total_goals': 'goals',
+    'total_assists': 'assists',
+    'total_yellow_cards': 'yellow_cards',
+    'total_red_cards': 'red_cards',
+    'total_minutes': 'minutes_played',
+}
+
+def _add_archived(stats, archived):
+    """把封存彙總加到 _stat_sums() 的結果上；matches_played 另由呼叫端處理"""
+    if archived:
+        for name, field in ARCHIVED_STAT_FIELDS.items():
+            stats[name] += archived[field]
+    return stats
+
+def _coach_player_statistics(user):
+    sums = _stat_sums('playerstats__')
+    players = Player.objects.filter(team__coach=user).select_related('team').annotate(**sums)
+    archived = archived_player_totals(player__team__coach=user)
+    statistics = []
+    for player in players:
+        player_stat = _add_archived({name: getattr(player, name) for name in sums}, archived.get(player.id))
+        player_stat['player'] = player
+        player_stat['archived_matches_played'] = archived.get(player.id, {}).get('matches_played', 0)
+        statistics.append(player_stat)
+    return statistics
+
+def _coach_statistics_panels(user):
+    return [
+        lambda: {'my_teams': _team_records(Team.objects.filter(coach=user))},
+        lambda: {'my_players_count': Player.objects.filter(team__coach=user).count()},
+        lambda: {'my_matches_count': Match.objects.filter(team__coach=user).count()},
+        # 球員統計（出賽數另以一次分組查詢取得，避免與統計 JOIN 後重複計算）
+        lambda: {'player_statistics': _coach_player_statistics(user)},
+        lambda: {'matches_played': dict(
+            _finished_participations(player__team__coach=user)
+            .values_list('player_id').annotate(count=Count('pk'))
+        )},
+    ]
+
+def _player_statistics_panels(player_id):
+    return [
+        lambda: {'matches_played': _finished_participations(player_id=player_id).count()},
+        # 個人統計
+        lambda: {'player_stats': PlayerStats.objects.filter(player_id=player_id).aggregate(**_stat_sums())},
+        # 已封存聯賽的賽季統計（總數會加到個人統計上）
+        lambda: {'archived_seasons': list(
+            PlayerSeasonSummary.objects.filter(player_id=player_id).select_related('league').order_by('-league__end_date')
+        )},
+        # 個人比賽記錄
+        lambda: {'player_match_stats': list(
+            PlayerStats.objects.filter(player_id=player_id).select_related('match', 'player__team')
+        )},
+    ]
+
+@async_login_required
+async def statistics(request):
+    """統計數據頁面 - 根據用戶類型顯示相應的統計數據
+
+    各面板的查詢互不相依，ASGI 下以 run_panels() 同時執行。
+    """
+    user = request.user
+    snapshot = open_snapshot()
+    context = {'analytics_snapshot_at': snapshot.created_at if snapshot else None}
+    
+    if user.user_type == 'admin':
+        # 管理員可以看到所有數據
+        for panel in await run_panels(*_admin_statistics_panels(), concurrent=is_asgi(request)):
+            context.update(panel)
+        group_data = context.pop('group_data')
         context['group_labels'] = [item['group'] for item in group_data]
         context['group_data'] = [item['count'] for item in group_data]
-
-        # 比賽狀態分布數據
-        match_status_data = Match.objects.values('status').annotate(count=Count('status'))
-        status_mapping = {
-            'scheduled': '已安排',
-            'in_progress': '進行中',
-            'finished': '已完成',
-            'cancelled': '已取消',
-            'postponed': '已延期'
-        }
-        context['match_status_labels'] = [status_mapping.get(item['status'], item['status']) for item in match_status_data]
+        match_status_data = context.pop('match_status_data')
+        context['match_status_labels'] = [MATCH_STATUS_LABELS.get(item['status'], item['status']) for item in match_status_data]
         context['match_status_data'] = [item['count'] for item in match_status_data]
         
-    elif request.user.user_type == 'coach':
+    elif user.user_type == 'coach':
         # 教練只能看到自己的球隊數據
-        my_teams = Team.objects.filter(coach=request.user)
-        context['my_teams_count'] = my_teams.count()
-        context['my_players_count'] = Player.objects.filter(team__coach=request.user).count()
-        context['my_matches_count'] = Match.objects.filter(team__coach=request.user).count()
-        
-        # 動態計算球隊統計
-        team_stats = []
-        for team in my_teams:
-            players_count = Player.objects.filter(team=team).count()
-            matches = Match.objects.filter(team=team)
-            matches_count = matches.count()
-            
-            # 計算勝負平 - 修正狀態過濾條件
-            wins = 0
-            losses = 0
-            draws = 0
-            for match in matches.filter(status__in=['finished']):
-                if match.our_score is not None and match.opponent_score is not None:
-                    if match.our_score > match.opponent_score:
-                        wins += 1
-                    elif match.our_score < match.opponent_score:
-                        losses += 1
-                    else:
-                        draws += 1
-            
-            # 添加動態屬性
-            team.player_count = players_count
-            team.total_matches = matches_count
-            team.wins = wins
-            team.losses = losses
-            team.draws = draws
-            
-        context['my_teams'] = my_teams
-        
-        # 球員統計
-        players = Player.objects.filter(team__coach=request.user)
-        player_statistics = []
-        for player in players:
-            stats = PlayerStats.objects.filter(player=player)
-            matches_played = PlayerMatchParticipation.objects.filter(
-                player=player, 
-                is_participating=True,
-                match__status='finished'
-            ).count()
-            
-            total_goals = sum(stat.goals for stat in stats)
-            total_assists = sum(stat.assists for stat in stats)
-            total_yellow_cards = sum(stat.yellow_cards for stat in stats)
-            total_red_cards = sum(stat.red_cards for stat in stats)
-            total_minutes = sum(stat.minutes_played for stat in stats)
-            
-            player_statistics.append({
-                'player': player,
-                'matches_played': matches_played,
-                'total_goals': total_goals,
-                'total_assists': total_assists,
-                'total_yellow_cards': total_yellow_cards,
-                'total_red_cards': total_red_cards,
-                'total_minutes': total_minutes
-            })
-        
-        context['player_statistics'] = player_statistics
+        for panel in await run_panels(*_coach_statistics_panels(user), concurrent=is_asgi(request)):
+            context.update(panel)
+        context['my_teams_count'] = len(context['my_teams'])
+        matches_played = context.pop('matches_played')
+        for player_stat in context['player_statistics']:
+            player_stat['matches_played'] = (
+                matches_played.get(player_stat['player'].id, 0) + player_stat.pop('archived_matches_played')
+            )
         
-    elif request.user.user_type == 'player':
+    elif user.user_type == 'player':
         # 球員只能看到自己的統計數據
-        try:
-            player = Player.objects.get(user=request.user)
-            player_stats = PlayerStats.objects.filter(player=player)
-            
-            matches_played = PlayerMatchParticipation.objects.filter(
-                player=player, 
-                is_participating=True,
-                match__status='finished'
-            ).count()
-            
-            # 個人統計
-            total_goals = sum(stats.goals for stats in player_stats)
-            total_assists = sum(stats.assists for stats in player_stats)
-            total_yellow_cards = sum(stats.yellow_cards for stats in player_stats)
-            total_red_cards = sum(stats.red_cards for stats in player_stats)
-            total_minutes = sum(stats.minutes_played for stats in player_stats)
-            
-            context['player_stats'] = {
-                'matches_played': matches_played,
-                'total_goals': total_goals,
-                'total_assists': total_assists,
-                'total_yellow_cards': total_yellow_cards,
-                'total_red_cards': total_red_cards,
-                'total_minutes': total_minutes
-            }
-            
-            # 個人比賽記錄
-            context['player_match_stats'] = PlayerStats.objects.filter(player=player).select_related('match')
-            
-        except Player.DoesNotExist:
+        player_id, team_id = await sync_to_async(get_player_ids)(user)
+        if player_id is None:
             context['player_stats'] = {
                 'matches_played': 0,
                 'total_goals': 0,
@@ -1107,8 +1454,243 @@ def statistics(request):
                 'total_minutes': 0
             }
             context['player_match_stats'] = []
-    
-    return render(request, 'team_management/statistics.html', context)
+            context['archived_seasons'] = []
+        else:
+            for panel in await run_panels(*_player_statistics_panels(player_id), concurrent=is_asgi(request)):
+                context.update(panel)
+            player_stats = context['player_stats']
+            player_stats['matches_played'] = context.pop('matches_played')
+            for season in context['archived_seasons']:
+                _add_archived(player_stats, vars(season))
+                player_stats['matches_played'] += season.matches_played
+    
+    return await sync_to_async(render)(request, 'team_management/statistics.html', context)
+
+@login_required
+def statistics_cube(request):
+    """依組別、賽季、聯賽、球隊與月份切片的成績統計，只加總統計立方體的列"""
+    user = request.user
+    if not _manages(user):
+        messages.error(request, '您沒有權限查看此頁面。')
+        return redirect('/dashboard/')
+
+    scope = AnalyticsCube.objects.all()
+    if user.user_type == 'coach':
+        scope = scope.filter(team__coach=user)
+    dimension = request.GET.get('by', 'month')
+    if dimension not in CUBE_DIMENSIONS:
+        dimension = 'month'
+    try:
+        rows, totals = slice_cube(filter_cube(scope, request.GET), dimension)
+    except ValueError:
+        return HttpResponseBadRequest('篩選條件不正確。')
+
+    context = {
+        'dimensions': [(name, label) for name, (fields, label) in CUBE_DIMENSIONS.items()],
+        'dimension': dimension,
+        'dimension_label': CUBE_DIMENSIONS[dimension][1],
+        'rows': rows,
+        'totals': totals,
+        'groups': [value for value, label in League._meta.get_field('group').choices],
+        'seasons': scope.values_list('season', flat=True).distinct().order_by('-season'),
+        'leagues': League.objects.filter(id__in=scope.values('league_id')).order_by('-season', 'name'),
+        'teams': Team.objects.filter(id__in=scope.values('team_id')).order_by('name'),
+        'filters': request.GET,
+        'refreshed_until': cube_refreshed_until(),
+    }
+    return render(request, 'team_management/statistics_cube.html', context)
+
+# 排行榜頁面列出的名次數
+LEADERBOARD_PAGE_SIZE = 20
+
+@login_required
+def leaderboards(request):
+    """聯賽或組別（同賽季）的射手榜、助攻榜、每 90 分鐘貢獻與紀律榜，讀取預先計算的名次"""
+    metric = request.GET.get('metric', 'goals')
+    if metric not in METRICS:
+        metric = 'goals'
+    leagues = list(League.objects.order_by('-end_date', 'name'))
+    if request.GET.get('league') or request.GET.get('group'):
+        try:
+            scope = scope_from_params(request.GET)
+        except ValueError:
+            return HttpResponseBadRequest('篩選條件不正確。')
+    else:
+        scope = league_scope(leagues[0].id) if leagues else None
+
+    player_id = get_player_ids(request.user)[0] if request.user.user_type == 'player' else None
+    board = leaderboard(scope, metric, LEADERBOARD_PAGE_SIZE, player_id) if scope else {'top': [], 'me': None}
+    context = {
+        'metrics': [(name, label) for name, (field, rank_field, label) in METRICS.items()],
+        'metric': metric,
+        'metric_label': METRICS[metric][2],
+        'scope': scope,
+        'leagues': leagues,
+        'groups': [value for value, label in League._meta.get_field('group').choices],
+        'seasons': sorted({league.season for league in leagues}, reverse=True),
+        'filters': request.GET,
+        'top': board['top'],
+        'me': board['me'],
+    }
+    return render(request, 'team_management/leaderboards.html', context)
+
+def _optional_int(params, name):
+    value = params.get(name)
+    return int(value) if value else None
+
+@login_required
+def analytics_trends(request):
+    """每月成績與統計趨勢（JSON），只讀取欄式快照，不查詢資料庫
+
+    可用 team、league、player 篩選；教練限自己的球隊，球員只能查看自己的統計。
+    """
+    user = request.user
+    snapshot = open_snapshot()
+    if snapshot is None:
+        return JsonResponse({'error': '分析快照尚未建立。'}, status=503)
+    try:
+        team_id = _optional_int(request.GET, 'team')
+        league_id = _optional_int(request.GET, 'league')
+        player_id = _optional_int(request.GET, 'player')
+    except ValueError:
+        return JsonResponse({'error': '篩選條件不正確。'}, status=400)
+
+    team_ids = [team_id] if team_id is not None else None
+    if user.user_type == 'coach':
+        managed = snapshot.coach_team_ids(user.id)
+        if team_id is not None and team_id not in managed:
+            return JsonResponse({'error': '您沒有權限查看此球隊。'}, status=403)
+        if team_ids is None:
+            team_ids = managed
+    elif user.user_type == 'player':
+        player_id, _ = get_player_ids(user)
+        if player_id is None:
+            return JsonResponse({'error': '找不到您的球員資料。'}, status=403)
+    elif user.user_type != 'admin':
+        return JsonResponse({'error': '您沒有權限查看此頁面。'}, status=403)
+
+    return JsonResponse({
+        'snapshot_at': snapshot.created_at.isoformat(),
+        'months': monthly_trends(snapshot, team_ids=team_ids, league_id=league_id, player_id=player_id),
+    })
+
+@login_required
+def analytics_percentiles(request):
+    """球員在群體（league，或 group 加 season）中的百分位數（JSON），只讀取欄式快照
+
+    指定 player 時回傳該球員各項指標的百分位數；否則回傳 metric 指標下群體內
+    每名球員的百分位數。教練限自己球隊的球員，球員只能查看自己。
+    """
+    user = request.user
+    snapshot = open_snapshot()
+    if snapshot is None:
+        return JsonResponse({'error': '分析快照尚未建立。'}, status=503)
+    metric = request.GET.get('metric', 'contributions_per90')
+    try:
+        group = cohort_from_params(request.GET)
+        player_id = _optional_int(request.GET, 'player')
+        if metric not in PERCENTILE_METRICS:
+            raise ValueError(metric)
+    except ValueError:
+        return JsonResponse({'error': '篩選條件不正確。'}, status=400)
+
+    player_ids = None
+    if user.user_type == 'coach':
+        player_ids = snapshot.coach_player_ids(user.id)
+        if player_id is not None and player_id not in player_ids:
+            return JsonResponse({'error': '您沒有權限查看此球員。'}, status=403)
+    elif user.user_type == 'player':
+        player_id, _ = get_player_ids(user)
+        if player_id is None:
+            return JsonResponse({'error': '找不到您的球員資料。'}, status=403)
+    elif user.user_type != 'admin':
+        return JsonResponse({'error': '您沒有權限查看此頁面。'}, status=403)
+
+    if player_id is not None:
+        return JsonResponse({
+            'snapshot_at': snapshot.created_at.isoformat(),
+            'player': player_id,
+            'metrics': player_percentiles(snapshot, player_id, **group),
+        })
+    group_cohort = cohort(snapshot, **group)
+    rows = sorted(group_cohort.table(metric, player_ids), key=lambda row: (-row[2], row[0]))
+    return JsonResponse({
+        'snapshot_at': snapshot.created_at.isoformat(),
+        'metric': metric,
+        'summary': group_cohort.summary(metric),
+        'players': [
+            {'player': player, 'value': value, 'percentile': round(percentile, 1)}
+            for player, value, percentile in rows
+        ],
+    })
+
+@login_required
+def workload(request):
+    """球隊的出場負荷熱度圖：每名球員每天的 7 天、28 天滾動出場時間與負荷比"""
+    user = request.user
+    if not _manages(user):
+        messages.error(request, '您沒有權限查看此頁面。')
+        return redirect('/dashboard/')
+
+    teams = list(Team.objects.visible_to(user).order_by('name'))
+    try:
+        team_id = _optional_int(request.GET, 'team')
+        end = request.GET.get('end')
+        end = datetime.strptime(end, '%Y-%m-%d').date() if end else timezone.localdate()
+        days = min(max(_optional_int(request.GET, 'days') or WORKLOAD_DAYS, 1), WORKLOAD_MAX_DAYS)
+    except ValueError:
+        return HttpResponseBadRequest('篩選條件不正確。')
+    if team_id is None:
+        team = teams[0] if teams else None
+    else:
+        team = next((team for team in teams if team.id == team_id), None)
+        if team is None:
+            return HttpResponseForbidden('您沒有權限查看此球隊。')
+
+    players = list(Player.objects.filter(team=team).order_by('nickname')) if team else []
+    dates, rows = squad_heatmap(players, end, days)
+    context = {
+        'teams': teams,
+        'team': team,
+        'end': end,
+        'days': days,
+        'dates': dates,
+        'rows': rows,
+        'bands': RATIO_BANDS,
+    }
+    return render(request, 'team_management/workload.html', context)
+
+@login_required
+def availability(request):
+    """球員 × 即將進行的比賽的出席矩陣，附各球員的出席率"""
+    user = request.user
+    if not _manages(user):
+        messages.error(request, '您沒有權限查看此頁面。')
+        return redirect('/dashboard/')
+
+    teams = list(Team.objects.visible_to(user).order_by('name'))
+    try:
+        team_id = _optional_int(request.GET, 'team')
+        limit = _optional_int(request.GET, 'matches') or AVAILABILITY_MATCHES
+    except ValueError:
+        return HttpResponseBadRequest('篩選條件不正確。')
+    limit = min(max(limit, 1), max_matches())
+    if team_id is None:
+        team = teams[0] if teams else None
+    else:
+        team = next((team for team in teams if team.id == team_id), None)
+        if team is None:
+            return HttpResponseForbidden('您沒有權限查看此球隊。')
+
+    matrix = availability_matrix(team.id, limit) if team else {'matches': [], 'players': []}
+    context = {
+        'teams': teams,
+        'team': team,
+        'limit': limit,
+        'matches': matrix['matches'],
+        'players': matrix['players'],
+    }
+    return render(request, 'team_management/availability.html', context)
 
 @login_required
 def my_matches(request):
@@ -1118,11 +1700,13 @@ def my_matches(request):
         return redirect('/dashboard/')
     
     try:
-        # 獲取當前用戶的球員資料
-        player = Player.objects.get(user=request.user)
+        # 獲取當前用戶的球員資料（取自使用者快取）
+        player_id, team_id = get_player_ids(request.user)
+        if player_id is None:
+            raise Player.DoesNotExist
         
         # 獲取該球員所屬球隊的所有比賽
-        team_matches = Match.objects.filter(team=player.team).order_by('match_date')
+        team_matches = Match.objects.filter(team_id=team_id).order_by('match_date')
         
         # 獲取球員的參與狀態
         from django.utils import timezone
@@ -1130,12 +1714,12 @@ def my_matches(request):
         
         for match in team_matches:
             try:
-                participation = PlayerMatchParticipation.objects.get(player=player, match=match)
+                participation = PlayerMatchParticipation.objects.get(player_id=player_id, match=match)
                 match.is_participating = participation.is_participating
             except PlayerMatchParticipation.DoesNotExist:
                 # 如果沒有記錄，創建一個預設為參加的記錄
                 participation = PlayerMatchParticipation.objects.create(
-                    player=player,
+                    player_id=player_id,
                     match=match,
                     is_participating=True
                 )
@@ -1144,12 +1728,20 @@ def my_matches(request):
             # 檢查是否可以修改（比賽時間未過期）
             match.can_edit = match.match_date > current_time
         
-        return render(request, 'team_management/my_matches.html', {'matches': team_matches, 'player': player})
+        return render(request, 'team_management/my_matches.html', {'matches': team_matches})
     
     except Player.DoesNotExist:
         messages.error(request, '找不到您的球員資料。')
         return redirect('/dashboard/')
 
+def _set_participation(player_id, match, is_participating):
+    participation, created = PlayerMatchParticipation.objects.update_or_create(
+        player_id=player_id,
+        match=match,
+        defaults={'is_participating': is_participating}
+    )
+    return participation
+
 @login_required
 def match_participate(request, match_id):
     """球員設置是否參加比賽"""
@@ -1158,12 +1750,14 @@ def match_participate(request, match_id):
         return redirect('/dashboard/')
     
     try:
-        # 獲取當前用戶的球員資料
-        player = Player.objects.get(user=request.user)
+        # 獲取當前用戶的球員資料（取自使用者快取）
+        player_id, team_id = get_player_ids(request.user)
+        if player_id is None:
+            raise Player.DoesNotExist
         match = Match.objects.get(id=match_id)
         
         # 確認比賽是否屬於球員的球隊
-        if match.team != player.team:
+        if match.team_id != team_id:
             messages.error(request, '您不能參加其他球隊的比賽。')
             return redirect('/dashboard/my-matches/')
         
@@ -1178,11 +1772,7 @@ def match_participate(request, match_id):
             is_participating = request.POST.get('is_participating') == 'true'
             
             # 更新或創建參與記錄
-            participation, created = PlayerMatchParticipation.objects.update_or_create(
-                player=player,
-                match=match,
-                defaults={'is_participating': is_participating}
-            )
+            run_write(_set_participation, player_id, match, is_participating)
             
             if is_participating:
                 messages.success(request, f'您已確認參加 {match.match_date.strftime("%Y-%m-%d %H:%M")} 的比賽。')
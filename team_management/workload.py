@@ -0,0 +1,183 @@
+"""
+球員負荷（急性：慢性負荷比）
+
+以出場時間衡量負荷：急性負荷是最近 7 天的出場分鐘，慢性負荷是最近 28 天
+的每週平均（28 天總和 ÷ 4），負荷比 = 急性 ÷ 慢性。
+
+若每次都從 PlayerStats 加總，每名球員每一天都要掃描一次比賽。這裡把出場
+時間依比賽的當地日期累計在 PlayerDailyLoad（每名球員每天一列）：
+
+- PlayerStats 的所有寫入都經過 events.py，寫入後以 update_for_stats() 只
+  重新計算受影響的 (球員, 日期)；比賽改期或刪除由 signal 處理（見 apps.py）。
+- 熱度圖讀取全隊在 [起始日 - 27 天, 結束日] 範圍內的列（(球員, 日期)
+  唯一索引的範圍查詢），以累積和一次算出每天的 7 天與 28 天滾動總和。
+
+已封存聯賽的明細已刪除：刪除其比賽時不重新計算，每日負荷保留；完整重建
+（rebuild_loads）後不再包含這些比賽。
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import League, Match, PlayerDailyLoad, PlayerStats
+
+ACUTE_DAYS = 7
+CHRONIC_DAYS = 28
+DEFAULT_DAYS = 28
+MAX_DAYS = 91
+
+# 負荷比上限 → (代碼, 顯示名稱)；0.8～1.3 一般視為適當的區間
+RATIO_BANDS = (
+    (0.8, 'low', '偏低'),
+    (1.3, 'optimal', '適中'),
+    (1.5, 'high', '偏高'),
+    (None, 'danger', '過高'),
+)
+
+
+def match_day(match_date):
+    """比賽的當地日期"""
+    return timezone.localtime(match_date).date()
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+
+def _daily_minutes(stats):
+    """{(player_id, 日期): 出場時間}，日期依目前時區截斷"""
+    rows = stats.annotate(day=TruncDate('match__match_date')).values_list('player_id', 'day').annotate(
+        total=Sum('minutes_played')
+    ).order_by()
+    return {(player_id, day): total for player_id, day, total in rows if total}
+
+
+@transaction.atomic
+def update_days(keys):
+    """重新計算 (player_id, 日期) 的每日負荷"""
+    keys = set(keys)
+    if not keys:
+        return
+    players = {player_id for player_id, _ in keys}
+    days = {day for _, day in keys}
+    in_days = Q()
+    for day in days:
+        in_days |= Q(match__match_date__gte=_day_start(day), match__match_date__lt=_day_start(day + timedelta(days=1)))
+    totals = _daily_minutes(PlayerStats.objects.filter(in_days, player_id__in=players))
+
+    stored = PlayerDailyLoad.objects.filter(player_id__in=players, day__in=days).values_list('id', 'player_id', 'day')
+    PlayerDailyLoad.objects.filter(id__in=[pk for pk, player_id, day in stored if (player_id, day) in keys]).delete()
+    PlayerDailyLoad.objects.bulk_create([
+        PlayerDailyLoad(player_id=player_id, day=day, minutes=totals[player_id, day])
+        for player_id, day in sorted(keys) if (player_id, day) in totals
+    ])
+
+
+def update_for_stats(pairs):
+    """PlayerStats 寫入後呼叫；pairs 為 (player_id, match_id)"""
+    pairs = set(pairs)
+    if not pairs:
+        return
+    dates = dict(Match.objects.filter(id__in={match_id for _, match_id in pairs}).values_list('id', 'match_date'))
+    update_days({(player_id, match_day(dates[match_id])) for player_id, match_id in pairs if match_id in dates})
+
+
+@transaction.atomic
+def rebuild_loads():
+    """由球員統計重新建立所有每日負荷，回傳列數"""
+    PlayerDailyLoad.objects.all().delete()
+    totals = _daily_minutes(PlayerStats.objects.all())
+    created = PlayerDailyLoad.objects.bulk_create([
+        PlayerDailyLoad(player_id=player_id, day=day, minutes=minutes)
+        for (player_id, day), minutes in sorted(totals.items())
+    ], batch_size=500)
+    return len(created)
+
+
+def rolling_loads(player_ids, end, days=DEFAULT_DAYS):
+    """每名球員由 end 往前 days 天，每天的急性、慢性負荷與負荷比
+
+    回傳 (日期清單, 急性, 慢性, 負荷比)，後三者是 球員 × 日期 的陣列（列順序同
+    player_ids）；慢性負荷為 0 時負荷比為 nan。
+    """
+    player_ids = list(player_ids)
+    first = end - timedelta(days=days + CHRONIC_DAYS - 2)
+    span = days + CHRONIC_DAYS - 1
+    rows = {player_id: index for index, player_id in enumerate(player_ids)}
+    minutes = np.zeros((len(player_ids), span))
+    loads = PlayerDailyLoad.objects.filter(player_id__in=player_ids, day__gte=first, day__lte=end)
+    for player_id, day, value in loads.values_list('player_id', 'day', 'minutes'):
+        minutes[rows[player_id], (day - first).days] = value
+
+    # cumulative[:, k] 為前 k 天的總和；每個輸出日期的滾動總和是兩個累積和相減
+    cumulative = np.concatenate([np.zeros((len(player_ids), 1)), np.cumsum(minutes, axis=1)], axis=1)
+    ends = np.arange(CHRONIC_DAYS, span + 1)
+    acute = cumulative[:, ends] - cumulative[:, ends - ACUTE_DAYS]
+    chronic = (cumulative[:, ends] - cumulative[:, ends - CHRONIC_DAYS]) * ACUTE_DAYS / CHRONIC_DAYS
+    ratio = np.divide(acute, chronic, out=np.full(acute.shape, np.nan), where=chronic > 0)
+    dates = [end - timedelta(days=offset) for offset in range(days - 1, -1, -1)]
+    return dates, acute, chronic, ratio
+
+
+def ratio_band(ratio):
+    """(代碼, 顯示名稱)；沒有慢性負荷時為 ('none', '—')"""
+    if np.isnan(ratio):
+        return 'none', '—'
+    for limit, code, label in RATIO_BANDS:
+        if limit is None or ratio < limit:
+            return code, label
+
+
+def squad_heatmap(players, end, days=DEFAULT_DAYS):
+    """熱度圖資料：(日期清單, 各球員列)；每列含 player、cells（每天）與 current（最後一天）"""
+    dates, acute, chronic, ratio = rolling_loads([player.id for player in players], end, days)
+    rows = []
+    for index, player in enumerate(players):
+        cells = []
+        for day, acute_minutes, chronic_minutes, value in zip(dates, acute[index], chronic[index], ratio[index]):
+            band, label = ratio_band(value)
+            cells.append({
+                'day': day,
+                'acute': int(acute_minutes),
+                'chronic': round(float(chronic_minutes), 1),
+                'ratio': None if np.isnan(value) else round(float(value), 2),
+                'band': band,
+                'label': label,
+            })
+        rows.append({'player': player, 'cells': cells, 'current': cells[-1] if cells else None})
+    return dates, rows
+
+
+# 比賽改期、刪除時的 signal 處理器（連線於 apps.py）
+
+def remember_match_date(sender, instance, **kwargs):
+    """post_init：記下載入時的比賽時間（已延遲載入時不記錄）"""
+    instance._workload_match_date = instance.__dict__.get('match_date')
+
+
+def update_after_match_move(sender, instance, created, **kwargs):
+    """post_save：比賽改到其他日期時，重新計算新舊兩天"""
+    old = getattr(instance, '_workload_match_date', None)
+    instance._workload_match_date = instance.match_date
+    if created or old is None or match_day(old) == match_day(instance.match_date):
+        return
+    players = PlayerStats.objects.filter(match_id=instance.pk).values_list('player_id', flat=True)
+    update_days({(player_id, day) for player_id in players for day in (match_day(old), match_day(instance.match_date))})
+
+
+def remember_match_loads(sender, instance, **kwargs):
+    """pre_delete：記下比賽中有統計的球員；已封存聯賽不處理"""
+    if League.objects.filter(id=instance.league_id, archived_at__isnull=True).exists():
+        instance._workload_players = list(
+            PlayerStats.objects.filter(match_id=instance.pk).values_list('player_id', flat=True)
+        )
+
+
+def update_after_match_delete(sender, instance, **kwargs):
+    players = getattr(instance, '_workload_players', None)
+    if players:
+        update_days({(player_id, match_day(instance.match_date)) for player_id in players})
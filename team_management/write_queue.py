@@ -0,0 +1,164 @@
+"""
+SQLite 寫入序列化佇列（選用）
+
+即使開啟 WAL，SQLite 同一時間仍只允許一個寫入者。比賽截止前大量球員切換
+參加狀態、或多位教練同時儲存比賽數據時，各 worker 執行緒會互相搶寫入鎖。
+
+啟用 WRITE_QUEUE_ENABLED 後，每個行程只有一條寫入執行緒：呼叫端把小型寫入
+函式交給 run_write()，寫入執行緒每隔數毫秒把累積的寫入合併成一個交易提交；
+每筆寫入在各自的 savepoint 中執行，單筆失敗不影響同批其他寫入。遇到
+SQLITE_BUSY（database is locked）時整批回滾並以指數退避重試。
+呼叫端會一直等到自己那筆寫入提交（或失敗）才返回，語意與直接寫入相同。
+
+未啟用時 run_write() 直接在目前執行緒以 transaction.atomic() 執行。
+"""
+import os
+import queue
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+
+_STOP = object()
+
+
+def is_busy_error(exc):
+    """是否為可重試的 SQLITE_BUSY / SQLITE_LOCKED 錯誤"""
+    message = str(exc).lower()
+    return isinstance(exc, OperationalError) and ('locked' in message or 'busy' in message)
+
+
+class _RetryBatch(Exception):
+    """單筆寫入遇到 SQLITE_BUSY 時，中止整批交易以便重試"""
+
+    def __init__(self, cause):
+        super().__init__(str(cause))
+        self.cause = cause
+
+
+class WriteQueue:
+    def __init__(self, window_ms=5, max_batch=50, max_retries=5, backoff_ms=10, using=DEFAULT_DB_ALIAS):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.max_retries = max_retries
+        self.backoff = backoff_ms / 1000
+        self.using = using
+        self.pid = os.getpid()
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, func, *args, **kwargs):
+        """排入一筆寫入並等待結果；func 的回傳值或例外會原樣交還給呼叫端"""
+        future = Future()
+        self._ensure_started()
+        self._queue.put((func, args, kwargs, future))
+        return future.result()
+
+    def stop(self, timeout=None):
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='tyfc-write-queue', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        try:
+            stopping = False
+            while not stopping:
+                item = self._queue.get()
+                if item is _STOP:
+                    break
+                batch = [item]
+                deadline = time.monotonic() + self.window
+                while len(batch) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+                self._execute(batch)
+        finally:
+            connections[self.using].close()
+
+    def _execute(self, batch):
+        batch = [item for item in batch if item[3].set_running_or_notify_cancel()]
+        connection = connections[self.using]
+
+        for attempt in range(self.max_retries + 1):
+            results = []
+            try:
+                connection.close_if_unusable_or_obsolete()
+                with transaction.atomic(using=self.using):
+                    for func, args, kwargs, _future in batch:
+                        try:
+                            with transaction.atomic(using=self.using):
+                                results.append((True, func(*args, **kwargs)))
+                        except Exception as exc:
+                            if is_busy_error(exc):
+                                raise _RetryBatch(exc)
+                            results.append((False, exc))
+            except (_RetryBatch, OperationalError) as exc:
+                cause = exc.cause if isinstance(exc, _RetryBatch) else exc
+                if is_busy_error(cause) and attempt < self.max_retries:
+                    time.sleep(self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5))
+                    continue
+                for item in batch:
+                    item[3].set_exception(cause)
+                return
+            except BaseException as exc:
+                for item in batch:
+                    item[3].set_exception(exc)
+                return
+
+            for item, (ok, value) in zip(batch, results):
+                if ok:
+                    item[3].set_result(value)
+                else:
+                    item[3].set_exception(value)
+            return
+
+
+_default_queue = None
+_default_lock = threading.Lock()
+
+
+def get_write_queue():
+    """目前行程的寫入佇列；fork 之後（gunicorn preload）會重新建立"""
+    global _default_queue
+    with _default_lock:
+        if _default_queue is None or _default_queue.pid != os.getpid():
+            _default_queue = WriteQueue(
+                window_ms=settings.WRITE_QUEUE_WINDOW_MS,
+                max_batch=settings.WRITE_QUEUE_MAX_BATCH,
+                max_retries=settings.WRITE_QUEUE_MAX_RETRIES,
+                backoff_ms=settings.WRITE_QUEUE_BACKOFF_MS,
+            )
+        return _default_queue
+
+
+def run_write(func, *args, **kwargs):
+    """執行一筆寫入：啟用佇列時交給寫入執行緒合併提交，否則直接以交易執行
+
+    呼叫端若已在交易中，為了讓寫入屬於同一個交易，一律直接執行。
+    """
+    if not getattr(settings, 'WRITE_QUEUE_ENABLED', False) or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        with transaction.atomic():
+            return func(*args, **kwargs)
+    return get_write_queue().submit(func, *args, **kwargs)
@@ -18,3 +18,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'football_management_system.sett
 
 application = get_wsgi_application()
 
+from football_management_system.selfcheck import log_startup_report  # noqa: E402
+
+log_startup_report()
+